@@ -0,0 +1,108 @@
+"""
+Töövoo etappide ajastus (valikuline).
+
+mootmine() kogub oma ploki sees kõigi etapp() plokkide kestused ja ridade
+arvud; väljaspool mõõtmist on etapp() tühioperatsioon, nii et mõõtmata
+päringud ei maksa midagi. Lõimedes (nt failide paralleelne lugemine)
+liidetakse kestused kokku. Lõpetatud mõõtmised hoitakse etappide kaupa
+libisevas aknas, millest arvutatakse protsentiilid.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Mitu viimast mõõtmist iga etapi kohta protsentiilide jaoks hoitakse
+AKNA_PIKKUS = 1000
+
+_kogum = contextvars.ContextVar('akupargi_ajastus', default=None)
+_kogumi_lukk = threading.Lock()
+_ajalugu = {}
+_ajaloo_lukk = threading.Lock()
+
+
+@contextmanager
+def mootmine():
+    """Alustab mõõtmist; annab sõnastiku {etapp: {'ms': .., 'ridu': ..}}, mis täitub ploki jooksul"""
+    kogum = {}
+    marker = _kogum.set(kogum)
+    try:
+        yield kogum
+    finally:
+        _kogum.reset(marker)
+
+
+def _kirje(kogum, nimi):
+    return kogum.setdefault(nimi, {'ms': 0.0, 'ridu': None})
+
+
+@contextmanager
+def etapp(nimi):
+    """Mõõdab ploki kestuse etapi nimi alla (kui mõõtmine on käimas)"""
+    kogum = _kogum.get()
+    if kogum is None:
+        yield
+        return
+    algus = time.perf_counter()
+    try:
+        yield
+    finally:
+        kestus = (time.perf_counter() - algus) * 1000
+        with _kogumi_lukk:
+            _kirje(kogum, nimi)['ms'] += kestus
+
+
+def loenda(nimi, ridu):
+    """Lisab etapile töödeldud ridade arvu (kui mõõtmine on käimas)"""
+    kogum = _kogum.get()
+    if kogum is None:
+        return
+    with _kogumi_lukk:
+        kirje = _kirje(kogum, nimi)
+        kirje['ridu'] = (kirje['ridu'] or 0) + int(ridu)
+
+
+def salvesta(kogum, ruhm=''):
+    """Lisab lõpetatud mõõtmise (nt ühe päringu) rühma ruhm etappide libisevatesse akendesse"""
+    with _ajaloo_lukk:
+        etapid = _ajalugu.setdefault(ruhm, {})
+        for nimi, kirje in kogum.items():
+            etapid.setdefault(nimi, deque(maxlen=AKNA_PIKKUS)).append((kirje['ms'], kirje['ridu']))
+
+
+def kokkuvote():
+    """
+    Rühmade ja etappide kaupa mõõtmiste arv, kestuse protsentiilid (ms) ja keskmine
+    ridade arv viimases aknas: {ruhm: {etapp: {...}}}
+    """
+    with _ajaloo_lukk:
+        ajalugu = {(ruhm, nimi): list(aken) for ruhm, etapid in _ajalugu.items() for nimi, aken in etapid.items()}
+
+    tulemus = {}
+    for (ruhm, nimi), mootmised in ajalugu.items():
+        kestused = np.array([ms for ms, _ in mootmised])
+        ridu = [r for _, r in mootmised if r is not None]
+        p50, p90, p99 = np.percentile(kestused, [50, 90, 99])
+        tulemus.setdefault(ruhm, {})[nimi] = {
+            'mootmisi': len(mootmised),
+            'p50_ms': float(p50),
+            'p90_ms': float(p90),
+            'p99_ms': float(p99),
+            'max_ms': float(kestused.max()),
+            'keskmine_ridu': float(np.mean(ridu)) if ridu else None,
+        }
+    return tulemus
+
+
+def server_timing(kogum):
+    """Mõõtmine HTTP Server-Timing päise kujul, nt 'optimeerimine;dur=5.2;desc="ridu=15312"'"""
+    osad = []
+    for nimi, kirje in kogum.items():
+        osa = f"{nimi};dur={kirje['ms']:.2f}"
+        if kirje['ridu'] is not None:
+            osa += f';desc="ridu={kirje["ridu"]}"'
+        osad.append(osa)
+    return ', '.join(osad)
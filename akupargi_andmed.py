@@ -0,0 +1,406 @@
+"""
+Hinnaandmete lugemine ja ettevalmistamine optimeerimiseks.
+
+Loeb Tuulikutasu CSV failid (mõlemad teadaolevad paigutused, tunni- või
+15-minutilised hinnad) üheks UTC aja järgi sorteeritud hinnareaks ja koondab
+selle päevad × slotid maatriksiks, et optimeerija ja kuude kokkuvõtted saaksid andmeid
+indekseerida ilma päev-päevalt filtreerimata.
+"""
+import codecs
+import contextvars
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from akupargi_ajastus import etapp, loenda
+
+AJAVOOND = 'Europe/Tallinn'
+KOHALIKU_AJA_FORMAAT = '%d.%m.%Y %H:%M'
+_PROOVI_BAITE = 4096
+# Pikim sloti pikkus (sekundites); suurem vahe kahe rea vahel on andmeauk
+MAX_SLOTIPIKKUS_S = 3600
+# Hinnapiirkonnad ja sõnad, mille järgi piirkonna hinnaveerg päises ära tuntakse (nt 'NPS Soome')
+TSOONID = {
+    'EE': ('eesti', 'ee'),
+    'FI': ('soome', 'fi'),
+    'LV': ('läti', 'lv'),
+    'LT': ('leedu', 'lt'),
+}
+# Piirkond, mille hinnad on failides, kus piirkonda ei nimetata (nt 'Periood;Börsihind')
+VAIKETSOON = 'EE'
+
+
+def _tuvasta_skeem(failitee):
+    """
+    Tuvastab faili esimeste baitide põhjal kodeeringu ja paigutuse.
+
+    Tagastab (kodeering, skeem, päise veerud), kus skeem on
+        'ajatempel' - Ajatempel (UTC);Kuupäev (Eesti aeg);NPS Eesti
+        'periood'   - Periood;Börsihind eur/MWh (ei sisalda käibemaksu)
+        None        - tundmatu, veerud otsitakse nime järgi
+    """
+    with open(failitee, 'rb') as f:
+        algus = f.read(_PROOVI_BAITE)
+
+    if algus.startswith(codecs.BOM_UTF8):
+        kodeering = 'utf-8-sig'
+    else:
+        # Lõikame viimase poolika rea ära, et mitmebaidine märk ei jääks pooleks
+        tervikread = algus[:algus.rfind(b'\n') + 1] or algus
+        try:
+            tervikread.decode('utf-8')
+            kodeering = 'utf-8'
+        except UnicodeDecodeError:
+            kodeering = 'cp1252'
+
+    paise_rida = algus.decode(kodeering, errors='replace').splitlines()[0] if algus else ''
+    veerud = [v.strip() for v in paise_rida.split(';')]
+
+    if len(veerud) >= 3 and veerud[0].startswith('Ajatempel'):
+        skeem = 'ajatempel'
+    elif len(veerud) == 2 and veerud[0].startswith('Periood'):
+        skeem = 'periood'
+    else:
+        skeem = None
+    return kodeering, skeem, veerud
+
+
+def _tsooni_veerg(veerud, hinnaveerud, tsoon, vaikimisi):
+    """
+    Hinnapiirkonna tsoon veeru indeks hinnaveergude seast (päise sõnade järgi). Kui failis
+    ühtegi piirkonda ei nimetata, on vaikimisi veerg VAIKETSOON hind; muidu None.
+    """
+    nimetatud = {}
+    for i in hinnaveerud:
+        sonad = set(re.findall(r'\w+', veerud[i].lower()))
+        for nimi, tunnused in TSOONID.items():
+            if sonad & set(tunnused):
+                nimetatud.setdefault(nimi, i)
+    if tsoon in nimetatud:
+        return nimetatud[tsoon]
+    if not nimetatud and tsoon == VAIKETSOON:
+        return vaikimisi
+    return None
+
+
+def _kohalikust_ajast_utc(kuupaevad):
+    """
+    Eesti aja (naiivne) teisendus UTC epohhi sekunditeks.
+    Sügisese kellakeeramise kordustunnist loetakse esimene suveajaks ja teine talveajaks.
+    """
+    suveaeg = ~pd.Series(kuupaevad).duplicated(keep='first').to_numpy()
+    lokaliseeritud = pd.DatetimeIndex(kuupaevad).tz_localize(
+        AJAVOOND, ambiguous=suveaeg, nonexistent='shift_forward'
+    )
+    return (lokaliseeritud.tz_convert('UTC').tz_localize(None) - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+
+
+def _hinnad_arvuks(veerg):
+    """Komaga kümnendkohad -> float kogu veerule korraga; mittenumbrilised read (nt 'Keskmine') -> NaN"""
+    return pd.to_numeric(veerg.str.replace(',', '.', regex=False), errors='coerce')
+
+
+def _utc_kohalikuks_ajaks(ajatemplid):
+    """UTC epohhi sekundid -> naiivne Eesti aeg"""
+    return pd.to_datetime(ajatemplid, unit='s', utc=True).tz_convert(AJAVOOND).tz_localize(None)
+
+
+def loe_hinnad(failitee, tsoon=None):
+    """
+    Loeb ühe CSV faili ja parsib hinnad.
+
+    tsoon: hinnapiirkond (TSOONID), mille veerg loetakse; None = esimene NPS veerg.
+    Tagastab DataFrame'i veergudega 'Kuupäev' (Eesti aeg), 'Ajatempel' (UTC sekundid) ja 'Hind',
+    sorteeritud UTC aja järgi ja ilma korduvate tundideta; vea korral või kui failis pole
+    piirkonna hindu, tühja DataFrame'i.
+    """
+    try:
+        with etapp('dekodeerimine'):
+            kodeering, skeem, veerud = _tuvasta_skeem(failitee)
+        loe = dict(sep=';', encoding=kodeering, encoding_errors='replace', dtype=str)
+
+        if skeem == 'ajatempel':
+            hinna_veerg = next((i for i, v in enumerate(veerud) if 'NPS' in v), 2)
+            if tsoon is not None:
+                hinna_veerg = _tsooni_veerg(veerud, range(2, len(veerud)), tsoon, hinna_veerg)
+                if hinna_veerg is None:
+                    return pd.DataFrame()
+            with etapp('dekodeerimine'):
+                df = pd.read_csv(failitee, usecols=[0, hinna_veerg], **loe)
+            loenda('dekodeerimine', len(df))
+            with etapp('parsimine'):
+                df.columns = ['Ajatempel', 'Hind']
+                df['Ajatempel'] = pd.to_numeric(df['Ajatempel'], errors='coerce')
+                df['Hind'] = _hinnad_arvuks(df['Hind'])
+                df = df.dropna()
+                df['Ajatempel'] = df['Ajatempel'].astype('int64')
+                df['Kuupäev'] = _utc_kohalikuks_ajaks(df['Ajatempel'].to_numpy())
+        else:
+            if skeem == 'periood':
+                date_col, price_col = 0, 1
+            else:
+                # Tundmatu paigutus: leia veerud nime järgi
+                date_col = price_col = None
+                for i, col in enumerate(veerud):
+                    if 'Kuup' in col or 'aeg' in col.lower() or 'date' in col.lower() or 'Periood' in col:
+                        date_col = i
+                    if 'NPS' in col or 'hind' in col.lower() or 'price' in col.lower():
+                        price_col = i
+                if date_col is None or price_col is None:
+                    if len(veerud) < 3:
+                        return pd.DataFrame()
+                    date_col, price_col = 1, 2
+            if tsoon is not None:
+                price_col = _tsooni_veerg(veerud, [i for i in range(len(veerud)) if i != date_col], tsoon, price_col)
+                if price_col is None:
+                    return pd.DataFrame()
+
+            with etapp('dekodeerimine'):
+                df = pd.read_csv(failitee, usecols=[date_col, price_col], **loe)
+            loenda('dekodeerimine', len(df))
+            with etapp('parsimine'):
+                df = df[[veerud[date_col], veerud[price_col]]]
+                df.columns = ['Kuupäev', 'Hind']
+                df['Kuupäev'] = pd.to_datetime(df['Kuupäev'], format=KOHALIKU_AJA_FORMAAT, errors='coerce')
+                df['Hind'] = _hinnad_arvuks(df['Hind'])
+                df = df.dropna()
+                df['Ajatempel'] = np.asarray(_kohalikust_ajast_utc(df['Kuupäev'].to_numpy()), dtype='int64')
+
+        with etapp('parsimine'):
+            # Korduvad read (sama UTC tund) eemaldatakse, sügisene kordustund jääb kahe eraldi tunnina
+            df = df.drop_duplicates('Ajatempel', keep='first')
+            df = df.sort_values('Ajatempel', kind='stable').reset_index(drop=True)
+        loenda('parsimine', len(df))
+        return df[['Kuupäev', 'Ajatempel', 'Hind']]
+    except Exception as e:
+        try:
+            print(f"Viga faili {failitee} lugemisel: {e}", file=sys.stderr)
+        except Exception:
+            pass
+        return pd.DataFrame()
+
+
+def loe_hinnafailid(csv_failid, tootajaid=None, vahemalu=None, tsoon=None):
+    """
+    Loeb kõik failid paralleelselt ja ühendab üheks UTC aja järgi sorteeritud hinnareaks.
+    Kattuvate failide korral jääb iga tunni kohta alles nimejärjekorras esimese faili hind.
+
+    vahemalu: kutsuja sõnastik {failitee: ((mtime, suurus), DataFrame)}; kui see on antud,
+    loetakse ainult uued ja muutunud failid ning sõnastik uuendatakse (iga tsooni jaoks oma sõnastik).
+    tsoon: hinnapiirkond, vt loe_hinnad.
+    """
+    csv_failid = sorted(csv_failid)
+    if not csv_failid:
+        return pd.DataFrame()
+
+    loetud = {}
+    if vahemalu is not None:
+        for fail in list(vahemalu):
+            if fail not in csv_failid:
+                del vahemalu[fail]
+        # Signatuur võetakse enne lugemist, et lugemise ajal muutunud fail loetaks järgmisel korral uuesti
+        signatuurid = {}
+        for fail in csv_failid:
+            st = os.stat(fail)
+            signatuurid[fail] = (st.st_mtime_ns, st.st_size)
+            kirje = vahemalu.get(fail)
+            if kirje is not None and kirje[0] == signatuurid[fail]:
+                loetud[fail] = kirje[1]
+    lugeda = [fail for fail in csv_failid if fail not in loetud]
+
+    if lugeda:
+        tootajaid = tootajaid or min(len(lugeda), os.cpu_count() or 1)
+        # Iga lõim saab oma koopia kontekstist, et etappide ajastus jõuaks ka lõimedest mõõtmisse
+        kontekstid = [contextvars.copy_context() for _ in lugeda]
+        with ThreadPoolExecutor(max_workers=tootajaid) as taitja:
+            for fail, df in zip(lugeda, taitja.map(lambda kontekst, fail: kontekst.run(loe_hinnad, fail, tsoon), kontekstid, lugeda)):
+                loetud[fail] = df
+                if vahemalu is not None:
+                    vahemalu[fail] = (signatuurid[fail], df)
+
+    kogu_andmed = [loetud[fail] for fail in csv_failid if not loetud[fail].empty]
+
+    if not kogu_andmed:
+        return pd.DataFrame()
+
+    with etapp('uhendamine'):
+        kogu_df = pd.concat(kogu_andmed, ignore_index=True)
+        kogu_df = kogu_df.drop_duplicates('Ajatempel', keep='first')
+        kogu_df = kogu_df.sort_values('Ajatempel', kind='stable').reset_index(drop=True)
+    loenda('uhendamine', len(kogu_df))
+    return kogu_df
+
+
+def _ridade_kestused(ajatemplid):
+    """
+    Iga rea kestus sekundites vahest järgmise reaga (kuni tund). Andmeaugu eel ja viimasel real
+    kasutatakse eelmise rea kestust (esimeste ridade puhul tund).
+    """
+    kestused = np.diff(ajatemplid, append=ajatemplid[-1] if len(ajatemplid) else 0)
+    sobiv = (kestused > 0) & (kestused <= MAX_SLOTIPIKKUS_S)
+    eelmine = np.maximum.accumulate(np.where(sobiv, np.arange(len(kestused)), -1))
+    return np.where(eelmine >= 0, kestused[np.maximum(eelmine, 0)], MAX_SLOTIPIKKUS_S)
+
+
+def joonda_tsoonid(tsoonide_df):
+    """
+    Ühendab piirkondade hinnaread ({tsoon: loe_hinnafailid tulemus}) ühiseks ajateljeks.
+
+    Ajatelg on kõigi piirkondade ajatemplite ühend; piirkonna hind igal ajal on selle rea hind,
+    mille kestus (vt _ridade_kestused) seda aega katab, nii et tunnihinnad jaotuvad teise
+    piirkonna 15-minutilistele slottidele. Alles jäävad ainult ajad, kus kõigil piirkondadel
+    on hind. Tagastab DataFrame'i veergudega 'Kuupäev', 'Ajatempel' ja iga piirkonna hinnaga.
+    """
+    tsoonid = list(tsoonide_df)
+    ajatemplid = np.unique(np.concatenate([df['Ajatempel'].to_numpy(dtype='int64') for df in tsoonide_df.values()]))
+    hinnad = np.empty((len(ajatemplid), len(tsoonid)))
+    kaetud = np.ones(len(ajatemplid), dtype=bool)
+    for z, tsoon in enumerate(tsoonid):
+        omad = tsoonide_df[tsoon]['Ajatempel'].to_numpy(dtype='int64')
+        rida = np.searchsorted(omad, ajatemplid, side='right') - 1
+        kestused = _ridade_kestused(omad)
+        kaetud &= (rida >= 0) & (ajatemplid < omad[np.maximum(rida, 0)] + kestused[np.maximum(rida, 0)])
+        hinnad[:, z] = tsoonide_df[tsoon]['Hind'].to_numpy(dtype=float)[np.maximum(rida, 0)]
+
+    ajatemplid = ajatemplid[kaetud]
+    joondatud = pd.DataFrame(hinnad[kaetud], columns=tsoonid)
+    joondatud.insert(0, 'Ajatempel', ajatemplid)
+    joondatud.insert(0, 'Kuupäev', _utc_kohalikuks_ajaks(ajatemplid))
+    return joondatud
+
+
+def koosta_paevamaatriks(kogu_df):
+    """
+    Koostab kuupäeva järgi sorteeritud hinnareast (veerud 'Kuupäev', 'Ajatempel', 'Hind') päevamaatriksi.
+
+    Sloti pikkus (tund, 15 min) tuletatakse ajatemplite vahedest ja on päeva sees ühtlane: kui päeval
+    on segamini tunni- ja 15-minutilised read, jagatakse pikemad read päeva lühima sloti pikkusteks
+    (sama hinnaga). Ainult tunnihindade korral on iga rida üks slot.
+
+    Tagastab sõnastiku:
+        paevad        - päevade kuupäevad (datetime64[D]), pikkus D
+        hinnad        - D × S hinnamaatriks, iga päeva slotid vasakule joondatud, tühjad kohad NaN
+        kehtiv        - D × S mask, True seal, kus on päris hind (nt 23/25-tunnised DST päevad)
+        pikkused      - slottide arv igas päevas
+        slotipikkused - iga päeva sloti pikkus tundides
+        algused       - iga päeva esimese sloti indeks slottide reas (ajad, ajatemplid)
+        ajad          - slottide algused Eesti ajas (datetime64[ns]) reajärjekorras
+        ajatemplid    - slottide algused UTC sekundites reajärjekorras
+        kuud          - kuud (datetime64[M]), pikkus K
+        kuu_piirid    - K + 1 päevaindeksit; kuu k päevad on kuu_piirid[k]:kuu_piirid[k + 1]
+    """
+    ajad = kogu_df['Kuupäev'].to_numpy(dtype='datetime64[ns]')
+    ajatemplid = kogu_df['Ajatempel'].to_numpy(dtype='int64')
+    hinnad = kogu_df['Hind'].to_numpy(dtype=float)
+
+    paeva_kaupa = ajad.astype('datetime64[D]')
+    rea_algused = np.flatnonzero(np.r_[True, paeva_kaupa[1:] != paeva_kaupa[:-1]]) if len(ajad) else np.zeros(0, dtype=int)
+    paevad = paeva_kaupa[rea_algused]
+
+    # Päeva sloti pikkus = päeva lühim rea kestus; pikemad read korratakse
+    kestused = _ridade_kestused(ajatemplid)
+    paeva_slot = np.minimum.reduceat(kestused, rea_algused) if len(rea_algused) else np.zeros(0, dtype='int64')
+    rea_slot = np.repeat(paeva_slot, np.diff(np.r_[rea_algused, len(ajad)]))
+    kordused = np.maximum(kestused // np.maximum(rea_slot, 1), 1)
+    if (kordused > 1).any():
+        allikas = np.repeat(np.arange(len(ajad)), kordused)
+        nihe = (np.arange(len(allikas)) - np.repeat(np.cumsum(kordused) - kordused, kordused)) * rea_slot[allikas]
+        ajad = ajad[allikas] + nihe.astype('timedelta64[s]')
+        ajatemplid = ajatemplid[allikas] + nihe
+        hinnad = hinnad[allikas]
+        paeva_kaupa = paeva_kaupa[allikas]
+
+    algused = np.flatnonzero(np.r_[True, paeva_kaupa[1:] != paeva_kaupa[:-1]]) if len(ajad) else np.zeros(0, dtype=int)
+    pikkused = np.diff(np.r_[algused, len(ajad)])
+
+    # Sloti positsioon oma päeva sees
+    paeva_nr = np.repeat(np.arange(len(algused)), pikkused)
+    positsioon = np.arange(len(ajad)) - algused[paeva_nr]
+
+    laius = int(pikkused.max()) if len(pikkused) else 0
+    maatriks = np.full((len(algused), laius), np.nan)
+    maatriks[paeva_nr, positsioon] = hinnad
+    kehtiv = np.zeros((len(algused), laius), dtype=bool)
+    kehtiv[paeva_nr, positsioon] = True
+
+    kuud, kuu_piirid = _kuude_piirid(paevad)
+
+    return {
+        'paevad': paevad,
+        'hinnad': maatriks,
+        'kehtiv': kehtiv,
+        'pikkused': pikkused,
+        'slotipikkused': paeva_slot / 3600,
+        'algused': algused,
+        'ajad': ajad,
+        'ajatemplid': ajatemplid,
+        'kuud': kuud,
+        'kuu_piirid': kuu_piirid,
+    }
+
+
+def _kuude_piirid(paevad):
+    """Päevade kuud ja kuu_piirid (vt koosta_paevamaatriks)"""
+    kuu_kaupa = paevad.astype('datetime64[M]')
+    kuu_algused = np.flatnonzero(np.r_[True, kuu_kaupa[1:] != kuu_kaupa[:-1]]) if len(paevad) else np.zeros(0, dtype=int)
+    return kuu_kaupa[kuu_algused], np.r_[kuu_algused, len(paevad)]
+
+
+def vali_paevad(maatriks, read):
+    """Päevamaatriks ainult päevadega read (kasvavas järjekorras päevaindeksid), ka reservi_hinnad ja rasid, kui on"""
+    read = np.asarray(read, dtype=int)
+    pikkused = maatriks['pikkused'][read]
+    paeva_slotid = np.repeat(read, pikkused)
+    slotid = maatriks['algused'][paeva_slotid] + (np.arange(len(paeva_slotid)) - np.repeat(np.cumsum(pikkused) - pikkused, pikkused))
+    laius = int(pikkused.max()) if len(pikkused) else 0
+    kuud, kuu_piirid = _kuude_piirid(maatriks['paevad'][read])
+    osa = {
+        'paevad': maatriks['paevad'][read],
+        'hinnad': maatriks['hinnad'][read, :laius],
+        'kehtiv': maatriks['kehtiv'][read, :laius],
+        'pikkused': pikkused,
+        'slotipikkused': maatriks['slotipikkused'][read],
+        'algused': np.cumsum(pikkused) - pikkused,
+        'ajad': maatriks['ajad'][slotid],
+        'ajatemplid': maatriks['ajatemplid'][slotid],
+        'kuud': kuud,
+        'kuu_piirid': kuu_piirid,
+    }
+    if 'reservi_hinnad' in maatriks:
+        osa['reservi_hinnad'] = maatriks['reservi_hinnad'][read, :laius]
+    if 'rasid' in maatriks:
+        osa['rasid'] = maatriks['rasid'][read]
+    return osa
+
+
+def joonda_reservihinnad(maatriks, reserv_df):
+    """
+    Reservihinnad (loe_hinnafailid tulemus, hind EUR/MW tunnis) päevamaatriksi slottidele: iga slot saab
+    selle reservirea hinna, mille kestuse sisse sloti algus jääb. Tagastab päevad × slotid maatriksi
+    (kuju nagu maatriks['hinnad']); slotid, millele reservihinda pole, ja tühjad kohad on NaN.
+    """
+    reservi_hinnad = np.full(maatriks['hinnad'].shape, np.nan)
+    if reserv_df.empty or not len(maatriks['ajatemplid']):
+        return reservi_hinnad
+    ajatemplid = reserv_df['Ajatempel'].to_numpy(dtype='int64')
+    hinnad = reserv_df['Hind'].to_numpy(dtype=float)
+    kestused = _ridade_kestused(ajatemplid)
+
+    rida = np.searchsorted(ajatemplid, maatriks['ajatemplid'], side='right') - 1
+    kaetud = rida >= 0
+    rida = np.maximum(rida, 0)
+    kaetud &= maatriks['ajatemplid'] < ajatemplid[rida] + kestused[rida]
+    reservi_hinnad[maatriks['kehtiv']] = np.where(kaetud, hinnad[rida], np.nan)
+    return reservi_hinnad
+
+
+def kuu_keskmised_hinnad(maatriks):
+    """Iga kuu ajaga kaalutud keskmine hind (tunnihindade korral tavaline keskmine)"""
+    read = maatriks['hinnad'][maatriks['kehtiv']]
+    kaalud = np.repeat(maatriks['slotipikkused'], maatriks['pikkused'])
+    rea_piirid = np.r_[0, np.cumsum(maatriks['pikkused'])][maatriks['kuu_piirid']]
+    return np.array([np.average(read[a:b], weights=kaalud[a:b]) for a, b in zip(rea_piirid[:-1], rea_piirid[1:])])
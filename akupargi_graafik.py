@@ -0,0 +1,202 @@
+"""
+Laadimis- ja tühjendusgraafiku eksport päevade või slottide kaupa.
+
+Graafik arvutatakse kuu kaupa (akupargi_simulatsioon.kuude_maatriksid) ja
+antakse tükkidena (üks DataFrame kuu kohta), nii et mitme aasta
+15-minutilise graafiku jaoks ei pea kogu tulemust mälus hoidma. Tükid
+kirjutatakse CSV tekstiks või Apache Arrow / Parquet baitideks (pyarrow on
+valikuline) samuti generaatorina, mida saab otse HTTP vastuseks või faili
+voogedastada.
+"""
+from importlib.util import find_spec
+
+import numpy as np
+
+from akupargi_mootor import optimeeri_paevad, optimeeri_soc
+from akupargi_simulatsioon import kuude_maatriksid
+
+# pandas ja pyarrow imporditakse alles tükkide koostamisel, et CLI käivitus jääks kiireks
+pyarrow_available = find_spec('pyarrow') is not None
+
+# Graafiku mudelid (päevad sõltumatud, arvutatakse kuu kaupa)
+GRAAFIKU_MUDELID = ('tsukkel', 'soc')
+DETAILID = ('paev', 'slot')
+VORMINGUD = ('csv', 'parquet', 'arrow')
+MIMETYYBID = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+
+def kontrolli_valikud(mudel='tsukkel', detail='paev', vorming='csv'):
+    """ValueError, kui mudelit, detaili või vormingut ei toetata (pyarrow puudub)"""
+    if mudel not in GRAAFIKU_MUDELID:
+        raise ValueError(f'Graafik toetab mudeleid {", ".join(GRAAFIKU_MUDELID)}, mitte {mudel}')
+    if detail not in DETAILID:
+        raise ValueError(f'Tundmatu detail: {detail} (lubatud {", ".join(DETAILID)})')
+    if vorming not in VORMINGUD:
+        raise ValueError(f'Tundmatu vorming: {vorming} (lubatud {", ".join(VORMINGUD)})')
+    if vorming != 'csv' and not pyarrow_available:
+        raise ValueError(f'Vorming {vorming} vajab paketti pyarrow')
+
+
+def paevade_graafik(maatriks, aku_voimsus_mw, aku_mahtuvus_mwh, efektiivsus, max_aeg_vahel,
+                    mudel='tsukkel', max_tsukleid_paevas=None):
+    """
+    Iga päeva iga sloti ostetud ja müüdud energia (MWh, päevad × slotid) ning päeva tulu, tsüklite
+    arv nagu paevade_tulud. Tagastab (ostetud, muudud, tulud, tsukleid).
+    """
+    if mudel == 'soc':
+        ostetud, muudud, tulud = optimeeri_soc(
+            maatriks['hinnad'], aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus,
+            pikkused=maatriks['pikkused'], max_tsukleid=max_tsukleid_paevas,
+            slotipikkus_h=maatriks['slotipikkused']
+        )
+        return ostetud, muudud, tulud, (tulud > 0).astype(int)
+
+    laadimine, tuhjendamine, tulud = optimeeri_paevad(
+        maatriks['hinnad'], aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, max_aeg_vahel,
+        pikkused=maatriks['pikkused'], slotipikkus_h=maatriks['slotipikkused'], indeks=maatriks.get('indeks')
+    )
+    # Laadimise slot ostab täis sloti energia; tagastatav energia jaguneb tühjendamise slottide vahel võrdselt
+    slotienergia = aku_voimsus_mw * maatriks['slotipikkused']
+    laadimise_slotte = np.ceil(aku_mahtuvus_mwh / slotienergia)
+    tuhjendamise_slotte = np.ceil(aku_mahtuvus_mwh * efektiivsus / slotienergia)
+    muugienergia = laadimise_slotte * slotienergia * efektiivsus / tuhjendamise_slotte
+
+    ostetud = np.zeros(maatriks['hinnad'].shape)
+    muudud = np.zeros(maatriks['hinnad'].shape)
+    for indeksid, energia, graafik in ((laadimine, slotienergia, ostetud), (tuhjendamine, muugienergia, muudud)):
+        d, j = np.nonzero(indeksid >= 0)
+        graafik[d, indeksid[d, j]] = energia[d]
+    return ostetud, muudud, tulud, (laadimine[:, 0] >= 0).astype(int)
+
+
+def _slotide_tukk(kuu, ostetud, muudud, efektiivsus):
+    import pandas as pd
+
+    kehtiv = kuu['kehtiv']
+    laetus = np.cumsum(ostetud - muudud / efektiivsus, axis=1)
+    hinnad = kuu['hinnad'][kehtiv]
+    return pd.DataFrame({
+        'Aeg': kuu['ajad'],
+        'Ajatempel': kuu['ajatemplid'],
+        'Slotipikkus_h': np.repeat(kuu['slotipikkused'], kuu['pikkused']),
+        'Hind': hinnad,
+        'Ostetud_MWh': ostetud[kehtiv],
+        'Müüdud_MWh': muudud[kehtiv],
+        'Laetus_MWh': laetus[kehtiv],
+        'Tulu': hinnad * muudud[kehtiv] - hinnad * ostetud[kehtiv],
+    })
+
+
+def _paevade_tukk(kuu, ostetud, muudud, tulud, tsukleid):
+    import pandas as pd
+
+    hinnad = np.where(kuu['kehtiv'], kuu['hinnad'], 0.0)
+    ostetud_kokku = ostetud.sum(axis=1)
+    muudud_kokku = muudud.sum(axis=1)
+
+    def esimene_aeg(energia):
+        olemas = (energia > 0).any(axis=1)
+        aeg = kuu['ajad'][kuu['algused'] + np.argmax(energia > 0, axis=1)]
+        return np.where(olemas, aeg, np.datetime64('NaT'))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame({
+            'Kuupäev': kuu['paevad'].astype(str),
+            'Kuu': kuu['paevad'].astype('datetime64[M]').astype(str),
+            'Tsukleid': tsukleid,
+            'Laadimise_aeg': esimene_aeg(ostetud),
+            'Tühjendamise_aeg': esimene_aeg(muudud),
+            'Ostetud_MWh': ostetud_kokku,
+            'Müüdud_MWh': muudud_kokku,
+            'Laadimise_hind': (hinnad * ostetud).sum(axis=1) / ostetud_kokku,
+            'Tühjendamise_hind': (hinnad * muudud).sum(axis=1) / muudud_kokku,
+            'Tulu': tulud,
+        })
+
+
+def graafiku_tukid(maatriks, aku_voimsus_mw, aku_mahtuvus_mwh, efektiivsus, max_aeg_vahel,
+                   mudel='tsukkel', max_tsukleid_paevas=None, detail='paev'):
+    """
+    Graafik DataFrame'idena kuu kaupa: detail='paev' - üks rida päeva kohta (esimese laadimise ja
+    tühjendamise aeg, energia, keskmised hinnad, tulu), detail='slot' - üks rida sloti kohta
+    (hind, ostetud ja müüdud energia, laetus sloti lõpus, tulu). Mudel tsukkel ostab täis slotte
+    nagu paevade_tulud, seega kui mahtuvus pole sloti energia täisarv, ületab laetus mahtuvust
+    kuni ühe sloti energia võrra.
+    """
+    kontrolli_valikud(mudel, detail)
+    parameetrid = dict(
+        aku_voimsus_mw=aku_voimsus_mw, aku_mahtuvus_mwh=aku_mahtuvus_mwh, efektiivsus=efektiivsus,
+        max_aeg_vahel=max_aeg_vahel, max_tsukleid_paevas=max_tsukleid_paevas
+    )
+    for kuu in kuude_maatriksid(maatriks):
+        ostetud, muudud, tulud, tsukleid = paevade_graafik(kuu, mudel=mudel, **parameetrid)
+        if detail == 'slot':
+            yield _slotide_tukk(kuu, ostetud, muudud, efektiivsus)
+        else:
+            yield _paevade_tukk(kuu, ostetud, muudud, tulud, tsukleid)
+
+
+def csv_voog(tukid):
+    """Tükid CSV tekstina (päis ainult esimese tüki ees)"""
+    for i, tukk in enumerate(tukid):
+        yield tukk.to_csv(index=False, header=i == 0, date_format='%Y-%m-%d %H:%M')
+
+
+class _Kogumik:
+    """Kirjutatav faililaadne objekt, kust kirjutatud baidid saab tükkide kaupa välja võtta"""
+
+    def __init__(self):
+        self.osad = []
+        self.asukoht = 0
+        self.closed = False
+
+    def write(self, andmed):
+        andmed = bytes(andmed)
+        self.osad.append(andmed)
+        self.asukoht += len(andmed)
+        return len(andmed)
+
+    def tell(self):
+        return self.asukoht
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def vota(self):
+        andmed = b''.join(self.osad)
+        self.osad = []
+        return andmed
+
+
+def arrow_voog(tukid, vorming='parquet'):
+    """Tükid Parquet faili (üks row group tüki kohta) või Arrow IPC voo baitidena"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    kogumik = _Kogumik()
+    kirjutaja = None
+    for tukk in tukid:
+        tabel = pa.Table.from_pandas(tukk, preserve_index=False)
+        if kirjutaja is None:
+            if vorming == 'parquet':
+                kirjutaja = pq.ParquetWriter(kogumik, tabel.schema)
+            else:
+                kirjutaja = pa.ipc.new_stream(kogumik, tabel.schema)
+        kirjutaja.write_table(tabel)
+        yield kogumik.vota()
+    if kirjutaja is not None:
+        kirjutaja.close()
+        yield kogumik.vota()
+
+
+def ekspordi(tukid, vorming='csv'):
+    """Tükid vormingus vorming (VORMINGUD): CSV korral str, muidu bytes tükid"""
+    kontrolli_valikud(vorming=vorming)
+    return csv_voog(tukid) if vorming == 'csv' else arrow_voog(tukid, vorming)
@@ -0,0 +1,155 @@
+"""
+Päevade tulemuste püsihoidla inkrementaalseks arvutuseks (SQLite).
+
+Päevad optimeeritakse üksteisest sõltumatult ja kuu kogutulu on päevade
+summa, seega piisab hinnaandmete muutumisel uuesti arvutada ainult uued
+või muutunud päevad (päeva hinnarea räsi järgi) ja nende kuude summad.
+Võti on (parameetrid, kuupäev) ja (parameetrid, kuu). Mudelis 'ajajoon'
+sõltuvad päevad üksteisest, seda arvutatakse alati tervikuna.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+
+import numpy as np
+
+from akupargi_simulatsioon import hinda_punkt, paevade_osa, paevade_tulud
+
+_SKEEM = '''
+CREATE TABLE IF NOT EXISTS paevad (
+    parameetrid TEXT NOT NULL,
+    paev TEXT NOT NULL,
+    rasi BLOB NOT NULL,
+    tulu REAL NOT NULL,
+    tsukleid INTEGER NOT NULL,
+    PRIMARY KEY (parameetrid, paev)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS kuud (
+    parameetrid TEXT NOT NULL,
+    kuu TEXT NOT NULL,
+    rasi BLOB NOT NULL,
+    summa REAL NOT NULL,
+    arv INTEGER NOT NULL,
+    PRIMARY KEY (parameetrid, kuu)
+) WITHOUT ROWID;
+'''
+
+# Mudelid, mille päevad on sõltumatud ja mida saab päevade kaupa hoidlas hoida
+INKREMENTAALSED_MUDELID = ('tsukkel', 'soc')
+
+
+def ava_hoidla(failitee):
+    """Avab (vajadusel loob) hoidla; tagastab sõnastiku ühenduse ja lukuga (lõimede vahel jagamiseks)"""
+    yhendus = sqlite3.connect(failitee, check_same_thread=False)
+    yhendus.executescript(_SKEEM)
+    return {'yhendus': yhendus, 'lukk': threading.Lock()}
+
+
+def parameetrite_voti(mudel, aku_voimsus_mw, aku_mahtuvus_mwh, efektiivsus, max_aeg_vahel, max_tsukleid_paevas=None):
+    """Normaliseeritud parameetrid tekstina; mudelile tähtsusetud parameetrid jäetakse välja"""
+    return json.dumps([
+        mudel, float(aku_voimsus_mw), float(aku_mahtuvus_mwh), float(efektiivsus),
+        float(max_aeg_vahel) if mudel != 'soc' else None,
+        float(max_tsukleid_paevas) if mudel == 'soc' and max_tsukleid_paevas is not None else None,
+    ])
+
+
+def paevade_rasid(maatriks):
+    """Iga päeva hinnarea (ja sloti pikkuse) räsi, päevad × 16 baiti; muutunud hinnaga päev saab uue räsi"""
+    rasid = np.zeros((len(maatriks['paevad']), 16), dtype=np.uint8)
+    for d, (hinnad, n, dt) in enumerate(zip(maatriks['hinnad'], maatriks['pikkused'], maatriks['slotipikkused'])):
+        rasi = hashlib.blake2b(hinnad[:n].tobytes(), digest_size=16)
+        rasi.update(np.float64(dt).tobytes())
+        rasid[d] = np.frombuffer(rasi.digest(), dtype=np.uint8)
+    return rasid
+
+
+def lisa_rasid(maatriks):
+    """
+    Lisab päevamaatriksile päevade räsid (paevade_rasid), et kuude_tulud_hoidlaga ei peaks neid
+    igal päringul uuesti arvutama. Tagastab sama maatriksi.
+    """
+    maatriks['rasid'] = paevade_rasid(maatriks)
+    return maatriks
+
+
+def kuude_tulud_hoidlaga(hoidla, maatriks, aku_voimsus_mw, aku_mahtuvus_mwh, efektiivsus, max_aeg_vahel,
+                         mudel='tsukkel', max_tsukleid_paevas=None):
+    """
+    Nagu paevade_tulud + kuude_tulud, kuid optimeerib ainult päevad, mida hoidlas pole või mille
+    hinnad on muutunud, ja summeerib uuesti ainult nende kuud.
+
+    Tagastab (tulud, tsukleid, kuu_summad, kuu_arvud, arvutatud_paevi).
+    """
+    parameetrid = dict(
+        aku_voimsus_mw=aku_voimsus_mw, aku_mahtuvus_mwh=aku_mahtuvus_mwh, efektiivsus=efektiivsus,
+        max_aeg_vahel=max_aeg_vahel, max_tsukleid_paevas=max_tsukleid_paevas
+    )
+    voti = parameetrite_voti(mudel, **parameetrid)
+    paevad = [str(p) for p in maatriks['paevad']]
+    paevade_rasi = maatriks['rasid'] if 'rasid' in maatriks else paevade_rasid(maatriks)
+    rasid = [rasi.tobytes() for rasi in paevade_rasi]
+
+    with hoidla['lukk']:
+        yhendus = hoidla['yhendus']
+        salvestatud = {
+            paev: (rasi, tulu, tsukleid)
+            for paev, rasi, tulu, tsukleid in yhendus.execute(
+                'SELECT paev, rasi, tulu, tsukleid FROM paevad WHERE parameetrid = ?', (voti,)
+            )
+        }
+        salvestatud_kuud = {
+            kuu: (rasi, summa, arv)
+            for kuu, rasi, summa, arv in yhendus.execute(
+                'SELECT kuu, rasi, summa, arv FROM kuud WHERE parameetrid = ?', (voti,)
+            )
+        }
+
+    tulud = np.zeros(len(paevad))
+    tsukleid = np.zeros(len(paevad), dtype=int)
+    arvutada = []
+    for d, (paev, rasi) in enumerate(zip(paevad, rasid)):
+        kirje = salvestatud.get(paev)
+        if kirje is not None and kirje[0] == rasi:
+            tulud[d], tsukleid[d] = kirje[1], kirje[2]
+        else:
+            arvutada.append(d)
+
+    if arvutada:
+        uued_tulud, uued_tsukleid = paevade_tulud(paevade_osa(maatriks, arvutada), mudel=mudel, **parameetrid)
+        tulud[arvutada] = uued_tulud
+        tsukleid[arvutada] = uued_tsukleid
+
+    # Kuu räsi = tema päevade räside räsi; kuu summeeritakse uuesti ainult siis, kui see muutus
+    kuu_summad = []
+    kuu_arvud = []
+    uued_kuud = []
+    for kuu, algus, lopp in zip(maatriks['kuud'], maatriks['kuu_piirid'][:-1], maatriks['kuu_piirid'][1:]):
+        kuu_rasi = hashlib.blake2b(paevade_rasi[algus:lopp].tobytes(), digest_size=16).digest()
+        kirje = salvestatud_kuud.get(str(kuu))
+        if kirje is not None and kirje[0] == kuu_rasi:
+            kuu_summad.append(kirje[1])
+            kuu_arvud.append(kirje[2])
+            continue
+        kuu_tsukleid = tsukleid[algus:lopp]
+        kuu_summad.append(sum(tulud[algus:lopp][kuu_tsukleid > 0].tolist()))
+        kuu_arvud.append(int(kuu_tsukleid.sum()))
+        uued_kuud.append((voti, str(kuu), kuu_rasi, kuu_summad[-1], kuu_arvud[-1]))
+
+    if arvutada or uued_kuud:
+        with hoidla['lukk'], hoidla['yhendus'] as yhendus:
+            yhendus.executemany(
+                'INSERT OR REPLACE INTO paevad VALUES (?, ?, ?, ?, ?)',
+                [(voti, paevad[d], rasid[d], float(tulud[d]), int(tsukleid[d])) for d in arvutada]
+            )
+            yhendus.executemany('INSERT OR REPLACE INTO kuud VALUES (?, ?, ?, ?, ?)', uued_kuud)
+    return tulud, tsukleid, kuu_summad, kuu_arvud, len(arvutada)
+
+
+def hinda_punkt_hoidlaga(hoidla, maatriks, punkt, mudel='tsukkel'):
+    """Nagu akupargi_simulatsioon.hinda_punkt, kuid hoidlat kasutades"""
+    if mudel not in INKREMENTAALSED_MUDELID:
+        return hinda_punkt(maatriks, punkt, mudel)
+    _, _, summad, arvud, _ = kuude_tulud_hoidlaga(hoidla, maatriks, mudel=mudel, **punkt)
+    return dict(punkt, kogutulu=float(sum(summad)), tsukleid=int(sum(arvud)), kuu_tulud=[float(s) for s in summad])
@@ -0,0 +1,126 @@
+"""
+Päevamaatriksi jagamine serveri töötajaprotsesside vahel.
+
+Parsitud hinnad (päevamaatriks koos päevaindeksiga) kirjutatakse üks kord
+faili ja iga töötaja kaardistab selle mällu ainult lugemiseks (mmap), nii et
+kõik protsessid kasutavad samu mälulehti ja mälukasutus ei kasva töötajate
+arvuga. Massiivid on failis 64 baidi piiril ja neid loetakse otse
+kaardistatud puhvrist (np.frombuffer); kirjutuskaitstud massiivi muutmise
+katse annab vea. Struktuur (sõnastikud, nimekirjad, arvud) on faili JSON
+päises.
+
+Faili paigutus: 8 baiti 'AKUMAATR', uint64 päise pikkus, JSON päis, massiivid.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+_MARK = b'AKUMAATR'
+_VERSIOON = 1
+_JOONDUS = 64
+FAILI_LAIEND = '.akm'
+
+
+def _lamenda(objekt, massiivid):
+    """Struktuur JSON-i jaoks; massiivid lisatakse nimekirja ja asendatakse viitega"""
+    if isinstance(objekt, np.ndarray):
+        if objekt.dtype.hasobject:
+            raise ValueError('Objektimassiive ei saa jagada')
+        massiivid.append(np.ascontiguousarray(objekt))
+        return {'massiiv': len(massiivid) - 1}
+    if isinstance(objekt, dict):
+        return {'sonastik': {nimi: _lamenda(v, massiivid) for nimi, v in objekt.items()}}
+    if isinstance(objekt, (list, tuple)):
+        return {'nimekiri': [_lamenda(v, massiivid) for v in objekt]}
+    if isinstance(objekt, np.generic):
+        objekt = objekt.item()
+    return {'vaartus': objekt}
+
+
+def _taasta(kirje, massiivid):
+    if 'massiiv' in kirje:
+        return massiivid[kirje['massiiv']]
+    if 'sonastik' in kirje:
+        return {nimi: _taasta(v, massiivid) for nimi, v in kirje['sonastik'].items()}
+    if 'nimekiri' in kirje:
+        return [_taasta(v, massiivid) for v in kirje['nimekiri']]
+    return kirje['vaartus']
+
+
+def jagatud_faili_nimi(*voti):
+    """Faili nimi, mis muutub koos võtmega (nt kaust ja hinnafailide signatuur)"""
+    rasi = hashlib.blake2b(repr((_VERSIOON,) + voti).encode('utf-8'), digest_size=8).hexdigest()
+    return f'hinnad-{rasi}{FAILI_LAIEND}'
+
+
+def kirjuta_maatriks(maatriks, failitee):
+    """
+    Kirjutab maatriksi (massiivide, arvude ja tekstidega sõnastik) faili. Kirjutatakse ajutisse
+    faili ja nimetatakse ümber, nii et teised protsessid ei näe kunagi poolikut faili.
+    """
+    massiivid = []
+    struktuur = _lamenda(maatriks, massiivid)
+    kirjeldused = []
+    nihe = 0
+    for massiiv in massiivid:
+        nihe += -nihe % _JOONDUS
+        kirjeldused.append({'dtype': massiiv.dtype.str, 'kuju': list(massiiv.shape), 'nihe': nihe})
+        nihe += massiiv.nbytes
+    paise_baidid = json.dumps({'struktuur': struktuur, 'massiivid': kirjeldused}).encode('utf-8')
+    algus = len(_MARK) + 8 + len(paise_baidid)
+    algus += -algus % _JOONDUS
+
+    ajutine = f'{failitee}.{os.getpid()}.tmp'
+    with open(ajutine, 'wb') as f:
+        f.write(_MARK)
+        f.write(struct.pack('<Q', len(paise_baidid)))
+        f.write(paise_baidid)
+        for massiiv, kirjeldus in zip(massiivid, kirjeldused):
+            f.seek(algus + kirjeldus['nihe'])
+            f.write(massiiv.tobytes())
+        f.truncate(algus + nihe)
+    os.replace(ajutine, failitee)
+
+
+def ava_maatriks(failitee):
+    """
+    Kaardistab kirjuta_maatriks faili mällu ainult lugemiseks ja tagastab maatriksi (massiivid on vaated).
+    Vigase või pooliku faili korral ValueError.
+    """
+    with open(failitee, 'rb') as f:
+        kaart = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if kaart[:len(_MARK)] != _MARK:
+        kaart.close()
+        raise ValueError(f'Pole jagatud maatriksi fail: {failitee}')
+    try:
+        paise_pikkus, = struct.unpack_from('<Q', kaart, len(_MARK))
+        paise_algus = len(_MARK) + 8
+        pais = json.loads(kaart[paise_algus:paise_algus + paise_pikkus])
+        algus = paise_algus + paise_pikkus
+        algus += -algus % _JOONDUS
+
+        massiivid = []
+        for kirjeldus in pais['massiivid']:
+            dtype = np.dtype(kirjeldus['dtype'])
+            arv = int(np.prod(kirjeldus['kuju'], dtype=np.int64))
+            massiivid.append(
+                np.frombuffer(kaart, dtype=dtype, count=arv, offset=algus + kirjeldus['nihe']).reshape(kirjeldus['kuju'])
+            )
+        return _taasta(pais['struktuur'], massiivid)
+    except (struct.error, KeyError, TypeError) as e:
+        # Poolik või muu vorminguga fail: kutsuja koostab maatriksi uuesti
+        raise ValueError(f'Vigane jagatud maatriksi fail {failitee}: {e}') from e
+
+
+def korista_vanad(kaust, jata_alles):
+    """Kustutab kaustast teised jagatud maatriksi failid (avatud kaardistused jäävad kehtima; Windowsis vahele)"""
+    for nimi in os.listdir(kaust):
+        if nimi.startswith('hinnad-') and nimi.endswith(FAILI_LAIEND) and nimi != jata_alles:
+            try:
+                os.remove(os.path.join(kaust, nimi))
+            except OSError:
+                pass
@@ -0,0 +1,228 @@
+"""
+Jõudlustestid sünteetiliste mitmeaastaste hinnaridadega.
+
+Genereerib seemne järgi korratava Põhjamaade-laadse hinnarea (hooajaline ja
+ööpäevane kuju, nädalavahetused, tuulerežiimid, negatiivsed hinnad, hinnapiigid)
+tunni- või 15-minutilise sammuga, kirjutab selle Tuulikutasu CSV failideks
+ja mõõdab iga etapi (lugemine, päevamaatriks, optimeerimine, /api/arvuta)
+aja, mälu tipu ja ridade arvu sekundis.
+
+Kasutamine:
+    python akupargi_joudlus.py --aastad 1 5 20 --slotid 60 15 --valjund bench_output.txt
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from akupargi_andmed import AJAVOOND, KOHALIKU_AJA_FORMAAT, koosta_paevamaatriks, loe_hinnad, loe_hinnafailid
+from akupargi_simulatsioon import MUDELID, VAIKIMISI, indekseeri, kuude_tulud, paevade_tulud
+
+# Nord Pool päev-ette turu hinnapiirid (EUR/MWh)
+MIN_HIND = -500.0
+MAX_HIND = 4000.0
+
+
+def genereeri_hinnad(aastaid, slotipikkus_min=60, seeme=0, algus='2024-01-01'):
+    """
+    Sünteetiline hinnarida alates algus (Eesti aja kesköö) aastaid aastat.
+    Tagastab (ajatemplid UTC sekundites, hinnad EUR/MWh).
+    """
+    rng = np.random.default_rng(seeme)
+    algus = pd.Timestamp(algus, tz=AJAVOOND)
+    lopp = algus + pd.DateOffset(years=aastaid)
+    samm = slotipikkus_min * 60
+    ajatemplid = np.arange(algus.tz_convert('UTC').value // 10**9, lopp.tz_convert('UTC').value // 10**9, samm)
+
+    kohalik = pd.to_datetime(ajatemplid, unit='s', utc=True).tz_convert(AJAVOOND)
+    tund = kohalik.hour.to_numpy() + kohalik.minute.to_numpy() / 60
+    paeva_nr = kohalik.dayofyear.to_numpy()
+    nadalavahetus = kohalik.dayofweek.to_numpy() >= 5
+    kuupaevad = kohalik.normalize().tz_localize(None).to_numpy()
+    paevad, paev = np.unique(kuupaevad, return_inverse=True)
+
+    # Hooaeg: talvel kallim, suvel päikese tõttu keskpäeval odavam
+    hooaeg = 85 + 35 * np.cos(2 * np.pi * (paeva_nr - 15) / 365.25)
+    paikese_tugevus = 35 * np.clip(np.sin(np.pi * (paeva_nr - 60) / 245), 0, None)
+
+    # Ööpäevane kuju: hommikune ja õhtune tipp, öine miinimum
+    kuju = (
+        30 * np.exp(-(tund - 8) ** 2 / (2 * 1.5 ** 2))
+        + 45 * np.exp(-(tund - 19) ** 2 / (2 * 2.0 ** 2))
+        - 18 * np.exp(-(tund - 3) ** 2 / (2 * 2.5 ** 2))
+        - paikese_tugevus * np.exp(-(tund - 13) ** 2 / (2 * 2.5 ** 2))
+    )
+
+    # Päevatasand: tuulerežiimid AR(1) protsessina, päeva volatiilsus lognormaalne
+    tuul = np.zeros(len(paevad))
+    muru = rng.normal(0, 15, len(paevad))
+    for d in range(1, len(paevad)):
+        tuul[d] = 0.8 * tuul[d - 1] + muru[d]
+    volatiilsus = rng.lognormal(0, 0.45, len(paevad))
+
+    hinnad = (
+        hooaeg
+        + tuul[paev]
+        + volatiilsus[paev] * kuju
+        - 12 * nadalavahetus
+        + rng.normal(0, 6 if slotipikkus_min >= 60 else 8, len(ajatemplid))
+    )
+
+    # Tuulised päikeselised päevad: hinnad kukuvad keskpäeval alla nulli
+    ulejaak = (tuul < -30) & (rng.random(len(paevad)) < 0.5)
+    hinnad -= ulejaak[paev] * paikese_tugevus * np.exp(-(tund - 13) ** 2 / (2 * 2.0 ** 2))
+
+    # Hinnapiigid (raske saba), sagedamini talvistel tipptundidel
+    piigi_toenaosus = 0.002 * (1 + (hooaeg > 90)) * (1 + 2 * ((tund >= 7) & (tund < 10) | (tund >= 17) & (tund < 21)))
+    piigid = rng.random(len(ajatemplid)) < piigi_toenaosus * slotipikkus_min / 60
+    hinnad[piigid] += 150 * (1 + rng.pareto(2.5, piigid.sum()))
+
+    return ajatemplid, np.round(np.clip(hinnad, MIN_HIND, MAX_HIND), 2)
+
+
+def kirjuta_csv_failid(kaust, ajatemplid, hinnad):
+    """
+    Kirjutab hinnarea kvartalite kaupa faili 'Tuulikutasu <aasta> <kvartal> KV.csv'
+    (Ajatempel (UTC);Kuupäev (Eesti aeg);NPS Eesti, cp1252, kümnendkoma, keskmise rida lõpus).
+    Tagastab failide nimekirja.
+    """
+    kohalik = pd.to_datetime(ajatemplid, unit='s', utc=True).tz_convert(AJAVOOND).tz_localize(None)
+    df = pd.DataFrame({
+        'Ajatempel (UTC)': ajatemplid,
+        'Kuupäev (Eesti aeg)': kohalik.strftime(KOHALIKU_AJA_FORMAAT),
+        'NPS Eesti': hinnad,
+    })
+    failid = []
+    for (aasta, kvartal), osa in df.groupby([kohalik.year, kohalik.quarter], sort=True):
+        fail = os.path.join(kaust, f"Tuulikutasu {aasta} {'I' * kvartal if kvartal < 4 else 'IV'} KV.csv")
+        with open(fail, 'w', encoding='cp1252', newline='') as f:
+            osa.to_csv(f, sep=';', decimal=',', index=False, lineterminator='\n')
+            f.write(f";Keskmine;{osa['NPS Eesti'].mean():.2f} €\n".replace('.', ','))
+        failid.append(fail)
+    return failid
+
+
+def mooda(funktsioon, korduseid=1):
+    """
+    Käivitab funktsiooni: aeg on parim korduseid käivitusest, mälu tipp (MB) mõõdetakse
+    eraldi käivitusel tracemalloc'iga. Tagastab (aeg_s, tipp_mb, tulemus).
+    """
+    tracemalloc.start()
+    try:
+        tulemus = funktsioon()
+        tipp = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    aeg = float('inf')
+    for _ in range(korduseid):
+        algus = time.perf_counter()
+        tulemus = funktsioon()
+        aeg = min(aeg, time.perf_counter() - algus)
+    return aeg, tipp / 2**20, tulemus
+
+
+def _api_paring(klient, keha):
+    vastus = klient.post('/api/arvuta', json=keha)
+    if vastus.status_code != 200:
+        raise RuntimeError(vastus.get_json().get('error'))
+    return vastus.get_json()
+
+
+def jooksuta(aastaid, slotipikkus_min, seeme=0, mudelid=('tsukkel',), korduseid=3, api=True, kaust=None):
+    """Üks jõudlustest (aastaid, sloti pikkus); tagastab ridade nimekirja (etapp, aeg_s, tipp_mb, read/s)"""
+    ajatemplid, hinnad = genereeri_hinnad(aastaid, slotipikkus_min, seeme)
+    ridu = len(ajatemplid)
+    tulemused = []
+
+    def lisa(etapp, aeg, tipp):
+        tulemused.append((etapp, aeg, tipp, ridu / aeg if aeg > 0 else float('inf')))
+
+    if kaust:
+        os.makedirs(kaust, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=kaust) as ajutine:
+        csv_failid = kirjuta_csv_failid(ajutine, ajatemplid, hinnad)
+
+        aeg, tipp, _ = mooda(lambda: [loe_hinnad(fail) for fail in csv_failid], korduseid)
+        lisa('loe_hinnad (järjest)', aeg, tipp)
+        aeg, tipp, kogu_df = mooda(lambda: loe_hinnafailid(csv_failid), korduseid)
+        lisa('loe_hinnafailid', aeg, tipp)
+        if len(kogu_df) != ridu:
+            raise RuntimeError(f'Loeti {len(kogu_df)} rida, oodati {ridu}')
+
+        aeg, tipp, maatriks = mooda(lambda: koosta_paevamaatriks(kogu_df), korduseid)
+        lisa('koosta_paevamaatriks', aeg, tipp)
+        aeg, tipp, _ = mooda(lambda: indekseeri(maatriks), korduseid)
+        lisa('indekseeri', aeg, tipp)
+
+        parameetrid = {k: v for k, v in VAIKIMISI.items() if k != 'max_tsukleid_paevas'}
+        for mudel in mudelid:
+            aeg, tipp, (tulud, tsukleid) = mooda(lambda: paevade_tulud(maatriks, mudel=mudel, **parameetrid), korduseid)
+            lisa(f'optimeerimine ({mudel})', aeg, tipp)
+            aeg, tipp, _ = mooda(lambda: kuude_tulud(maatriks, tulud, tsukleid), korduseid)
+            lisa(f'kuude_tulud ({mudel})', aeg, tipp)
+
+        if api:
+            import app as rakendus
+            rakendus.app.config['ANDMETE_KAUST'] = ajutine
+            rakendus.app.config['HINNA_HETKTOMMIS'] = False
+            vahemalu_suurus = rakendus.app.config['TULEMUSTE_VAHEMALU_SUURUS']
+            klient = rakendus.app.test_client()
+            for mudel in mudelid:
+                def kulm_paring():
+                    rakendus._hinnad_vahemalus['signatuur'] = None
+                    return _api_paring(klient, {'mudel': mudel})
+                # Külm ja soe päring arvutavad tulemuse, vahemälust päring loeb valmis vastuse
+                rakendus.app.config['TULEMUSTE_VAHEMALU_SUURUS'] = 0
+                aeg, tipp, _ = mooda(kulm_paring, 1)
+                lisa(f'/api/arvuta külm ({mudel})', aeg, tipp)
+                aeg, tipp, _ = mooda(lambda: _api_paring(klient, {'mudel': mudel}), korduseid)
+                lisa(f'/api/arvuta soe ({mudel})', aeg, tipp)
+                rakendus.app.config['TULEMUSTE_VAHEMALU_SUURUS'] = vahemalu_suurus
+                _api_paring(klient, {'mudel': mudel})
+                aeg, tipp, _ = mooda(lambda: _api_paring(klient, {'mudel': mudel}), korduseid)
+                lisa(f'/api/arvuta vahemälust ({mudel})', aeg, tipp)
+            rakendus._hinnad_vahemalus.update(signatuur=None, kogu_df=None, maatriks=None)
+    return ridu, tulemused
+
+
+def vorminda(aastaid, slotipikkus_min, ridu, tulemused):
+    """Ühe testi tulemuste tabel tekstina"""
+    read = [
+        f"{aastaid} a, {slotipikkus_min} min slotid, {ridu} rida",
+        f"  {'Etapp':<32} {'Aeg (ms)':>12} {'Mälu tipp (MB)':>16} {'Rida/s':>14}",
+    ]
+    for etapp, aeg, tipp, kiirus in tulemused:
+        read.append(f"  {etapp:<32} {aeg * 1000:>12.1f} {tipp:>16.1f} {kiirus:>14,.0f}")
+    return "\n".join(read)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Akupargi simulaatori jõudlustestid')
+    parser.add_argument('--aastad', type=int, nargs='+', default=[1, 5, 20])
+    parser.add_argument('--slotid', type=int, nargs='+', default=[60, 15], help='Sloti pikkus minutites')
+    parser.add_argument('--mudelid', nargs='+', default=['tsukkel'], choices=MUDELID)
+    parser.add_argument('--seeme', type=int, default=0)
+    parser.add_argument('--korduseid', type=int, default=3, help='Aeg on parim nii mitmest käivitusest')
+    parser.add_argument('--ilma-api', action='store_true', help='Jäta /api/arvuta mõõtmine vahele')
+    parser.add_argument('--kaust', default=None, help='Ajutiste CSV failide asukoht')
+    parser.add_argument('--valjund', default=None, help='Lisa tulemused ka sellesse faili')
+    argumendid = parser.parse_args()
+
+    print(f"Python {sys.version.split()[0]}, NumPy {np.__version__}, pandas {pd.__version__}, {os.cpu_count()} CPU")
+    for aastaid in argumendid.aastad:
+        for slotipikkus_min in argumendid.slotid:
+            ridu, tulemused = jooksuta(
+                aastaid, slotipikkus_min, argumendid.seeme, argumendid.mudelid,
+                argumendid.korduseid, not argumendid.ilma_api, argumendid.kaust
+            )
+            tekst = vorminda(aastaid, slotipikkus_min, ridu, tulemused)
+            print(tekst + "\n")
+            if argumendid.valjund:
+                with open(argumendid.valjund, 'a', encoding='utf-8') as f:
+                    f.write(tekst + "\n\n")
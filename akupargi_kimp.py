@@ -0,0 +1,135 @@
+"""
+Staatilise lehe (Vercel'i index.html) hinnakimp.
+
+Ehitussamm loeb Tuulikutasu CSV failid (loe_hinnad) ja kirjutab ühe
+kompaktse binaarfaili, mille leht laeb CSV failide allalaadimise ja
+parsimise asemel. Hinnad on ühtlasel UTC ajavõrel (algus + i * slotipikkus,
+pikemad read korratakse lühima sloti pikkuseni, puuduvad kohad NaN), lisaks
+iga Eesti kalendripäeva algus ja pikkus võrel ning valikuliselt iga päeva
+slotid hinna järgi kasvavas järjekorras.
+
+Faili paigutus (little-endian):
+    4 baiti       'AKUH'
+    uint32        versioon (KIMBU_VERSIOON)
+    uint32        päise pikkus baitides
+    päis          JSON: algus (UTC sekundid), slotipikkus_s, ridu, paevi, jarjestus, ajavoond, allikad
+                  (täidetud tühikutega 4 baidi piirini)
+    float32[ridu] hinnad
+    int32[paevi]  päevad (päevi alates 1970-01-01)
+    uint32[paevi] päeva esimese sloti indeks võrel
+    uint16[paevi] päeva slottide arv
+    (uint16[sum(pikkused)] päeva slotid hinna järgi kasvavalt, kui jarjestus)
+
+Kasutamine:
+    python akupargi_kimp.py --kaust . --valjund hinnad.bin --jarjestus
+    python akupargi_kimp.py --jarjestus --kontrolli   # väljumiskood 1, kui fail on vananenud
+"""
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+
+from akupargi_andmed import AJAVOOND, koosta_paevamaatriks, loe_hinnafailid
+from akupargi_simulatsioon import hinnafailid
+
+KIMBU_MARK = b'AKUH'
+KIMBU_VERSIOON = 1
+KIMBU_FAIL = 'hinnad.bin'
+
+
+def koosta_kimp(kogu_df, allikad=(), jarjestus=False):
+    """loe_hinnafailid tulemusest kimbu baidid"""
+    maatriks = koosta_paevamaatriks(kogu_df)
+    slotipikkus = int(round(float(maatriks['slotipikkused'].min()) * 3600)) if len(maatriks['paevad']) else 3600
+    kordused = np.repeat(np.rint(maatriks['slotipikkused'] * 3600 / slotipikkus).astype(int), maatriks['pikkused'])
+
+    algus = int(maatriks['ajatemplid'][0]) if len(kordused) else 0
+    koht = (maatriks['ajatemplid'] - algus) // slotipikkus
+    ridu = int(koht[-1] + kordused[-1]) if len(kordused) else 0
+    hinnad = np.full(ridu, np.nan, dtype=np.float32)
+    nihe = np.arange(kordused.sum()) - np.repeat(np.cumsum(kordused) - kordused, kordused)
+    hinnad[np.repeat(koht, kordused) + nihe] = np.repeat(maatriks['hinnad'][maatriks['kehtiv']], kordused)
+
+    viimased = maatriks['algused'] + maatriks['pikkused'] - 1
+    paevade_algused = koht[maatriks['algused']].astype(np.uint32)
+    paevade_pikkused = (koht[viimased] + kordused[viimased] - koht[maatriks['algused']]).astype(np.uint16)
+
+    paev = {
+        'algus': algus,
+        'slotipikkus_s': slotipikkus,
+        'ridu': ridu,
+        'paevi': len(maatriks['paevad']),
+        'jarjestus': bool(jarjestus),
+        'ajavoond': AJAVOOND,
+        'allikad': [os.path.basename(fail) for fail in allikad],
+    }
+    paise_baidid = json.dumps(paev, ensure_ascii=False).encode('utf-8')
+    paise_baidid += b' ' * (-len(paise_baidid) % 4)
+
+    osad = [
+        KIMBU_MARK, struct.pack('<II', KIMBU_VERSIOON, len(paise_baidid)), paise_baidid,
+        hinnad.astype('<f4').tobytes(),
+        maatriks['paevad'].astype('int64').astype('<i4').tobytes(),
+        paevade_algused.astype('<u4').tobytes(),
+        paevade_pikkused.astype('<u2').tobytes(),
+    ]
+    if jarjestus:
+        # NaN (puuduv hind) on päeva lõpus, võrdsed hinnad ajalises järjekorras
+        osad.extend(
+            np.argsort(hinnad[a:a + n], kind='stable').astype('<u2').tobytes()
+            for a, n in zip(paevade_algused.tolist(), paevade_pikkused.tolist())
+        )
+    return b''.join(osad)
+
+
+def loe_kimp(andmed):
+    """Kimbu baidid sõnastikuks: päise väljad ning hinnad, paevad, paevade_algused, paevade_pikkused (ja jarjestus)"""
+    if andmed[:4] != KIMBU_MARK:
+        raise ValueError('Pole akupargi hinnakimp')
+    versioon, paise_pikkus = struct.unpack_from('<II', andmed, 4)
+    if versioon != KIMBU_VERSIOON:
+        raise ValueError(f'Toetamata kimbu versioon: {versioon}')
+    kimp = json.loads(andmed[12:12 + paise_pikkus])
+    asukoht = 12 + paise_pikkus
+    for nimi, tyyp, arv in (
+        ('hinnad', '<f4', kimp['ridu']), ('paevad', '<i4', kimp['paevi']),
+        ('paevade_algused', '<u4', kimp['paevi']), ('paevade_pikkused', '<u2', kimp['paevi']),
+    ):
+        kimp[nimi] = np.frombuffer(andmed, dtype=tyyp, count=arv, offset=asukoht)
+        asukoht += kimp[nimi].nbytes
+    kimp['paevad'] = kimp['paevad'].astype('datetime64[D]')
+    if kimp['jarjestus']:
+        kimp['jarjestus'] = np.frombuffer(andmed, dtype='<u2', count=int(kimp['paevade_pikkused'].sum()), offset=asukoht)
+    return kimp
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Staatilise lehe hinnakimbu ehitamine')
+    parser.add_argument('--kaust', default=os.path.dirname(os.path.abspath(__file__)), help='Hinnafailide kaust')
+    parser.add_argument('--failid', default='Tuulikutasu*.csv', help='Hinnafailide mustrid (komaga eraldatud)')
+    parser.add_argument('--valjund', default=None, help=f'Kimbu fail (vaikimisi kausta {KIMBU_FAIL})')
+    parser.add_argument('--jarjestus', action='store_true', help='Lisa iga päeva slotid hinna järgi kasvavalt')
+    parser.add_argument('--kontrolli', action='store_true',
+                        help='Ära kirjuta, vaid kontrolli, et kimbu fail vastab hinnafailidele')
+    argumendid = parser.parse_args()
+
+    csv_failid = hinnafailid(argumendid.failid.split(','), argumendid.kaust)
+    kogu_df = loe_hinnafailid(csv_failid)
+    if kogu_df.empty:
+        raise SystemExit('Andmeid ei leitud!')
+
+    valjund = argumendid.valjund or os.path.join(argumendid.kaust, KIMBU_FAIL)
+    andmed = koosta_kimp(kogu_df, csv_failid, argumendid.jarjestus)
+    if argumendid.kontrolli:
+        olemas = open(valjund, 'rb').read() if os.path.exists(valjund) else None
+        if olemas != andmed:
+            raise SystemExit(f'{valjund} ei vasta hinnafailidele, ehita see uuesti: python akupargi_kimp.py'
+                             + (' --jarjestus' if argumendid.jarjestus else ''))
+        print(f'{valjund} on ajakohane')
+        raise SystemExit(0)
+    with open(valjund, 'wb') as f:
+        f.write(andmed)
+    csv_maht = sum(os.path.getsize(fail) for fail in csv_failid)
+    print(f"{len(csv_failid)} faili ({csv_maht / 1024:.0f} KB) -> {valjund} ({len(andmed) / 1024:.0f} KB)")
@@ -0,0 +1,175 @@
+"""
+/api/arvuta koormustest mitme töötajaprotsessiga serveril.
+
+Käivitab iga --tootajaid väärtuse jaoks gunicorni (gunicorn.conf.py, jagatud
+hinnafail) ja saadab --kestus sekundi jooksul --kliente paralleelset
+päringut juhuslike parameetritega (tulemuste vahemälu on väljas). Mõõdab
+päringuid sekundis, latentsuse protsentiile, vigu ning serveri
+protsessipuu mälu (RSS ja PSS; PSS jagab ühised lehed protsesside vahel, nii
+et jagatud hinnafail loetakse üks kord). --url korral testitakse juba
+töötavat serverit.
+
+Kasutamine:
+    python akupargi_koormus.py --tootajaid 1 2 4 8 --kliente 16 --kestus 20
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+KAUST = os.path.dirname(os.path.abspath(__file__))
+
+
+def juhuslikud_parameetrid(rng):
+    return {
+        'aku_voimsus_mw': rng.choice([10, 25, 50, 75, 100]),
+        'aku_mahtuvus_mwh': rng.choice([50, 100, 200, 400]),
+        'efektiivsus': round(rng.uniform(0.8, 0.95), 3),
+        'max_aeg_vahel': rng.randint(2, 12),
+    }
+
+
+def saada(url, andmed, ajapiir=120):
+    paring = urllib.request.Request(
+        url, data=json.dumps(andmed).encode('utf-8'), headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(paring, timeout=ajapiir) as vastus:
+        vastus.read()
+        return vastus.status
+
+
+def koormus(url, kliente, kestus, seeme=0):
+    """kliente lõime saadavad päringuid kestus sekundit; tagastab (päringud sekundis, latentsused, vead)"""
+    latentsused = []
+    vead = []
+    lukk = threading.Lock()
+    lopp = time.perf_counter() + kestus
+
+    def klient(i):
+        rng = random.Random(seeme * 1000 + i)
+        while time.perf_counter() < lopp:
+            algus = time.perf_counter()
+            try:
+                saada(url, juhuslikud_parameetrid(rng))
+            except (urllib.error.URLError, OSError) as e:
+                with lukk:
+                    vead.append(str(e))
+                continue
+            with lukk:
+                latentsused.append(time.perf_counter() - algus)
+
+    algus = time.perf_counter()
+    loimed = [threading.Thread(target=klient, args=(i,)) for i in range(kliente)]
+    for loim in loimed:
+        loim.start()
+    for loim in loimed:
+        loim.join()
+    return len(latentsused) / (time.perf_counter() - algus), np.array(latentsused), vead
+
+
+def _alamprotsessid(pid):
+    lapsed = []
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            lapsed = [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    return [pid] + [alam for laps in lapsed for alam in _alamprotsessid(laps)]
+
+
+def protsessipuu_malu(pid):
+    """Protsessi ja tema alamprotsesside (RSS, PSS) MB-des /proc/<pid>/smaps_rollup järgi; muidu (None, None)"""
+    rss = pss = 0
+    for alam in _alamprotsessid(pid):
+        try:
+            with open(f'/proc/{alam}/smaps_rollup') as f:
+                for rida in f:
+                    nimi, _, vaartus = rida.partition(':')
+                    if nimi in ('Rss', 'Pss'):
+                        kb = int(vaartus.split()[0])
+                        rss += kb if nimi == 'Rss' else 0
+                        pss += kb if nimi == 'Pss' else 0
+        except OSError:
+            return None, None
+    return rss / 1024, pss / 1024
+
+
+def vaba_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def oota_serverit(url, protsess, ajapiir=300):
+    lopp = time.time() + ajapiir
+    while time.time() < lopp:
+        if protsess.poll() is not None:
+            raise RuntimeError(f'Server lõpetas koodiga {protsess.returncode}')
+        try:
+            saada(url, {})
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.5)
+    raise RuntimeError('Server ei käivitunud')
+
+
+def kaivita_server(tootajaid, port, kaust):
+    keskkond = dict(os.environ, AKUPARK_TULEMUSTE_VAHEMALU_SUURUS='0', AKUPARK_ANDMETE_KAUST=kaust)
+    kasu = [
+        sys.executable, '-m', 'gunicorn', '-c', os.path.join(KAUST, 'gunicorn.conf.py'),
+        '-w', str(tootajaid), '-b', f'127.0.0.1:{port}', 'app:app',
+    ]
+    return subprocess.Popen(kasu, cwd=KAUST, env=keskkond, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def rida(nimi, kiirus, latentsused, vead, malu=(None, None), alus=None):
+    p50, p95 = (np.percentile(latentsused, [50, 95]) * 1000) if len(latentsused) else (float('nan'),) * 2
+    skaleerumine = f'{kiirus / alus:5.2f}x' if alus else '    - '
+    rss, pss = malu
+    malu_tekst = f'{rss:8.0f} {pss:8.0f}' if rss is not None else f'{"-":>8} {"-":>8}'
+    return f'{nimi:>9} {kiirus:9.2f} {skaleerumine} {p50:9.1f} {p95:9.1f} {len(vead):6d} {malu_tekst}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='/api/arvuta koormustest')
+    parser.add_argument('--tootajaid', type=int, nargs='+', default=[1, os.cpu_count() or 1],
+                        help='Gunicorni töötajate arvud')
+    parser.add_argument('--kliente', type=int, default=None, help='Paralleelseid kliente (vaikimisi 2 x töötajaid)')
+    parser.add_argument('--kestus', type=float, default=20, help='Mõõtmise kestus sekundites')
+    parser.add_argument('--kaust', default=KAUST, help='Hinnafailide kaust')
+    parser.add_argument('--url', default=None, help='Juba töötava serveri aadress (nt http://127.0.0.1:5000)')
+    argumendid = parser.parse_args()
+
+    print(f'{"tootajaid":>9} {"paringut/s":>9} {"skaal":>6} {"p50 ms":>9} {"p95 ms":>9} {"vigu":>6} '
+          f'{"RSS MB":>8} {"PSS MB":>8}  (tuumi {os.cpu_count()})')
+    if argumendid.url:
+        url = argumendid.url.rstrip('/') + '/api/arvuta'
+        kiirus, latentsused, vead = koormus(url, argumendid.kliente or 8, argumendid.kestus)
+        print(rida('-', kiirus, latentsused, vead))
+        sys.exit(0)
+
+    alus = None
+    for tootajaid in argumendid.tootajaid:
+        port = vaba_port()
+        url = f'http://127.0.0.1:{port}/api/arvuta'
+        server = kaivita_server(tootajaid, port, argumendid.kaust)
+        try:
+            oota_serverit(url, server)
+            # Soojendus: iga töötaja laeb rakenduse ja kaardistab hinnafaili
+            koormus(url, 2 * tootajaid, 2)
+            kiirus, latentsused, vead = koormus(url, argumendid.kliente or 2 * tootajaid, argumendid.kestus)
+            malu = protsessipuu_malu(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+        alus = alus or kiirus / tootajaid
+        print(rida(tootajaid, kiirus, latentsused, vead, malu, alus))
@@ -0,0 +1,894 @@
+"""
+Akupargi optimeerimise massiivimootor.
+
+Töötab tavaliste float massiividega: üks rida = üks päev, üks veerg = üks
+slot (päeva sees positsiooni järgi). Sloti pikkus (tundides, vaikimisi 1)
+võib olla päeviti erinev, nt 15-minutilised päevad kõrvuti tunnipõhistega;
+energia sloti kohta ja max_aeg_vahel (tundides) teisendatakse slottideks.
+Kõik päevad arvutatakse korraga, ilma tunnipõhiste Pythoni tsükliteta.
+"""
+from collections import deque
+from fractions import Fraction
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# optimeeri_paevad vahemassiivide (päevad × slotid × slotid) suurus ploki kohta
+_PLOKI_ELEMENTE = 4 << 20
+
+
+def _libisevad_summad(hinnad, laius):
+    """
+    Libiseva akna summad iga päeva kohta: tulemus[:, s] = hinnad[:, s] + ... + hinnad[:, s + laius - 1].
+    Liidame samas järjekorras nagu Pythoni sum(), et tulemus oleks bitipealt sama.
+    """
+    akende_arv = hinnad.shape[1] - laius + 1
+    summad = np.zeros((hinnad.shape[0], akende_arv))
+    for k in range(laius):
+        summad = summad + hinnad[:, k:k + akende_arv]
+    return summad
+
+
+def _jarjestikune_summa(hinnad, indeksid):
+    """Summeerib hinnad[:, indeksid[..., k]] järjest üle viimase telje"""
+    summa = np.zeros(indeksid.shape[:-1])
+    for k in range(indeksid.shape[-1]):
+        summa = summa + np.take_along_axis(hinnad, indeksid[..., k], axis=1)
+    return summa
+
+
+def _paevad_pikkuse_jargi(hinnad, pikkused, slotipikkus_h=1.0):
+    """
+    Rühmitab päevad slottide arvu ja sloti pikkuse järgi, et iga rühma saaks arvutada ühe maatriksina.
+    Annab (read, hinnad, sloti pikkus tundides).
+    """
+    hinnad = np.asarray(hinnad, dtype=float)
+    if hinnad.ndim == 1:
+        hinnad = hinnad[np.newaxis, :]
+    if pikkused is None:
+        pikkused = np.full(hinnad.shape[0], hinnad.shape[1])
+    pikkused = np.asarray(pikkused)
+    slotipikkused = np.broadcast_to(np.asarray(slotipikkus_h, dtype=float), pikkused.shape)
+    for n in np.unique(pikkused):
+        for dt in np.unique(slotipikkused[pikkused == n]):
+            read = np.flatnonzero((pikkused == n) & (slotipikkused == dt))
+            yield read, hinnad[read, :n], float(dt)
+
+
+def _slotte(tunnid, slotipikkus_h):
+    """Tundides antud kestus slottides (max_aeg_vahel jms), poolik slot ümardatakse üles nagu staatilisel lehel"""
+    return int(np.floor(tunnid / slotipikkus_h + 0.5))
+
+
+def _optimeeri_rühm(hinnad, aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, max_aeg_vahel, slotipikkus_h=1.0):
+    """Ühepikkuste päevade optimeerimine (max_aeg_vahel slottides), vt optimeeri_paevad"""
+    paevi, n = hinnad.shape
+    slotienergia = aku_voimsus_mw * slotipikkus_h
+    laadimise_tunnid = int(np.ceil(aku_mahtuvus_mwh / slotienergia))
+    tuhjendamise_tunnid = int(np.ceil(aku_mahtuvus_mwh * efektiivsus / slotienergia))
+    tagastatav_energia = laadimise_tunnid * slotienergia * efektiivsus
+
+    laadimine = np.full((paevi, laadimise_tunnid), -1)
+    tuhjendamine = np.full((paevi, tuhjendamise_tunnid), -1)
+    tulu = np.zeros(paevi)
+    if n < 2 or laadimise_tunnid > n or tuhjendamise_tunnid > min(max_aeg_vahel, n - 1):
+        return laadimine, tuhjendamine, tulu
+
+    # Laadimine: järjestikune aken iga alguse kohta vs päeva odavaimad tunnid
+    alguste_arv = n - laadimise_tunnid + 1
+    kulu_jarjestikune = _libisevad_summad(hinnad, laadimise_tunnid) * slotienergia
+    odavaimad = np.argsort(hinnad, axis=1, kind='stable')[:, :laadimise_tunnid]
+    kulu_odavaimad = _jarjestikune_summa(hinnad, odavaimad[:, np.newaxis, :])[:, 0] * slotienergia
+
+    odavaimad_valitud = kulu_odavaimad[:, np.newaxis] < kulu_jarjestikune
+    laadimise_kulu = np.where(odavaimad_valitud, kulu_odavaimad[:, np.newaxis], kulu_jarjestikune)
+    laadimise_lopp = np.where(
+        odavaimad_valitud,
+        odavaimad.max(axis=1)[:, np.newaxis],
+        np.arange(alguste_arv) + laadimise_tunnid - 1,
+    )
+
+    # Tühjendamise aken iga võimaliku laadimise lõpu kohta: [lopp + 1, min(lopp + max_aeg_vahel + 1, n))
+    akna_indeksid = np.arange(n)[:, np.newaxis] + 1 + np.arange(min(max_aeg_vahel, n - 1))
+    akna_kehtiv = akna_indeksid < n
+    akna_hinnad = np.where(akna_kehtiv, hinnad[:, np.minimum(akna_indeksid, n - 1)], -np.inf)
+    kallimad = np.argsort(-akna_hinnad, axis=2, kind='stable')[:, :, :tuhjendamise_tunnid]
+    kallimad = kallimad + np.arange(n)[:, np.newaxis] + 1
+    kallimate_summa = _jarjestikune_summa(hinnad, np.minimum(kallimad, n - 1))
+    tulu_kallimad = tagastatav_energia * (kallimate_summa / tuhjendamise_tunnid)
+
+    tulu_jarjestikune = tagastatav_energia * (_libisevad_summad(hinnad, tuhjendamise_tunnid) / tuhjendamise_tunnid)
+
+    # Kõik (laadimise algus, tühjendamise algus) paarid korraga
+    tuhjendamise_algus = np.arange(n - tuhjendamise_tunnid + 1)
+    aken_algus = laadimise_lopp + 1
+    aken_lopp = np.minimum(laadimise_lopp + max_aeg_vahel + 1, n)
+    kehtiv = (
+        (tuhjendamise_algus >= aken_algus[:, :, np.newaxis])
+        & (tuhjendamise_algus <= (aken_lopp - tuhjendamise_tunnid)[:, :, np.newaxis])
+    )
+    tulu_kallimad_s = np.take_along_axis(tulu_kallimad, laadimise_lopp, axis=1)[:, :, np.newaxis]
+    kallimad_valitud = tulu_kallimad_s > tulu_jarjestikune[:, np.newaxis, :]
+    paari_tulu = np.where(kallimad_valitud, tulu_kallimad_s, tulu_jarjestikune[:, np.newaxis, :]) - laadimise_kulu[:, :, np.newaxis]
+    paari_tulu = np.where(kehtiv, paari_tulu, -np.inf).reshape(paevi, -1)
+
+    # argmax annab esimese maksimumi, nagu range-tsükkel rangelt suurema võrdlusega
+    parim = np.argmax(paari_tulu, axis=1)
+    leitud = np.isfinite(paari_tulu[np.arange(paevi), parim])
+    s, t = np.divmod(parim, len(tuhjendamise_algus))
+    d = np.flatnonzero(leitud)
+    s, t = s[leitud], t[leitud]
+
+    laadimine[d] = np.where(
+        odavaimad_valitud[d, s][:, np.newaxis],
+        odavaimad[d],
+        s[:, np.newaxis] + np.arange(laadimise_tunnid),
+    )
+    e = laadimise_lopp[d, s]
+    tuhjendamine[d] = np.where(
+        kallimad_valitud[d, s, t][:, np.newaxis],
+        kallimad[d, e],
+        t[:, np.newaxis] + np.arange(tuhjendamise_tunnid),
+    )
+    tulu[d] = paari_tulu[d, parim[d]]
+    return laadimine, tuhjendamine, tulu
+
+
+def _horeda_tabel(x):
+    """
+    Hõre tabel lõigu maksimumi päringuteks: tabel[:, k, i] on esimese maksimumi indeks
+    lõigus x[:, i:i + 2**k] (read eraldi). Kasutamata kohad on 0.
+    """
+    paevi, m = x.shape
+    tasemeid = max(1, m.bit_length())
+    tabel = np.zeros((paevi, tasemeid, m), dtype=np.int16)
+    tabel[:, 0] = np.arange(m)
+    read = np.arange(paevi)[:, np.newaxis]
+    for k in range(1, tasemeid):
+        laius = m - (1 << k) + 1
+        vasak = tabel[:, k - 1, :laius]
+        parem = tabel[:, k - 1, (1 << (k - 1)):(1 << (k - 1)) + laius]
+        tabel[:, k, :laius] = np.where(x[read, parem] > x[read, vasak], parem, vasak)
+    return tabel
+
+
+def _lõigu_argmax(x, tabel, algus, lopp):
+    """Esimese maksimumi indeks lõikudes x[d, algus:lopp + 1] (algus, lopp: päevad × K, lopp >= algus)"""
+    read = np.arange(x.shape[0])[:, np.newaxis]
+    k = np.log2(lopp - algus + 1).astype(int)
+    vasak = tabel[read, k, algus]
+    parem = tabel[read, k, lopp - (1 << k) + 1]
+    return np.where(x[read, parem] > x[read, vasak], parem, vasak)
+
+
+def koosta_paevaindeks(hinnad, pikkused=None, slotipikkus_h=1.0):
+    """
+    Parameetritest sõltumatu päevade indeks optimeeri_paevad jaoks. Ehitatakse hindade laadimisel
+    üks kord; iga päring (võimsus, mahtuvus, efektiivsus, max_aeg_vahel) loeb sellest ainult
+    vajalikud veerud, ilma päeva slotte uuesti sorteerimata.
+
+    Päevad rühmitatakse nagu _paevad_pikkuse_jargi; iga rühma kohta:
+        kasvav, kahanev     - slotid hinna järgi (stabiilne järjestus)
+        odavaimate_summad   - k odavaima sloti hinnasumma (prefikssumma kasvavas järjestuses)
+        odavaimate_lopp     - k odavaima sloti hiliseim indeks
+        kohad               - iga sloti koht kahanevas järjestuses
+        kahanevad_hinnad    - hinnad kahanevas järjestuses
+        max_tabel           - hõre tabel lõigu kalleima sloti leidmiseks
+    """
+    hinnad = np.asarray(hinnad, dtype=float)
+    paevi = 1 if hinnad.ndim == 1 else hinnad.shape[0]
+    rühmad = []
+    for read, rühm, dt in _paevad_pikkuse_jargi(hinnad, pikkused, slotipikkus_h):
+        kasvav = np.argsort(rühm, axis=1, kind='stable')
+        kahanev = np.argsort(-rühm, axis=1, kind='stable')
+        # Järjestikune liitmine alates nullist nagu _jarjestikune_summa, et tulemus oleks bitipealt sama
+        odavaimad = np.take_along_axis(rühm, kasvav, axis=1)
+        odavaimate_summad = np.cumsum(np.hstack([np.zeros((len(read), 1)), odavaimad]), axis=1)[:, 1:]
+        rühmad.append({
+            'read': read,
+            'hinnad': rühm,
+            'dt': dt,
+            'kasvav': kasvav.astype(np.int16),
+            'kahanev': kahanev.astype(np.int16),
+            'kohad': np.argsort(kahanev, axis=1).astype(np.int16),
+            'odavaimate_summad': odavaimate_summad,
+            'odavaimate_lopp': np.maximum.accumulate(kasvav, axis=1).astype(np.int16),
+            'kahanevad_hinnad': np.take_along_axis(rühm, kahanev, axis=1),
+            'max_tabel': _horeda_tabel(rühm),
+        })
+    return {'paevi': paevi, 'lyhim': float(np.min(slotipikkus_h)), 'rühmad': rühmad}
+
+
+def vali_indeks(indeks, read):
+    """koosta_paevaindeks ainult päevadega read (kasvavas järjekorras indeksid); tulemuse päevad on 0..len(read) - 1"""
+    read = np.asarray(read, dtype=int)
+    rühmad = []
+    for rühm in indeks['rühmad']:
+        valik = np.isin(rühm['read'], read)
+        if valik.any():
+            valitud = {nimi: v if nimi == 'dt' else v[valik] for nimi, v in rühm.items()}
+            valitud['read'] = np.searchsorted(read, rühm['read'][valik])
+            rühmad.append(valitud)
+    return {'paevi': len(read), 'lyhim': indeks['lyhim'], 'rühmad': rühmad}
+
+
+def _kallimate_kohad(rühm, tuhjendamise_tunnid, max_aeg_vahel):
+    """
+    Iga laadimise lõpu e kohta aknasse (e, e + max_aeg_vahel] jäävate tuhjendamise_tunnid kalleima
+    sloti kohad päeva kahanevas järjestuses, kasvavalt (päevad × slotid × tuhjendamise_tunnid).
+    Lühemate akende (päeva lõpus) väärtused on suvalised, neid ei kasutata.
+    """
+    kohad = rühm['kohad']
+    paevi, n = kohad.shape
+    if tuhjendamise_tunnid == 1:
+        # Üks slot: lõigu kalleim hõredast tabelist
+        e = np.arange(n)
+        algus = np.broadcast_to(np.minimum(e + 1, n - 1), kohad.shape)
+        lopp = np.broadcast_to(np.minimum(e + max_aeg_vahel, n - 1), kohad.shape)
+        kalleim = _lõigu_argmax(rühm['hinnad'], rühm['max_tabel'], algus, lopp)
+        return np.take_along_axis(kohad, kalleim, axis=1)[:, :, np.newaxis]
+    taidetud = np.concatenate([kohad[:, 1:], np.full((paevi, max_aeg_vahel), n, dtype=kohad.dtype)], axis=1)
+    aknad = sliding_window_view(taidetud, max_aeg_vahel, axis=1)[:, :n]
+    return np.sort(np.partition(aknad, tuhjendamise_tunnid - 1, axis=2)[:, :, :tuhjendamise_tunnid], axis=2)
+
+
+def _kallimate_summad(rühm, kallimate_kohad):
+    """_kallimate_kohad hindade summa, liidetuna kahanevas järjestuses nagu _optimeeri_rühm"""
+    paevi, n, tuhjendamise_tunnid = kallimate_kohad.shape
+    hinnad = np.concatenate([rühm['kahanevad_hinnad'], np.zeros((paevi, 1))], axis=1)
+    summa = np.zeros((paevi, n))
+    for k in range(tuhjendamise_tunnid):
+        summa = summa + np.take_along_axis(hinnad, kallimate_kohad[:, :, k], axis=1)
+    return summa
+
+
+def _optimeeri_indeksiga(rühm, aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, max_aeg_vahel):
+    """
+    _optimeeri_rühm koosta_paevaindeks rühma peal (max_aeg_vahel slottides). Tulemus on sama;
+    paaride (laadimise algus, tühjendamise algus) asemel leitakse iga laadimise alguse parim
+    tühjendamise algus hõreda tabeli lõigu maksimumina.
+    """
+    hinnad = rühm['hinnad']
+    slotipikkus_h = rühm['dt']
+    paevi, n = hinnad.shape
+    slotienergia = aku_voimsus_mw * slotipikkus_h
+    laadimise_tunnid = int(np.ceil(aku_mahtuvus_mwh / slotienergia))
+    tuhjendamise_tunnid = int(np.ceil(aku_mahtuvus_mwh * efektiivsus / slotienergia))
+    tagastatav_energia = laadimise_tunnid * slotienergia * efektiivsus
+
+    laadimine = np.full((paevi, laadimise_tunnid), -1)
+    tuhjendamine = np.full((paevi, tuhjendamise_tunnid), -1)
+    tulu = np.zeros(paevi)
+    if n < 2 or laadimise_tunnid > n or tuhjendamise_tunnid > min(max_aeg_vahel, n - 1):
+        return laadimine, tuhjendamine, tulu
+
+    # Laadimine: järjestikune aken iga alguse kohta vs päeva odavaimad slotid (indeksist)
+    alguste_arv = n - laadimise_tunnid + 1
+    kulu_jarjestikune = _libisevad_summad(hinnad, laadimise_tunnid) * slotienergia
+    kulu_odavaimad = rühm['odavaimate_summad'][:, laadimise_tunnid - 1] * slotienergia
+    odavaimad_valitud = kulu_odavaimad[:, np.newaxis] < kulu_jarjestikune
+    laadimise_kulu = np.where(odavaimad_valitud, kulu_odavaimad[:, np.newaxis], kulu_jarjestikune)
+    laadimise_lopp = np.where(
+        odavaimad_valitud,
+        rühm['odavaimate_lopp'][:, laadimise_tunnid - 1, np.newaxis].astype(int),
+        np.arange(alguste_arv) + laadimise_tunnid - 1,
+    )
+
+    # Tühjendamine: iga laadimise lõpu järel aknas kalleimad slotid (indeksi järjestusest, ilma sorteerimata)
+    kallimate_kohad = _kallimate_kohad(rühm, tuhjendamise_tunnid, max_aeg_vahel)
+    tulu_kallimad = tagastatav_energia * (_kallimate_summad(rühm, kallimate_kohad) / tuhjendamise_tunnid)
+    tulu_jarjestikune = tagastatav_energia * (_libisevad_summad(hinnad, tuhjendamise_tunnid) / tuhjendamise_tunnid)
+
+    # Iga laadimise alguse lubatud tühjendamise algused [lopp + 1, min(lopp + max_aeg_vahel + 1, n) - T];
+    # parim järjestikune tühjendamine neist on hõreda tabeli lõigu maksimum
+    aken_algus = laadimise_lopp + 1
+    aken_lopp = np.minimum(laadimise_lopp + max_aeg_vahel + 1, n) - tuhjendamise_tunnid
+    kehtiv = aken_algus <= aken_lopp
+    algus = np.minimum(aken_algus, n - tuhjendamise_tunnid)
+    parim_jarjestikune = _lõigu_argmax(
+        tulu_jarjestikune, _horeda_tabel(tulu_jarjestikune), algus, np.maximum(aken_lopp, algus)
+    )
+    tulu_kallimad_s = np.take_along_axis(tulu_kallimad, laadimise_lopp, axis=1)
+    suurim = np.maximum(tulu_kallimad_s, np.take_along_axis(tulu_jarjestikune, parim_jarjestikune, axis=1))
+    paari_tulu = np.where(kehtiv, suurim - laadimise_kulu, -np.inf)
+
+    s = np.argmax(paari_tulu, axis=1)
+    d = np.flatnonzero(np.isfinite(paari_tulu[np.arange(paevi), s]))
+    s = s[d]
+    laadimine[d] = np.where(
+        odavaimad_valitud[d, s][:, np.newaxis],
+        rühm['kasvav'][d, :laadimise_tunnid],
+        s[:, np.newaxis] + np.arange(laadimise_tunnid),
+    )
+    # Valitud laadimise korral esimene parim tühjendamise algus nagu _optimeeri_rühm (lahutamise
+    # ümardamise tõttu võib see olla varasem kui lõigu maksimum)
+    e = laadimise_lopp[d, s]
+    tuhjendamise_algus = np.arange(n - tuhjendamise_tunnid + 1)
+    tulu_kallimad_s = tulu_kallimad_s[d, s][:, np.newaxis]
+    kallimad_valitud = tulu_kallimad_s > tulu_jarjestikune[d]
+    algusega_tulu = np.where(kallimad_valitud, tulu_kallimad_s, tulu_jarjestikune[d]) - laadimise_kulu[d, s][:, np.newaxis]
+    algusega_tulu = np.where(
+        (tuhjendamise_algus >= aken_algus[d, s][:, np.newaxis]) & (tuhjendamise_algus <= aken_lopp[d, s][:, np.newaxis]),
+        algusega_tulu, -np.inf
+    )
+    t = np.argmax(algusega_tulu, axis=1)
+    tuhjendamine[d] = np.where(
+        kallimad_valitud[np.arange(len(d)), t][:, np.newaxis],
+        np.take_along_axis(rühm['kahanev'][d], kallimate_kohad[d, e], axis=1),
+        t[:, np.newaxis] + np.arange(tuhjendamise_tunnid),
+    )
+    tulu[d] = paari_tulu[d, s]
+    return laadimine, tuhjendamine, tulu
+
+
+def _rühma_plokk(rühm, plokk):
+    """koosta_paevaindeks rühm ainult päevadega plokk (lõik)"""
+    return {nimi: v if nimi == 'dt' else v[plokk] for nimi, v in rühm.items()}
+
+
+def optimeeri_paevad(hinnad, aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, max_aeg_vahel, pikkused=None,
+                     slotipikkus_h=1.0, indeks=None):
+    """
+    Optimeerib iga päeva kohta laadimise ja tühjendamise slotid (mudel 'tsukkel').
+
+    hinnad: päevad × slotid maatriks (päeva slotid vasakule joondatud), pikkused: slottide arv päevas,
+    slotipikkus_h: sloti pikkus tundides (arv või päevade kaupa), max_aeg_vahel tundides.
+    indeks: samade hindade koosta_paevaindeks; kui antud, arvutatakse selle pealt (tulemus on sama).
+    Tagastab (laadimine, tuhjendamine, tulu), kus laadimine ja tuhjendamine on indeksimaatriksid
+    (veerge nii palju, kui lühimate slottide korral vaja) ning leidmata päevade ja kasutamata
+    veergude väärtus on -1 ja tulu 0.
+    """
+    lyhim = indeks['lyhim'] if indeks is not None else float(np.min(slotipikkus_h))
+    laadimise_tunnid = int(np.ceil(aku_mahtuvus_mwh / (aku_voimsus_mw * lyhim)))
+    tuhjendamise_tunnid = int(np.ceil(aku_mahtuvus_mwh * efektiivsus / (aku_voimsus_mw * lyhim)))
+    if indeks is not None:
+        paevi = indeks['paevi']
+    else:
+        hinnad = np.asarray(hinnad, dtype=float)
+        paevi = 1 if hinnad.ndim == 1 else hinnad.shape[0]
+
+    laadimine = np.full((paevi, laadimise_tunnid), -1)
+    tuhjendamine = np.full((paevi, tuhjendamise_tunnid), -1)
+    tulu = np.zeros(paevi)
+    if indeks is not None:
+        for rühm in indeks['rühmad']:
+            read = rühm['read']
+            n = rühm['hinnad'].shape[1]
+            ploki_paevi = max(1, _PLOKI_ELEMENTE // (n * n))
+            for algus in range(0, len(read), ploki_paevi):
+                plokk = slice(algus, algus + ploki_paevi)
+                l, t, tulu[read[plokk]] = _optimeeri_indeksiga(
+                    _rühma_plokk(rühm, plokk), aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus,
+                    _slotte(max_aeg_vahel, rühm['dt'])
+                )
+                laadimine[read[plokk], :l.shape[1]] = l
+                tuhjendamine[read[plokk], :t.shape[1]] = t
+        return laadimine, tuhjendamine, tulu
+
+    for read, rühm, dt in _paevad_pikkuse_jargi(hinnad, pikkused, slotipikkus_h):
+        # Vahemassiivid on päevad × slotid × slotid; plokid hoiavad need mõistlikus suuruses
+        ploki_paevi = max(1, _PLOKI_ELEMENTE // (rühm.shape[1] * rühm.shape[1]))
+        for algus in range(0, len(read), ploki_paevi):
+            plokk = read[algus:algus + ploki_paevi]
+            l, t, tulu[plokk] = _optimeeri_rühm(
+                rühm[algus:algus + ploki_paevi], aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus,
+                _slotte(max_aeg_vahel, dt), dt
+            )
+            laadimine[plokk, :l.shape[1]] = l
+            tuhjendamine[plokk, :t.shape[1]] = t
+    return laadimine, tuhjendamine, tulu
+
+
+def optimeeri_ajajoon(hinnad, aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, max_aeg_vahel, katkestused=None,
+                      slotipikkus_h=1.0):
+    """
+    Optimeerib kogu hinnarea ühe ajajoonena, päevapiire arvestamata (tsükkel võib ületada keskööd).
+
+    Tsükkel = järjestikused laadimise tunnid ja järjestikused tühjendamise tunnid, mis lõpevad
+    hiljemalt max_aeg_vahel tundi pärast laadimise lõppu (tulu ja kulu nagu optimeeri_paevad).
+    Tsüklid ei kattu: järgmine laadimine algab tühja akuga. Valitakse tsüklite kogum, mille
+    summaarne tulu on suurim.
+
+    hinnad: ühemõõtmeline ühtlase sammuga (slotipikkus_h tundi) hinnarida, katkestused: True real,
+    mis ei järgne eelmisele vahetult (puuduvad andmed); üle katkestuse tsükkel ei ulatu.
+    Tagastab (laadimise_algused, tuhjendamise_algused, tulud) tsüklite kaupa ajalises järjekorras.
+    """
+    hinnad = np.asarray(hinnad, dtype=float).ravel()
+    n = len(hinnad)
+    slotienergia = aku_voimsus_mw * slotipikkus_h
+    laadimise_tunnid = int(np.ceil(aku_mahtuvus_mwh / slotienergia))
+    tuhjendamise_tunnid = int(np.ceil(aku_mahtuvus_mwh * efektiivsus / slotienergia))
+    tagastatav_energia = laadimise_tunnid * slotienergia * efektiivsus
+    max_aeg_vahel = _slotte(max_aeg_vahel, slotipikkus_h)
+
+    tuhi = np.zeros(0, dtype=int)
+    if tuhjendamise_tunnid > max_aeg_vahel or laadimise_tunnid + tuhjendamise_tunnid > n:
+        return tuhi, tuhi.copy(), np.zeros(0)
+
+    kulu = (_libisevad_summad(hinnad[np.newaxis, :], laadimise_tunnid)[0] * slotienergia).tolist()
+    muuk = (tagastatav_energia * (_libisevad_summad(hinnad[np.newaxis, :], tuhjendamise_tunnid)[0] / tuhjendamise_tunnid)).tolist()
+
+    # Iga rea lõigu (katkestusteta osa) esimene indeks
+    if katkestused is None:
+        loigu_algus = [0] * n
+    else:
+        uus_loik = np.asarray(katkestused, dtype=bool).copy()
+        uus_loik[0] = True
+        loigu_algus = np.maximum.accumulate(np.where(uus_loik, np.arange(n), 0)).tolist()
+
+    # parim[i] = suurim tulu ridadest [0, i); valik[i] = tsükli laadimise algus, mis lõpeb real i - 1
+    parim = [0.0] * (n + 1)
+    valik = [-1] * (n + 1)
+    # Monotoonne järjekord laadimise algustest s kahaneva väärtusega parim[s] - kulu[s]
+    jarjekord = deque()
+    for i in range(1, n + 1):
+        parim[i] = parim[i - 1]
+        t = i - tuhjendamise_tunnid
+        s = t - laadimise_tunnid
+        if s < 0:
+            continue
+        vaartus = parim[s] - kulu[s]
+        while jarjekord and jarjekord[-1][1] <= vaartus:
+            jarjekord.pop()
+        jarjekord.append((s, vaartus))
+        # Laadimine peab lõppema hiljemalt max_aeg_vahel slotti enne müügi lõppu ja samas lõigus
+        varaseim = max(i - laadimise_tunnid - max_aeg_vahel, loigu_algus[i - 1])
+        while jarjekord and jarjekord[0][0] < varaseim:
+            jarjekord.popleft()
+        if jarjekord and muuk[t] + jarjekord[0][1] > parim[i]:
+            parim[i] = muuk[t] + jarjekord[0][1]
+            valik[i] = jarjekord[0][0]
+
+    laadimise_algused = []
+    tuhjendamise_algused = []
+    tulud = []
+    i = n
+    while i > 0:
+        if valik[i] < 0:
+            i -= 1
+            continue
+        s, t = valik[i], i - tuhjendamise_tunnid
+        laadimise_algused.append(s)
+        tuhjendamise_algused.append(t)
+        tulud.append(muuk[t] - kulu[s])
+        i = s
+    return (
+        np.array(laadimise_algused[::-1], dtype=int),
+        np.array(tuhjendamise_algused[::-1], dtype=int),
+        np.array(tulud[::-1]),
+    )
+
+
+def _soc_samm(aku_mahtuvus_mwh, slotienergia_mwh, max_tsukleid, max_tasemeid, max_olekuid):
+    """
+    Laetuse (SoC) võre samm MWh-des.
+
+    Täpne võre on mahtuvuse, slotienergia (ja tsüklipiiri) suurim ühine jagaja: sellisel võrel
+    on ülesande optimum alati võrepunktides. Kui see annaks üle max_tasemeid laetuse taseme
+    või tsüklipiiriga üle max_olekuid oleku, kasutame jämedamat võret (lähend).
+    """
+    suurused = [Fraction(aku_mahtuvus_mwh).limit_denominator(1000), Fraction(slotienergia_mwh).limit_denominator(1000)]
+    if max_tsukleid is not None:
+        suurused.append(suurused[0] * Fraction(max_tsukleid).limit_denominator(1000))
+    lugeja = 0
+    nimetaja = 1
+    for suurus in suurused:
+        nimetaja = nimetaja * suurus.denominator // gcd(nimetaja, suurus.denominator)
+    for suurus in suurused:
+        lugeja = gcd(lugeja, int(suurus * nimetaja))
+    samm = lugeja / nimetaja if lugeja else aku_mahtuvus_mwh
+
+    # Jämedam võre peab sobituma vähemalt väiksema mõõduga (mahtuvus või slotienergia),
+    # muidu kaotaks lähend terve võresammu võimsusest
+    min_samm = aku_mahtuvus_mwh / max_tasemeid
+    if max_tsukleid is not None:
+        min_samm = max(min_samm, np.sqrt(aku_mahtuvus_mwh * aku_mahtuvus_mwh * max_tsukleid / max_olekuid))
+    if samm < min_samm:
+        alus = min(aku_mahtuvus_mwh, slotienergia_mwh)
+        samm = alus / max(1, int(alus // min_samm))
+    return samm
+
+
+def _nihuta(x, k, laetud_ka, taide):
+    """
+    tulemus[:, s, m] = x[:, s + k, m + k] (laadimine, kui laetud_ka) või x[:, s + k, m];
+    vahemikust välja jäävad kohad saavad väärtuse taide.
+    """
+    tulemus = np.full_like(x, taide)
+    n, m = x.shape[1], x.shape[2]
+    if k >= n:
+        return tulemus
+    if k >= 0 and laetud_ka:
+        if k < m:
+            tulemus[:, :n - k, :m - k] = x[:, k:, k:]
+    elif k >= 0:
+        tulemus[:, :n - k, :] = x[:, k:, :]
+    elif -k < n:
+        tulemus[:, -k:, :] = x[:, :n + k, :]
+    return tulemus
+
+
+def _akna_max(x, laius, suund, laetud_ka):
+    """
+    Libisev maksimum üle nihete suund * 1 .. suund * laius (kahekordistamise meetodil, O(log laius)).
+    Tagastab (maksimum, samm), kus samm on parima nihke pikkus (võrdsuse korral lühim).
+    """
+    maksimum = _nihuta(x, suund, laetud_ka, -np.inf)
+    samm = np.ones(x.shape, dtype=np.int16)
+    pikkus = 1
+    while pikkus < laius:
+        nihe = min(pikkus, laius - pikkus)
+        teine = _nihuta(maksimum, suund * nihe, laetud_ka, -np.inf)
+        teise_samm = _nihuta(samm, suund * nihe, laetud_ka, 0) + nihe
+        parem = teine > maksimum
+        maksimum = np.where(parem, teine, maksimum)
+        samm = np.where(parem, teise_samm, samm).astype(np.int16)
+        pikkus += nihe
+    return maksimum, samm
+
+
+def _soc_graafik(hinnad, kehtiv, samm, tasemeid, max_samme, laetud_piir, efektiivsus):
+    """Ühe päevade ploki DP: tagurpidi väärtusfunktsioon, siis graafik ettepoole"""
+    paevi, slotte = hinnad.shape
+    # Olek: (laetus, päeva jooksul laetud energia) sammudes; ilma tsüklipiirita on teine mõõde 1
+    laetud_ka = laetud_piir is not None
+    laetud_tasemeid = laetud_piir + 1 if laetud_ka else 1
+    valikud = np.zeros((slotte, paevi, tasemeid + 1, laetud_tasemeid), dtype=np.int16)
+    vaartus = np.zeros((paevi, tasemeid + 1, laetud_tasemeid))
+    tase = np.arange(tasemeid + 1)[np.newaxis, :, np.newaxis] * samm
+
+    for t in range(slotte - 1, -1, -1):
+        hind = hinnad[:, t][:, np.newaxis, np.newaxis]
+        # Laadimine j sammu: V[s + j] - hind * j * samm = max(V - hind * tase)[s + j] + hind * tase[s]
+        laadimine, laadimise_samm = _akna_max(vaartus - hind * tase, max_samme, 1, laetud_ka)
+        laadimine = laadimine + hind * tase
+        # Tühjendamine j sammu: V[s - j] + efektiivsus * hind * j * samm
+        tuhjendamine, tuhjendamise_samm = _akna_max(vaartus - efektiivsus * hind * tase, max_samme, -1, laetud_ka)
+        tuhjendamine = tuhjendamine + efektiivsus * hind * tase
+
+        slot_kehtiv = kehtiv[:, t][:, np.newaxis, np.newaxis]
+        laadi = slot_kehtiv & (laadimine > vaartus)
+        parim = np.where(laadi, laadimine, vaartus)
+        tegevus = np.where(laadi, laadimise_samm, 0)
+        tuhjenda = slot_kehtiv & (tuhjendamine > parim)
+        vaartus = np.where(tuhjenda, tuhjendamine, parim)
+        valikud[t] = np.where(tuhjenda, -tuhjendamise_samm, tegevus)
+
+    # Graafiku taastamine: alustame tühja akuga
+    read = np.arange(paevi)
+    laetus = np.zeros(paevi, dtype=int)
+    laetud = np.zeros(paevi, dtype=int)
+    muutus = np.zeros((paevi, slotte), dtype=int)
+    for t in range(slotte):
+        muutus[:, t] = valikud[t][read, laetus, laetud]
+        laetus += muutus[:, t]
+        if laetud_ka:
+            laetud += np.maximum(muutus[:, t], 0)
+    return muutus
+
+
+def optimeeri_soc(hinnad, aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, pikkused=None,
+                  max_tsukleid=None, slotipikkus_h=1.0, max_tasemeid=100, max_olekuid=1000):
+    """
+    Tulu mõttes optimaalne laadimis- ja tühjendusgraafik laetuse võrel (dünaamiline planeerimine).
+
+    Iga päev algab tühja akuga; päeva jooksul võib olla mitu tsüklit. Ühes slotis saab laadida või
+    tühjendada kuni aku_voimsus_mw * slotipikkus_h MWh, laetus on vahemikus 0..aku_mahtuvus_mwh,
+    laadimisel ostetakse salvestatav energia ja tühjendamisel müüakse sellest efektiivsus osa
+    (100 MWh laadimine -> 87 MWh müük, nagu optimeeri_paevad). max_tsukleid piirab päevas
+    laetavat energiat (max_tsukleid * aku_mahtuvus_mwh). Kõik päevad arvutatakse korraga,
+    mälu piiramiseks plokkide kaupa. slotipikkus_h võib olla ka päevade kaupa massiiv.
+
+    Tagastab (ostetud_mwh, muudud_mwh, tulu): päevad × slotid maatriksid ostetud ja müüdud
+    energiaga ning päeva tulu.
+    """
+    hinnad = np.asarray(hinnad, dtype=float)
+    if hinnad.ndim == 1:
+        hinnad = hinnad[np.newaxis, :]
+    paevi, slotte = hinnad.shape
+
+    if np.ndim(slotipikkus_h) > 0:
+        # Erineva sloti pikkusega päevad arvutatakse eraldi (erinev võre samm)
+        slotipikkused = np.asarray(slotipikkus_h, dtype=float)
+        ostetud = np.zeros((paevi, slotte))
+        muudud = np.zeros((paevi, slotte))
+        tulu = np.zeros(paevi)
+        for dt in np.unique(slotipikkused):
+            read = np.flatnonzero(slotipikkused == dt)
+            ostetud[read], muudud[read], tulu[read] = optimeeri_soc(
+                hinnad[read], aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus,
+                pikkused=None if pikkused is None else np.asarray(pikkused)[read],
+                max_tsukleid=max_tsukleid, slotipikkus_h=float(dt),
+                max_tasemeid=max_tasemeid, max_olekuid=max_olekuid
+            )
+        return ostetud, muudud, tulu
+    kehtiv = ~np.isnan(hinnad)
+    if pikkused is not None:
+        kehtiv &= np.arange(slotte) < np.asarray(pikkused)[:, np.newaxis]
+    hinnad = np.where(kehtiv, hinnad, 0.0)
+
+    slotienergia = aku_voimsus_mw * slotipikkus_h
+    samm = _soc_samm(aku_mahtuvus_mwh, slotienergia, max_tsukleid, max_tasemeid, max_olekuid)
+    tasemeid = int(np.floor(aku_mahtuvus_mwh / samm + 1e-9))
+    max_samme = min(int(np.floor(slotienergia / samm + 1e-9)), tasemeid)
+    laetud_piir = None if max_tsukleid is None else int(np.floor(max_tsukleid * aku_mahtuvus_mwh / samm + 1e-9))
+
+    muutus = np.zeros((paevi, slotte), dtype=int)
+    if tasemeid >= 1 and max_samme >= 1 and (laetud_piir is None or laetud_piir >= 1):
+        olekuid = (tasemeid + 1) * (1 if laetud_piir is None else laetud_piir + 1)
+        # Valikute massiiv (int16) hoitakse ploki kohta alla ~256 MB
+        ploki_paevi = max(1, (256 << 20) // (2 * slotte * olekuid))
+        for algus in range(0, paevi, ploki_paevi):
+            plokk = slice(algus, algus + ploki_paevi)
+            muutus[plokk] = _soc_graafik(hinnad[plokk], kehtiv[plokk], samm, tasemeid, max_samme, laetud_piir, efektiivsus)
+
+    ostetud = np.maximum(muutus, 0) * samm
+    muudud = np.maximum(-muutus, 0) * samm * efektiivsus
+    tulu = (muudud * hinnad).sum(axis=1) - (ostetud * hinnad).sum(axis=1)
+    return ostetud, muudud, tulu
+
+
+def _reservi_tabel(tasemeid, max_samme, samm, aku_mahtuvus_mwh, aku_voimsus_mw, slotipikkus_h, reservi_kestus_h):
+    """
+    Suurim reserveeritav võimsus (MW) iga ülemineku kohta: tabel[s, j + max_samme] laetuselt s
+    laetusele s + j. Kauplemine kasutab |j| * samm / slotipikkus_h MW ja laetus peab kogu sloti
+    jooksul jätma reservi_kestus_h tunniks ruumi nii tühjendamiseks kui ka laadimiseks.
+    """
+    s = np.arange(tasemeid + 1)[:, np.newaxis]
+    j = np.arange(-max_samme, max_samme + 1)[np.newaxis, :]
+    madal = np.minimum(s, s + j) * samm
+    korge = np.maximum(s, s + j) * samm
+    tabel = np.broadcast_to(aku_voimsus_mw - np.abs(j) * samm / slotipikkus_h, (tasemeid + 1, 2 * max_samme + 1))
+    if reservi_kestus_h > 0:
+        tabel = np.minimum(tabel, np.minimum(madal, aku_mahtuvus_mwh - korge) / reservi_kestus_h)
+    return np.maximum(tabel, 0.0)
+
+
+def _reservi_loigud(tasemeid, max_samme, samm, aku_mahtuvus_mwh, aku_voimsus_mw, slotipikkus_h, reservi_kestus_h,
+                   suund):
+    """
+    _reservi_tabel lineaarsete tükkidena suunas suund (1 laadimine, -1 tühjendamine). Laetuselt s
+    sihtlaetusele u = s + suund * m (m = 1 .. max_samme) on reserv üks neljast kujust alfa(s) + beeta * u
+    (võimsuse piir, laetuse varu all või üleval, 0); iga s korral jagatakse m vahemik lõikudeks, kus kuju
+    ei muutu. Lõikude veerud on indeksid i = u (laadimine) või i = tasemeid - u (tühjendamine), nii et
+    lõigu esimene maksimum on lühim samm.
+
+    Tagastab (algus, lopp, alfa, massiiv, beetad): lõigud × laetused massiivid (tühjad lõigud viitavad
+    veerule tasemeid + 1; massiiv on lõigu beeta indeks) ja erinevad beetad.
+    """
+    s = np.arange(tasemeid + 1, dtype=float)
+    a = samm / slotipikkus_h
+    # Kujud (alfa, beeta): 0 = reservita, 1 = võimsuse piir, 2 ja 3 = laetuse varu (reservi_kestus_h > 0)
+    if suund > 0:
+        kujud = [(np.zeros_like(s), 0.0), (aku_voimsus_mw + a * s, -a)]
+    else:
+        kujud = [(np.zeros_like(s), 0.0), (aku_voimsus_mw - a * s, a)]
+    if reservi_kestus_h > 0:
+        b = samm / reservi_kestus_h
+        if suund > 0:
+            kujud += [(b * s, 0.0), (np.full_like(s, aku_mahtuvus_mwh / reservi_kestus_h), -b)]
+        else:
+            kujud += [(np.zeros_like(s), b), ((aku_mahtuvus_mwh - s * samm) / reservi_kestus_h, 0.0)]
+
+    m = np.arange(1, max_samme + 1)
+    u = s[:, np.newaxis] + suund * m
+    vaartused = np.stack([alfa[:, np.newaxis] + beeta * u for alfa, beeta in kujud[1:]])
+    kuju = np.where(vaartused.min(axis=0) > 0, vaartused.argmin(axis=0) + 1, 0)
+    kuju[(u < 0) | (u > tasemeid)] = -1
+
+    loigud = []
+    for rida in kuju.tolist():
+        rea_loigud = []
+        for mi, k in enumerate(rida):
+            if k < 0:
+                break
+            if rea_loigud and rea_loigud[-1][2] == k:
+                rea_loigud[-1][1] = mi + 1
+            else:
+                rea_loigud.append([mi + 1, mi + 1, k])
+        loigud.append(rea_loigud)
+
+    # Sama beetaga kujud kasutavad sama massiivi
+    beetad = []
+    for _, beeta in kujud:
+        if beeta not in beetad:
+            beetad.append(beeta)
+    arv = max(1, max(len(rea_loigud) for rea_loigud in loigud))
+    algus = np.full((arv, tasemeid + 1), tasemeid + 1)
+    lopp = np.full((arv, tasemeid + 1), tasemeid + 1)
+    alfa = np.zeros((arv, tasemeid + 1))
+    massiiv = np.zeros((arv, tasemeid + 1), dtype=int)
+    for rida, rea_loigud in enumerate(loigud):
+        nihe = rida if suund > 0 else tasemeid - rida
+        for g, (m_algus, m_lopp, k) in enumerate(rea_loigud):
+            algus[g, rida], lopp[g, rida] = nihe + m_algus, nihe + m_lopp
+            alfa[g, rida] = kujud[k][0][rida]
+            massiiv[g, rida] = beetad.index(kujud[k][1])
+    return algus, lopp, alfa, massiiv, np.array(beetad)
+
+
+def _loigu_maksimumid(vaartus, koht, loigud):
+    """
+    Esimene maksimum ja selle veerg lõikudes x[k, algus:lopp + 1, :] (loigud: _reservi_loigud); tagastab
+    lõigud × laetused × päevad massiivid.
+
+    vaartus ja koht on hõreda tabeli (vt _horeda_tabel) puhvrid massiivid × tasemed × (veerud + 1) × päevad:
+    vaartus[:, 0, :veerud] on sisend x, vaartus[:, 0, veerud] = -inf (tühjade lõikude jaoks) ja
+    koht[:, 0] = veeru indeks. Kõrgemate tasemete lõpuosa ei loeta, seega seda ei täideta. Valik
+    tehakse aritmeetiliselt, sest juhuslikul maskil on np.where mitu korda aeglasem.
+    """
+    algus, lopp, _, massiiv, _ = loigud
+    veerge = vaartus.shape[2] - 1
+    for k in range(1, int(np.max(lopp - algus) + 1).bit_length()):
+        laius = veerge - (1 << k) + 1
+        pool = 1 << (k - 1)
+        vasak = vaartus[:, k - 1, :laius]
+        parem = vaartus[:, k - 1, pool:pool + laius]
+        valik = parem > vasak
+        np.maximum(vasak, parem, out=vaartus[:, k, :laius])
+        vasak_koht = koht[:, k - 1, :laius]
+        uus_koht = koht[:, k, :laius]
+        np.subtract(koht[:, k - 1, pool:pool + laius], vasak_koht, out=uus_koht)
+        uus_koht *= valik
+        uus_koht += vasak_koht
+
+    tase = np.log2(lopp - algus + 1).astype(int)
+    parem = lopp - (1 << tase) + 1
+    parem_vaartus = vaartus[massiiv, tase, parem]
+    vasak_vaartus = vaartus[massiiv, tase, algus]
+    vasak_koht = koht[massiiv, tase, algus]
+    valik = parem_vaartus > vasak_vaartus
+    return (
+        np.maximum(vasak_vaartus, parem_vaartus),
+        vasak_koht + (koht[massiiv, tase, parem] - vasak_koht) * valik,
+    )
+
+
+def _reservi_graafik(hinnad, reservitulu, kehtiv, samm, tasemeid, max_samme, efektiivsus, tabel, loigud):
+    """
+    Ühe päevade ploki DP reservitabeliga (vt _soc_graafik): tagurpidi väärtusfunktsioon, siis graafik.
+
+    Laadimise ja tühjendamise parim samm leitakse kõigi laetuste jaoks korraga: reserv on igas
+    lõigus (_reservi_loigud) lineaarne sihtlaetuse järgi, seega on lõigu parim samm hõreda tabeli
+    päring selle beetaga massiivist. Reservita slotis on see sama arvutus mis _soc_graafik.
+    Massiivid on laetused × päevad.
+    """
+    paevi, slotte = hinnad.shape
+    valikud = np.zeros((slotte, tasemeid + 1, paevi), dtype=np.int16)
+    vaartus = np.zeros((tasemeid + 1, paevi))
+    tase = np.arange(tasemeid + 1)[:, np.newaxis] * samm
+    laetus = np.arange(tasemeid + 1)[:, np.newaxis]
+    reservi_tabel = tabel[:, max_samme][:, np.newaxis]
+
+    # Hõredate tabelite puhvrid suundade kaupa (_loigu_maksimumid), eraldatakse ploki kohta üks kord
+    puhvrid = {}
+    for suund, (algus, lopp, _, _, beetad) in loigud.items():
+        kuju = (len(beetad), int(np.max(lopp - algus) + 1).bit_length(), tasemeid + 2, paevi)
+        puhvrid[suund] = (np.empty(kuju), np.empty(kuju, dtype=np.int16))
+        puhvrid[suund][0][:, 0, tasemeid + 1] = -np.inf
+        puhvrid[suund][1][:, 0] = np.arange(tasemeid + 2)[:, np.newaxis]
+
+    for t in range(slotte - 1, -1, -1):
+        hind = hinnad[:, t][np.newaxis, :]
+        reserv = reservitulu[:, t][np.newaxis, :]
+        # Kehtetus slotis on laadimine ja tühjendamine välistatud
+        keeld = np.where(kehtiv[:, t], 0.0, -np.inf)[np.newaxis, :]
+        # Järjekord võrdsuse korral nagu _soc_graafik: ootamine, lühim laadimine, lühim tühjendamine
+        parim = vaartus + reserv * reservi_tabel
+        tegevus = np.zeros((tasemeid + 1, paevi), dtype=np.int16)
+        for suund, hinnatase in ((1, hind * tase), (-1, efektiivsus * hind * tase)):
+            algus, _, alfa, _, beetad = loigud[suund]
+            tabeli_vaartus, tabeli_koht = puhvrid[suund]
+            x = vaartus - hinnatase
+            # Massiiv beetaga b: x + reserv * b * sihtlaetus (tühjendamisel veerud tagurpidi)
+            for i, beeta in enumerate(beetad):
+                sisend = tabeli_vaartus[i, 0, :tasemeid + 1]
+                if suund < 0:
+                    sisend = sisend[::-1]
+                np.multiply(beeta * laetus, reserv, out=sisend)
+                sisend += x
+            maksimumid, kohad = _loigu_maksimumid(tabeli_vaartus, tabeli_koht, loigud[suund])
+            parim_suunas = maksimumid[0] + reserv * alfa[0][:, np.newaxis]
+            koht = kohad[0]
+            for g in range(1, len(algus)):
+                kandidaat = maksimumid[g] + reserv * alfa[g][:, np.newaxis]
+                koht = koht + (kohad[g] - koht) * (kandidaat > parim_suunas)
+                parim_suunas = np.maximum(parim_suunas, kandidaat)
+            kandidaat = parim_suunas + hinnatase + keeld
+            samm_suunas = koht - laetus if suund > 0 else (tasemeid - koht) - laetus
+            tegevus = (tegevus + (samm_suunas - tegevus) * (kandidaat > parim)).astype(np.int16)
+            parim = np.maximum(parim, kandidaat)
+        vaartus = parim
+        valikud[t] = tegevus
+
+    read = np.arange(paevi)
+    laetus = np.zeros(paevi, dtype=int)
+    muutus = np.zeros((paevi, slotte), dtype=int)
+    for t in range(slotte):
+        muutus[:, t] = valikud[t][laetus, read]
+        laetus += muutus[:, t]
+    return muutus
+
+
+def optimeeri_reserv(hinnad, reservi_hinnad, aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, reservi_kestus_h=1.0,
+                     pikkused=None, slotipikkus_h=1.0, max_tasemeid=100):
+    """
+    Energiaturul kauplemine koos võimsusreservi müügiga (optimeeri_soc laiendus).
+
+    reservi_hinnad: hinnad (EUR/MW tunnis) sama kujuga kui hinnad; puuduv (NaN) või mittepositiivne
+    hind = reservi ei müüda. Igas slotis jagatakse aku_voimsus_mw kauplemise ja reservi vahel:
+    kauplemiseks jääb aku_voimsus_mw - reserv ning laetus peab kogu sloti jooksul jätma
+    reservi_kestus_h tunniks ruumi reservi täielikuks aktiveerimiseks mõlemas suunas
+    (reserv * reservi_kestus_h <= laetus <= aku_mahtuvus_mwh - reserv * reservi_kestus_h).
+    Reservi aktiveerimise energiat ei arvestata (tasu on ainult võimsuse eest). Kõik päevad
+    arvutatakse korraga laetuse võrel nagu optimeeri_soc; mälu piiramiseks plokkide kaupa.
+
+    Tagastab (ostetud_mwh, muudud_mwh, reserv_mw, tulu): päevad × slotid maatriksid ja päeva tulu
+    (kauplemine + reserv).
+    """
+    hinnad = np.asarray(hinnad, dtype=float)
+    reservi_hinnad = np.asarray(reservi_hinnad, dtype=float)
+    if hinnad.ndim == 1:
+        hinnad = hinnad[np.newaxis, :]
+        reservi_hinnad = reservi_hinnad[np.newaxis, :]
+    paevi, slotte = hinnad.shape
+
+    if np.ndim(slotipikkus_h) > 0:
+        # Erineva sloti pikkusega päevad arvutatakse eraldi (erinev võre samm)
+        slotipikkused = np.asarray(slotipikkus_h, dtype=float)
+        tulemus = [np.zeros((paevi, slotte)), np.zeros((paevi, slotte)), np.zeros((paevi, slotte)), np.zeros(paevi)]
+        for dt in np.unique(slotipikkused):
+            read = np.flatnonzero(slotipikkused == dt)
+            for koht, osa in zip(tulemus, optimeeri_reserv(
+                hinnad[read], reservi_hinnad[read], aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, reservi_kestus_h,
+                pikkused=None if pikkused is None else np.asarray(pikkused)[read], slotipikkus_h=float(dt),
+                max_tasemeid=max_tasemeid
+            )):
+                koht[read] = osa
+        return tuple(tulemus)
+    kehtiv = ~np.isnan(hinnad)
+    if pikkused is not None:
+        kehtiv &= np.arange(slotte) < np.asarray(pikkused)[:, np.newaxis]
+    hinnad = np.where(kehtiv, hinnad, 0.0)
+    reservitulu = np.where(kehtiv & (reservi_hinnad > 0), reservi_hinnad, 0.0) * slotipikkus_h
+
+    slotienergia = aku_voimsus_mw * slotipikkus_h
+    samm = _soc_samm(aku_mahtuvus_mwh, slotienergia, None, max_tasemeid, 1)
+    tasemeid = int(np.floor(aku_mahtuvus_mwh / samm + 1e-9))
+    max_samme = min(int(np.floor(slotienergia / samm + 1e-9)), tasemeid)
+    tabel = _reservi_tabel(
+        tasemeid, max_samme, samm, aku_mahtuvus_mwh, aku_voimsus_mw, slotipikkus_h, reservi_kestus_h
+    )
+
+    muutus = np.zeros((paevi, slotte), dtype=int)
+    if tasemeid >= 1 and max_samme >= 1:
+        loigud = {
+            suund: _reservi_loigud(tasemeid, max_samme, samm, aku_mahtuvus_mwh, aku_voimsus_mw, slotipikkus_h,
+                                   reservi_kestus_h, suund)
+            for suund in (1, -1)
+        }
+        # Valikute massiiv (int16) hoitakse ploki kohta alla ~256 MB, hõredad tabelid alla ~64 MB
+        ploki_paevi = max(1, min(
+            (256 << 20) // (2 * slotte * (tasemeid + 1)),
+            (64 << 20) // (10 * 4 * (tasemeid + 2) * (tasemeid + 1).bit_length()),
+        ))
+        for algus in range(0, paevi, ploki_paevi):
+            plokk = slice(algus, algus + ploki_paevi)
+            if not reservitulu[plokk].any():
+                # Reservihindadeta on ülesanne optimeeri_soc oma (sama tulemus, kiirem)
+                muutus[plokk] = _soc_graafik(
+                    hinnad[plokk], kehtiv[plokk], samm, tasemeid, max_samme, None, efektiivsus
+                )
+                continue
+            muutus[plokk] = _reservi_graafik(
+                hinnad[plokk], reservitulu[plokk], kehtiv[plokk], samm, tasemeid, max_samme, efektiivsus, tabel, loigud
+            )
+
+    # Reserv iga sloti ülemineku järgi (laetus enne ja pärast slotti)
+    laetus_enne = np.cumsum(muutus, axis=1) - muutus
+    reserv = np.where(reservitulu > 0, tabel[laetus_enne, muutus + max_samme], 0.0)
+    ostetud = np.maximum(muutus, 0) * samm
+    muudud = np.maximum(-muutus, 0) * samm * efektiivsus
+    tulu = (muudud * hinnad).sum(axis=1) - (ostetud * hinnad).sum(axis=1) + (reserv * reservitulu).sum(axis=1)
+    return ostetud, muudud, reserv, tulu
@@ -1,121 +1,37 @@
-import pandas as pd
 import numpy as np
-from datetime import datetime
-import glob
 import os
+import sys
+import argparse
+import cProfile
+import pstats
 
-# Parameetrid
-AKU_MAHTUVUS_MWH = 100  # MWh (maksimaalne laadimismahtuvus)
-AKU_VOIMSUS_MW = 50  # MW
-EFEKTIIVSUS = 0.87  # 87%
-MAX_AEG_VAHEL = 8  # tundi maksimaalselt laadimise ja tühjendamise vahel
-# Laadime täielikult 100 MWh, tagastame 100 * 0.87 = 87 MWh
-TAGASTATAV_ENERGIA = AKU_MAHTUVUS_MWH * EFEKTIIVSUS  # 87 MWh
+import akupargi_ajastus as ajastus
+import akupargi_graafik as graafik
+# pandas, akupargi_andmed ja akupargi_hoidla imporditakse funktsioonides, et --help ja argumentide vead oleksid kiired
+from akupargi_simulatsioon import (
+    MUDELID, PARAMEETRID, aku_parameetrid, hinnafailid, kuude_statistika, kuude_tulud, lae_maatriks, paevade_tulud,
+    parameetrite_vork, skaneeri
+)
 
-def loe_hinnad(failitee):
-    """Loeb CSV faili ja parsib hinnad"""
-    try:
-        # Loeme faili, proovime erinevaid kodeeringuid
-        encodings = ['cp1252', 'windows-1252', 'latin1', 'iso-8859-1', 'utf-8']
-        df = None
-        
-        for enc in encodings:
-            try:
-                df = pd.read_csv(failitee, sep=';', encoding=enc)
-                # Kontrollime, kas veerud on õiged
-                if len(df.columns) >= 3:
-                    break
-            except:
-                continue
-        
-        if df is None or len(df.columns) < 3:
-            return pd.DataFrame()
-        
-        # Leia õige veeru nimi (võib olla erinevates kodeeringutes)
-        date_col = None
-        price_col = None
-        
-        for col in df.columns:
-            if 'Kuup' in col or 'aeg' in col.lower() or 'date' in col.lower():
-                date_col = col
-            if 'NPS' in col or 'hind' in col.lower() or 'price' in col.lower():
-                price_col = col
-        
-        if date_col is None or price_col is None:
-            # Proovime kasutada teist veergu kuupäevaks ja kolmandat hinnaks
-            if len(df.columns) >= 3:
-                date_col = df.columns[1]
-                price_col = df.columns[2]
-            else:
-                return pd.DataFrame()
-        
-        # Parsime kuupäeva
-        df['Kuupäev'] = pd.to_datetime(df[date_col], format='%d.%m.%Y %H:%M', errors='coerce')
-        
-        # Parsime hinna (komaga kümnendkohad)
-        df['Hind'] = pd.to_numeric(df[price_col].astype(str).str.replace(',', '.'), errors='coerce')
-        
-        # Eemaldame NaN väärtused
-        df = df.dropna(subset=['Kuupäev', 'Hind'])
-        
-        # Sorteerime kuupäeva järgi
-        df = df.sort_values('Kuupäev').reset_index(drop=True)
-        
-        return df[['Kuupäev', 'Hind']]
-    except Exception as e:
-        import sys
-        try:
-            print(f"Viga faili {failitee} lugemisel: {e}", file=sys.stderr)
-        except:
-            pass
-        return pd.DataFrame()
+# Hinnafailide muster kaustas
+HINNAFAILID = ['Tuulikutasu*.csv']
+# Reservihindade failid (mudel reserv), sama vorming mis hinnafailidel
+RESERVIFAILID = ['Reserv*.csv']
+# --profile aruandes näidatavate funktsioonide arv
+PROFIILI_RIDU = 30
 
-def optimeeri_tsukkel(hinnad_paev):
+def simuleeri_akupark(kaust, mudel='tsukkel', parameetrid=None):
     """
-    Optimeerib ühe päeva kohta laadimise ja tühjendamise hetke.
-    Tagastab: (laadimise_indeks, tühjendamise_indeks, tulu)
+    Peamine simuleerimise funktsioon (sama mootor mis /api/arvuta); hinnafailid loetakse ja tulemused
+    kirjutatakse kausta kaust. parameetrid: aku parameetrid (aku_parameetrid), vaikimisi VAIKIMISI.
     """
-    if len(hinnad_paev) < 2:
-        return None, None, 0
-    
-    max_tulu = 0
-    parim_laadimine = None
-    parim_tuhjendamine = None
-    
-    # Arvutame laadimiseks vajaliku aja (tunnid)
-    laadimise_ajad = AKU_MAHTUVUS_MWH / AKU_VOIMSUS_MW  # 100 / 50 = 2 tundi
-    
-    # Itereerime läbi kõik võimalikud laadimise hetked
-    for i in range(len(hinnad_paev)):
-        # Laadimise kulu (ostame energiat)
-        # Laadime täielikult AKU_MAHTUVUS_MWH (100 MWh) energiat
-        laadimise_hind = hinnad_paev.iloc[i]['Hind']
-        laadimise_kulu = AKU_MAHTUVUS_MWH * laadimise_hind  # EUR
-        
-        # Otsime maksimaalselt 8 tunni jooksul parimat müügihinda
-        max_indeks = min(i + MAX_AEG_VAHEL + 1, len(hinnad_paev))
-        
-        for j in range(i + 1, max_indeks):
-            # Tühjendamise tulu (müüme energiat)
-            # Efektiivsusega saame tagasi: 100 MWh * 0.87 = 87 MWh
-            tuhjendamise_hind = hinnad_paev.iloc[j]['Hind']
-            tuhjendamise_tulu = TAGASTATAV_ENERGIA * tuhjendamise_hind  # EUR
-            
-            # Tulu = müügitulu - ostukulu
-            tulu = tuhjendamise_tulu - laadimise_kulu
-            
-            if tulu > max_tulu:
-                max_tulu = tulu
-                parim_laadimine = i
-                parim_tuhjendamine = j
-    
-    return parim_laadimine, parim_tuhjendamine, max_tulu
+    import pandas as pd
+    from akupargi_andmed import kuu_keskmised_hinnad
 
-def simuleeri_akupark():
-    """Peamine simuleerimise funktsioon"""
+    parameetrid = parameetrid or aku_parameetrid({})
     
     # Leia kõik CSV failid
-    csv_failid = glob.glob(os.path.join('c:\\Cursor\\NPS', 'Tuulikutasu*.csv'))
+    csv_failid = hinnafailid(HINNAFAILID, kaust)
     
     if not csv_failid:
         print("CSV faile ei leitud!")
@@ -123,148 +39,266 @@ def simuleeri_akupark():
     
     print(f"Leitud {len(csv_failid)} faili")
     
-    # Loeme kõik andmed
-    kogu_andmed = []
+    # Loeme kõik andmed (failid paralleelselt, ühendatud ja korduvad tunnid eemaldatud) päevamaatriksiks
     for fail in csv_failid:
         print(f"Loetakse faili: {os.path.basename(fail)}")
-        df = loe_hinnad(fail)
-        if not df.empty:
-            kogu_andmed.append(df)
+    maatriks, ridu = lae_maatriks(csv_failid, indeks=mudel == 'tsukkel', reservifailid=_reservifailid(kaust, mudel))
     
-    if not kogu_andmed:
+    if maatriks is None:
         print("Andmeid ei leitud!")
         return
+    if mudel == 'reserv' and 'reservi_hinnad' not in maatriks:
+        print("Reservihindu ei leitud!")
+        return
     
-    # Ühendame kõik andmed
-    kogu_df = pd.concat(kogu_andmed, ignore_index=True)
-    kogu_df = kogu_df.sort_values('Kuupäev').reset_index(drop=True)
-    
-    print(f"Kokku {len(kogu_df)} tundi andmeid")
-    
-    # Rühmitame päevade kaupa
-    kogu_df['Päev'] = kogu_df['Kuupäev'].dt.date
-    kogu_df['Kuu'] = kogu_df['Kuupäev'].dt.to_period('M')
-    
-    # Optimeerime iga päeva kohta
-    tulemused = []
-    kuu_tulud = {}
+    print(f"Kokku {ridu} rida hinnaandmeid")
     
-    unikaalsed_paevad = kogu_df['Päev'].unique()
+    # Optimeerime kõik päevad korraga ja kogume kuude kaupa
+    with ajastus.etapp('optimeerimine'):
+        tulud, tsukleid = paevade_tulud(maatriks, mudel=mudel, **parameetrid)
+    statistika = kuude_statistika(maatriks, *kuude_tulud(maatriks, tulud, tsukleid), kuu_keskmised_hinnad(maatriks))
     
-    for paev in unikaalsed_paevad:
-        paeva_andmed = kogu_df[kogu_df['Päev'] == paev].copy()
-        
-        if len(paeva_andmed) < 2:
-            continue
-        
-        laadimine_idx, tuhjendamine_idx, tulu = optimeeri_tsukkel(paeva_andmed)
-        
-        if laadimine_idx is not None and tuhjendamine_idx is not None:
-            laadimise_aeg = paeva_andmed.iloc[laadimine_idx]['Kuupäev']
-            tuhjendamise_aeg = paeva_andmed.iloc[tuhjendamine_idx]['Kuupäev']
-            laadimise_hind = paeva_andmed.iloc[laadimine_idx]['Hind']
-            tuhjendamise_hind = paeva_andmed.iloc[tuhjendamine_idx]['Hind']
-            kuu = paeva_andmed.iloc[0]['Kuu']
-            
-            tulemused.append({
-                'Kuupäev': paev,
-                'Kuu': str(kuu),
-                'Laadimise_aeg': laadimise_aeg,
-                'Tühjendamise_aeg': tuhjendamise_aeg,
-                'Laadimise_hind': laadimise_hind,
-                'Tühjendamise_hind': tuhjendamise_hind,
-                'Tulu': tulu,
-                'Aeg_vahel': (tuhjendamise_aeg - laadimise_aeg).total_seconds() / 3600
-            })
-            
-            # Kogume kuude kaupa
-            if kuu not in kuu_tulud:
-                kuu_tulud[kuu] = 0
-            kuu_tulud[kuu] += tulu
-    
-    # Loome tulemuste DataFrame
-    tulemused_df = pd.DataFrame(tulemused)
-    
-    if tulemused_df.empty:
+    if not statistika['kokku_tsukleid']:
         print("Tulemusi ei leitud!")
         return
     
+    # Päevade graafik (laadimise ja tühjendamise aeg ning hinnad) päevadest, kus oli tsükleid
+    tulemused_df = None
+    if mudel in graafik.GRAAFIKU_MUDELID:
+        tulemused_df = pd.concat(
+            graafik.graafiku_tukid(maatriks, mudel=mudel, detail='paev', **parameetrid), ignore_index=True
+        )
+        tulemused_df = tulemused_df[tulemused_df['Tsukleid'] > 0].reset_index(drop=True)
+        tulemused_df['Aeg_vahel'] = (tulemused_df['Tühjendamise_aeg'] - tulemused_df['Laadimise_aeg']) / np.timedelta64(1, 'h')
+    
+    mahtuvus = parameetrid['aku_mahtuvus_mwh']
+    efektiivsus = parameetrid['efektiivsus']
+    
     # Väljastame kuude kaupa
     output_lines = []
     output_lines.append("=" * 80)
     output_lines.append("AKUPARGI KAUPLEMISE SIMULATSIOONI TULEMUSED")
     output_lines.append("=" * 80)
     output_lines.append("")
-    output_lines.append(f"Aku mahtuvus: {AKU_MAHTUVUS_MWH} MWh (maksimaalne laadimismahtuvus)")
-    output_lines.append(f"Aku võimsus: {AKU_VOIMSUS_MW} MW")
-    output_lines.append(f"Efektiivsus: {EFEKTIIVSUS * 100}%")
-    output_lines.append(f"Laadimise maht: {AKU_MAHTUVUS_MWH} MWh")
-    output_lines.append(f"Tagastatav energia: {TAGASTATAV_ENERGIA:.2f} MWh ({AKU_MAHTUVUS_MWH} MWh × {EFEKTIIVSUS * 100}%)")
-    output_lines.append(f"Maksimaalne aeg laadimise ja tühjendamise vahel: {MAX_AEG_VAHEL} tundi")
+    output_lines.append(f"Mudel: {mudel}")
+    output_lines.append(f"Aku mahtuvus: {mahtuvus:g} MWh (maksimaalne laadimismahtuvus)")
+    output_lines.append(f"Aku võimsus: {parameetrid['aku_voimsus_mw']:g} MW")
+    output_lines.append(f"Efektiivsus: {efektiivsus * 100:g}%")
+    output_lines.append(f"Tagastatav energia: {mahtuvus * efektiivsus:.2f} MWh ({mahtuvus:g} MWh × {efektiivsus * 100:g}%)")
+    if mudel == 'soc':
+        max_tsukleid = parameetrid['max_tsukleid_paevas']
+        output_lines.append(f"Maksimaalne tsüklite arv päevas: {max_tsukleid:g}" if max_tsukleid is not None else "Maksimaalne tsüklite arv päevas: piiramata")
+    elif mudel == 'reserv':
+        output_lines.append(f"Reservi kestus (SoC varu): {parameetrid['reservi_kestus_h']:g} tundi")
+    else:
+        output_lines.append(f"Maksimaalne aeg laadimise ja tühjendamise vahel: {parameetrid['max_aeg_vahel']:g} tundi")
     output_lines.append("")
     output_lines.append("=" * 80)
     output_lines.append("TULEMUSED KUUDE KAUPA")
     output_lines.append("=" * 80)
     output_lines.append("")
     
-    # Sorteerime kuud
-    sorted_kuud = sorted(kuu_tulud.keys())
-    
-    for kuu in sorted_kuud:
-        kuu_tulu = kuu_tulud[kuu]
-        kuu_andmed = tulemused_df[tulemused_df['Kuu'] == str(kuu)]
-        tsuklite_arv = len(kuu_andmed)
-        
-        output_lines.append(f"Kuu: {kuu}")
-        output_lines.append(f"  Tsüklite arv: {tsuklite_arv}")
-        output_lines.append(f"  Kogutulu: {kuu_tulu:.2f} EUR")
-        output_lines.append(f"  Keskmine tulu tsükli kohta: {kuu_tulu/tsuklite_arv:.2f} EUR" if tsuklite_arv > 0 else "  Keskmine tulu tsükli kohta: 0.00 EUR")
+    for kuu in statistika['kuu_statistika']:
+        output_lines.append(f"Kuu: {kuu['kuu']}")
+        output_lines.append(f"  Tsüklite arv: {kuu['tsuklite_arv']}")
+        output_lines.append(f"  Kogutulu: {kuu['kogutulu']:.2f} EUR")
+        output_lines.append(f"  Keskmine tulu tsükli kohta: {kuu['keskmine_tulu']:.2f} EUR")
         output_lines.append("")
     
     output_lines.append("=" * 80)
     output_lines.append("KOKKUVÕTE")
     output_lines.append("=" * 80)
-    output_lines.append(f"Kokku tsükleid: {len(tulemused_df)}")
-    output_lines.append(f"Kogutulu: {tulemused_df['Tulu'].sum():.2f} EUR")
-    output_lines.append(f"Keskmine tulu tsükli kohta: {tulemused_df['Tulu'].mean():.2f} EUR")
+    output_lines.append(f"Kokku tsükleid: {statistika['kokku_tsukleid']}")
+    output_lines.append(f"Kogutulu: {statistika['kogutulu']:.2f} EUR")
+    output_lines.append(f"Keskmine tulu tsükli kohta: {statistika['keskmine_tulu']:.2f} EUR")
     output_lines.append("")
     
     # Detailne nimekiri päevade kaupa (valikuliselt)
-    output_lines.append("=" * 80)
-    output_lines.append("DETAILNE NIMEKIRI (ESIMESED 50 PÄEVA)")
-    output_lines.append("=" * 80)
-    output_lines.append("")
-    output_lines.append(f"{'Kuupäev':<12} {'Laadimise aeg':<20} {'Tühjendamise aeg':<20} {'Ostuhind':<12} {'Müügihind':<12} {'Tulu':<12} {'Aeg vahel':<12}")
-    output_lines.append("-" * 80)
-    
-    for idx, row in tulemused_df.head(50).iterrows():
-        kuupaev_str = row['Kuupäev'].strftime('%d.%m.%Y') if hasattr(row['Kuupäev'], 'strftime') else str(row['Kuupäev'])
-        output_lines.append(
-            f"{kuupaev_str:<12} "
-            f"{row['Laadimise_aeg'].strftime('%d.%m.%Y %H:%M'):<20} "
-            f"{row['Tühjendamise_aeg'].strftime('%d.%m.%Y %H:%M'):<20} "
-            f"{row['Laadimise_hind']:>10.2f} EUR "
-            f"{row['Tühjendamise_hind']:>10.2f} EUR "
-            f"{row['Tulu']:>10.2f} EUR "
-            f"{row['Aeg_vahel']:>10.1f} h"
-        )
+    if tulemused_df is not None:
+        output_lines.append("=" * 80)
+        output_lines.append("DETAILNE NIMEKIRI (ESIMESED 50 PÄEVA)")
+        output_lines.append("=" * 80)
+        output_lines.append("")
+        output_lines.append(f"{'Kuupäev':<12} {'Laadimise aeg':<20} {'Tühjendamise aeg':<20} {'Ostuhind':<12} {'Müügihind':<12} {'Tulu':<12} {'Aeg vahel':<12}")
+        output_lines.append("-" * 80)
+        
+        for idx, row in tulemused_df.head(50).iterrows():
+            output_lines.append(
+                f"{pd.Timestamp(row['Kuupäev']).strftime('%d.%m.%Y'):<12} "
+                f"{row['Laadimise_aeg'].strftime('%d.%m.%Y %H:%M'):<20} "
+                f"{row['Tühjendamise_aeg'].strftime('%d.%m.%Y %H:%M'):<20} "
+                f"{row['Laadimise_hind']:>10.2f} EUR "
+                f"{row['Tühjendamise_hind']:>10.2f} EUR "
+                f"{row['Tulu']:>10.2f} EUR "
+                f"{row['Aeg_vahel']:>10.1f} h"
+            )
     
     # Salvestame faili
     output_tekst = "\n".join(output_lines)
-    output_fail = os.path.join('c:\\Cursor\\NPS', 'akupargi_tulemused.txt')
+    output_fail = os.path.join(kaust, 'akupargi_tulemused.txt')
     
     with open(output_fail, 'w', encoding='utf-8') as f:
         f.write(output_tekst)
     
     print(f"\nTulemused salvestatud faili: {output_fail}")
-    print(f"Kokku tsükleid: {len(tulemused_df)}")
-    print(f"Kogutulu: {tulemused_df['Tulu'].sum():.2f} EUR")
+    print(f"Kokku tsükleid: {statistika['kokku_tsukleid']}")
+    print(f"Kogutulu: {statistika['kogutulu']:.2f} EUR")
     
     # Salvestame ka CSV faili detailsete andmetega
-    csv_output = os.path.join('c:\\Cursor\\NPS', 'akupargi_tulemused.csv')
-    tulemused_df.to_csv(csv_output, index=False, encoding='utf-8-sig')
-    print(f"Detailne CSV salvestatud faili: {csv_output}")
+    if tulemused_df is not None:
+        csv_output = os.path.join(kaust, 'akupargi_tulemused.csv')
+        tulemused_df.to_csv(csv_output, index=False, encoding='utf-8-sig')
+        print(f"Detailne CSV salvestatud faili: {csv_output}")
+
+def _reservifailid(kaust, mudel):
+    """Mudeli reserv reservihindade failid kaustast (teiste mudelite jaoks neid ei loeta)"""
+    return hinnafailid(RESERVIFAILID, kaust) if mudel == 'reserv' else []
+
+def _parameetrid_argumendist(argumendid):
+    """Käsurea --voimsus jne üksikväärtustest aku parameetrid (puuduvad saavad vaikeväärtuse)"""
+    vaartused = {
+        nimi: None if tekst.strip().lower() == 'none' else float(tekst)
+        for nimi, tekst in [
+            ('aku_voimsus_mw', argumendid.voimsus),
+            ('aku_mahtuvus_mwh', argumendid.mahtuvus),
+            ('efektiivsus', argumendid.efektiivsus),
+            ('max_aeg_vahel', argumendid.max_aeg),
+            ('max_tsukleid_paevas', argumendid.max_tsukleid),
+            ('reservi_kestus_h', argumendid.reservi_kestus),
+        ]
+        if tekst is not None
+    }
+    return aku_parameetrid(vaartused, argumendid.mudel)
+
+def _vahemik_argumendist(tekst):
+    """'10:100:10' -> vahemik algus:lopp:samm, '50,100' -> nimekiri, '50' -> üks väärtus"""
+    if ':' in tekst:
+        osad = [float(x) for x in tekst.split(':')]
+        return {'algus': osad[0], 'lopp': osad[1], 'samm': osad[2] if len(osad) > 2 else 1}
+    vaartused = [None if x.strip().lower() == 'none' else float(x) for x in tekst.split(',')]
+    return vaartused if len(vaartused) > 1 else vaartused[0]
+
+def skaneeri_parameetrid(argumendid):
+    """Parameetrite võrgu läbimine (sama mis /api/sweep), tulemused CSV faili"""
+    import pandas as pd
+
+    maatriks, ridu = lae_maatriks(
+        hinnafailid(HINNAFAILID, argumendid.kaust), reservifailid=_reservifailid(argumendid.kaust, argumendid.mudel)
+    )
+    
+    if maatriks is None:
+        print("Andmeid ei leitud!")
+        return
+    if argumendid.mudel == 'reserv' and 'reservi_hinnad' not in maatriks:
+        print("Reservihindu ei leitud!")
+        return
+    
+    vahemikud = {
+        nimi: _vahemik_argumendist(tekst)
+        for nimi, tekst in [
+            ('aku_voimsus_mw', argumendid.voimsus),
+            ('aku_mahtuvus_mwh', argumendid.mahtuvus),
+            ('efektiivsus', argumendid.efektiivsus),
+            ('max_aeg_vahel', argumendid.max_aeg),
+            ('max_tsukleid_paevas', argumendid.max_tsukleid),
+        ]
+        if tekst is not None
+    }
+    if argumendid.reservi_kestus is not None:
+        vahemikud['reservi_kestus_h'] = _vahemik_argumendist(argumendid.reservi_kestus)
+    punktid = parameetrite_vork(vahemikud, argumendid.mudel)
+    print(f"Kokku {ridu} rida hinnaandmeid, {len(punktid)} parameetrikombinatsiooni")
+    
+    with ajastus.etapp('optimeerimine'):
+        if argumendid.hoidla:
+            # Hoidlaga arvutatakse ainult päevad, mida eelmistest käivitustest pole
+            from akupargi_hoidla import ava_hoidla, hinda_punkt_hoidlaga, lisa_rasid
+            hoidla = ava_hoidla(argumendid.hoidla)
+            lisa_rasid(maatriks)
+            tulemused = [hinda_punkt_hoidlaga(hoidla, maatriks, punkt, argumendid.mudel) for punkt in punktid]
+        else:
+            tulemused = skaneeri(maatriks, punktid, mudel=argumendid.mudel, tootajaid=argumendid.tootajaid)
+    
+    kuud = [str(kuu) for kuu in maatriks['kuud']]
+    tulemused_df = pd.DataFrame([
+        dict({k: v for k, v in t.items() if k != 'kuu_tulud'}, **dict(zip(kuud, t['kuu_tulud'])))
+        for t in tulemused
+    ])
+    tulemused_df.to_csv(argumendid.valjund, index=False, encoding='utf-8-sig')
+    
+    veerud = [veerg for veerg in PARAMEETRID + ('reservi_kestus_h', 'kogutulu') if veerg in tulemused_df.columns]
+    print(tulemused_df.sort_values('kogutulu', ascending=False).head(10)[veerud].to_string(index=False))
+    print(f"Tulemused salvestatud faili: {argumendid.valjund}")
+
+def ekspordi_graafik(argumendid):
+    """Kogu laadimis- ja tühjendusgraafik faili (sama mis /api/graafik), kirjutatud kuu kaupa"""
+    vorming = argumendid.vorming or os.path.splitext(argumendid.graafik)[1].lstrip('.').lower() or 'csv'
+    try:
+        graafik.kontrolli_valikud(argumendid.mudel, argumendid.detail, vorming)
+    except ValueError as e:
+        print(e)
+        return
+    maatriks, _ = lae_maatriks(hinnafailid(HINNAFAILID, argumendid.kaust), indeks=argumendid.mudel == 'tsukkel')
+    
+    if maatriks is None:
+        print("Andmeid ei leitud!")
+        return
+    
+    parameetrid = _parameetrid_argumendist(argumendid)
+    
+    tukid = graafik.graafiku_tukid(maatriks, mudel=argumendid.mudel, detail=argumendid.detail, **parameetrid)
+    with ajastus.etapp('optimeerimine'):
+        if vorming == 'csv':
+            with open(argumendid.graafik, 'w', encoding='utf-8-sig', newline='') as f:
+                for tekst in graafik.ekspordi(tukid, vorming):
+                    f.write(tekst)
+        else:
+            with open(argumendid.graafik, 'wb') as f:
+                for andmed in graafik.ekspordi(tukid, vorming):
+                    f.write(andmed)
+    print(f"Graafik ({argumendid.detail}, {vorming}) salvestatud faili: {argumendid.graafik}")
 
 if __name__ == "__main__":
-    simuleeri_akupark()
+    parser = argparse.ArgumentParser(description='Akupargi kauplemise simulatsioon')
+    parser.add_argument('--sweep', action='store_true', help='Parameetrite võrgu läbimine')
+    parser.add_argument('--kaust', default=os.path.dirname(os.path.abspath(__file__)), help='Tuulikutasu*.csv failide kaust')
+    parser.add_argument('--graafik', metavar='FAIL', help='Kogu laadimis- ja tühjendusgraafik faili (csv, parquet või arrow)')
+    parser.add_argument('--detail', default='paev', choices=graafik.DETAILID, help='Graafiku rida päeva või sloti kohta')
+    parser.add_argument('--vorming', choices=graafik.VORMINGUD, help='Graafiku vorming (vaikimisi faililaiendi järgi)')
+    parser.add_argument('--voimsus', help='Aku võimsus MW; --sweep korral ka vahemik, nt 10:100:10 või 25,50')
+    parser.add_argument('--mahtuvus', help='Aku mahtuvus MWh')
+    parser.add_argument('--efektiivsus', help='Efektiivsus (0..1)')
+    parser.add_argument('--max-aeg', help='Maksimaalne aeg laadimise ja tühjendamise vahel (h)')
+    parser.add_argument('--max-tsukleid', help='Maksimaalne tsüklite arv päevas (mudel soc)')
+    parser.add_argument('--reservi-kestus', help='Reservi kestus h, mille jagu SoC varu hoitakse (mudel reserv); --sweep korral ka vahemik')
+    parser.add_argument('--mudel', default='tsukkel', choices=MUDELID)
+    parser.add_argument('--tootajaid', type=int, default=None, help='Protsesside arv (vaikimisi protsessorite arv)')
+    parser.add_argument('--valjund', default='akupargi_sweep.csv', help='Tulemuste CSV fail')
+    parser.add_argument('--hoidla', help='Päevade tulemuste SQLite hoidla inkrementaalseks arvutuseks (--sweep)')
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='FAIL',
+                        help='cProfile aruanne (kumulatiivse aja järgi) stderr-i; FAIL korral ka pstats fail')
+    argumendid = parser.parse_args()
+    
+    if argumendid.profile is not None:
+        profiil = cProfile.Profile()
+        profiil.enable()
+    
+    # Etappide ajad (ka failide lugemise lõimed, mida cProfile ei näe)
+    with ajastus.mootmine() as etapid:
+        if argumendid.sweep:
+            skaneeri_parameetrid(argumendid)
+        elif argumendid.graafik:
+            ekspordi_graafik(argumendid)
+        else:
+            simuleeri_akupark(argumendid.kaust, argumendid.mudel, _parameetrid_argumendist(argumendid))
+    
+    if argumendid.profile is not None:
+        profiil.disable()
+        for nimi, kirje in etapid.items():
+            ridu = f" ({kirje['ridu']} rida)" if kirje['ridu'] is not None else ""
+            print(f"{nimi:<16} {kirje['ms']:>10.1f} ms{ridu}", file=sys.stderr)
+        pstats.Stats(profiil, stream=sys.stderr).sort_stats('cumulative').print_stats(PROFIILI_RIDU)
+        if argumendid.profile:
+            profiil.dump_stats(argumendid.profile)
+            print(f"Profiil salvestatud faili: {argumendid.profile}", file=sys.stderr)
 
@@ -0,0 +1,140 @@
+"""
+Partiisimulatsioon: palju aku konfiguratsioone üle mitme aasta hinnafailide.
+
+Hinnafailid antakse glob-mustritena, konfiguratsioonid JSON või CSV failina.
+Iga konfiguratsiooni ja aasta paar on eraldi ülesanne, mis jagatakse
+--tootajaid protsessile (akupargi_simulatsioon.partii_jarjest, sama mootor mis
+/api/arvuta). Tulemus on CSV fail üks rida konfiguratsiooni ja aasta kohta
+ning rida 'kokku' konfiguratsiooni kohta.
+
+Konfiguratsioonide fail:
+    JSON: nimekiri või {"mudel": "tsukkel", "konfiguratsioonid": [...]}, kus iga kirje on
+          {"nimi": "A", "mudel": "soc", "aku_voimsus_mw": 50, ...}; parameeter võib olla ka
+          nimekiri või {"algus", "lopp", "samm"} (parameetrite_vork), siis tekib mitu konfiguratsiooni
+    CSV:  päises nimi, mudel ja aku parameetrid (PARAMEETRID); tühi lahter = vaikeväärtus
+Mudel 'reserv' vajab reservihindade faile (--reserv) ja loeb kirjest ka reservi_kestus_h.
+
+Kasutamine:
+    python akupargi_partii.py "andmed/Tuulikutasu*.csv" --konfiguratsioonid akud.json --tootajaid 4
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from akupargi_simulatsioon import MUDELID, PARAMEETRID, hinnafailid, lae_maatriks, parameetrite_vork, partii_jarjest
+
+# Tulemuste CSV veerud
+VEERUD = ('nimi', 'mudel') + PARAMEETRID + ('reservi_kestus_h', 'aasta', 'kogutulu', 'tsukleid')
+
+
+def loe_konfiguratsioonid(failitee, mudel='tsukkel'):
+    """
+    Konfiguratsioonide failist nimekiri (nimi, mudel, aku parameetrid); mudel on vaikemudel.
+    Vigase faili korral ValueError.
+    """
+    with open(failitee, encoding='utf-8-sig', newline='') as f:
+        if failitee.lower().endswith('.csv'):
+            kirjed = [
+                {veerg: v if veerg in ('nimi', 'mudel') else float(v) for veerg, v in rida.items() if v not in (None, '')}
+                for rida in csv.DictReader(f)
+            ]
+        else:
+            kirjed = json.load(f)
+    if isinstance(kirjed, dict):
+        mudel = kirjed.get('mudel', mudel)
+        kirjed = kirjed.get('konfiguratsioonid')
+    if not isinstance(kirjed, list) or not kirjed:
+        raise ValueError(f'{failitee}: konfiguratsioonid peab olema mittetühi nimekiri')
+
+    konfiguratsioonid = []
+    for i, kirje in enumerate(kirjed):
+        if not isinstance(kirje, dict):
+            raise ValueError(f'{failitee}: iga konfiguratsioon peab olema objekt')
+        kirje_mudel = kirje.get('mudel', mudel)
+        if kirje_mudel not in MUDELID:
+            raise ValueError(f'{failitee}: tundmatu mudel {kirje_mudel}')
+        nimi = str(kirje.get('nimi', f'K{i + 1}'))
+        vahemikud = {
+            parameeter: kirje[parameeter] for parameeter in PARAMEETRID + ('reservi_kestus_h',) if parameeter in kirje
+        }
+        for punkt in parameetrite_vork(vahemikud, kirje_mudel):
+            konfiguratsioonid.append(dict(punkt, nimi=nimi, mudel=kirje_mudel))
+    return konfiguratsioonid
+
+
+def simuleeri_partii(csv_failid, konfiguratsioonid, tootajaid=None, reservifailid=()):
+    """
+    Kõigi konfiguratsioonide tulud aastate kaupa (read VEERUD kujul): iga konfiguratsiooni aastate
+    read ja nende järel rida aasta='kokku'. Tagastab (read, päevamaatriks) või (None, None).
+    """
+    indeks = any(k['mudel'] == 'tsukkel' for k in konfiguratsioonid)
+    maatriks, _ = lae_maatriks(csv_failid, indeks=indeks, reservifailid=reservifailid)
+    if maatriks is None:
+        return None, None
+    if any(k['mudel'] == 'reserv' for k in konfiguratsioonid) and 'reservi_hinnad' not in maatriks:
+        raise ValueError('Mudel reserv vajab reservihindu (--reserv)')
+
+    tulemused = [[] for _ in konfiguratsioonid]
+    for i, tulemus in partii_jarjest(
+        maatriks, [(k['mudel'], {nimi: k[nimi] for nimi in VEERUD if nimi in k and nimi not in ('nimi', 'mudel')})
+         for k in konfiguratsioonid], tootajaid
+    ):
+        tulemused[i].append(tulemus)
+
+    read = []
+    for konfiguratsioon, aastad in zip(konfiguratsioonid, tulemused):
+        alus = {veerg: konfiguratsioon.get(veerg) for veerg in ('nimi', 'mudel') + PARAMEETRID + ('reservi_kestus_h',)}
+        read.extend(dict(alus, **aasta) for aasta in aastad)
+        read.append(dict(
+            alus, aasta='kokku',
+            kogutulu=float(sum(a['kogutulu'] for a in aastad)), tsukleid=sum(a['tsukleid'] for a in aastad)
+        ))
+    return read, maatriks
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Akupargi partiisimulatsioon (palju konfiguratsioone, mitu aastat)')
+    parser.add_argument('failid', nargs='+', help='Hinnafailide glob-mustrid, nt "andmed/Tuulikutasu*.csv"')
+    parser.add_argument('--konfiguratsioonid', required=True, metavar='FAIL', help='Aku konfiguratsioonid (JSON või CSV)')
+    parser.add_argument('--reserv', nargs='+', default=[], metavar='MUSTER',
+                        help='Reservihindade failide glob-mustrid (mudel reserv)')
+    parser.add_argument('--mudel', default='tsukkel', choices=MUDELID, help='Vaikemudel, kui konfiguratsioonis pole')
+    parser.add_argument('--tootajaid', '--workers', type=int, default=None,
+                        help='Protsesside arv (vaikimisi protsessorite arv)')
+    parser.add_argument('--valjund', default='akupargi_partii.csv', help='Tulemuste CSV fail')
+    argumendid = parser.parse_args()
+
+    try:
+        konfiguratsioonid = loe_konfiguratsioonid(argumendid.konfiguratsioonid, argumendid.mudel)
+    except (OSError, ValueError, TypeError) as e:
+        sys.exit(f'Konfiguratsioonide viga: {e}')
+    csv_failid = hinnafailid(argumendid.failid)
+    if not csv_failid:
+        sys.exit('CSV faile ei leitud!')
+
+    algus = time.perf_counter()
+    try:
+        read, maatriks = simuleeri_partii(
+            csv_failid, konfiguratsioonid, argumendid.tootajaid, hinnafailid(argumendid.reserv)
+        )
+    except ValueError as e:
+        sys.exit(str(e))
+    if read is None:
+        sys.exit('Andmeid ei leitud!')
+    kestus = time.perf_counter() - algus
+
+    with open(argumendid.valjund, 'w', encoding='utf-8-sig', newline='') as f:
+        kirjutaja = csv.DictWriter(f, fieldnames=VEERUD)
+        kirjutaja.writeheader()
+        kirjutaja.writerows(read)
+
+    kokku = sorted((r for r in read if r['aasta'] == 'kokku'), key=lambda r: r['kogutulu'], reverse=True)
+    print(f"{len(csv_failid)} faili, {len(maatriks['paevad'])} päeva, {len(konfiguratsioonid)} konfiguratsiooni, "
+          f"{kestus:.1f} s")
+    for r in kokku[:10]:
+        print(f"{r['nimi']:<16} {r['mudel']:<8} {r['aku_voimsus_mw']:>7g} MW {r['aku_mahtuvus_mwh']:>7g} MWh "
+              f"{r['kogutulu']:>14.2f} EUR {r['tsukleid']:>6d} tsüklit")
+    print(f"Tulemused salvestatud faili: {os.path.abspath(argumendid.valjund)}")
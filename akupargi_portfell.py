@@ -0,0 +1,136 @@
+"""
+Mitme pargi portfell mitmes hinnapiirkonnas (EE, FI, LV, ...).
+
+Piirkondade hinnad joondatakse ühisele ajateljele (akupargi_andmed.joonda_tsoonid),
+nii et kõigil piirkondadel on samad päevad ja slotid. Portfelli maatriks on tavaline
+päevamaatriks, millele lisanduvad kõigi piirkondade hinnad üksteise all
+((piirkonnad × päevad) × slotid) ja nende ühine päevaindeks. Sama akuga pargid
+(ka eri piirkondades) arvutatakse ühe optimeerimisena üle oma piirkondade ridade;
+portfelli kuu tulu on parkide kuu tulude summa.
+"""
+import numpy as np
+
+from akupargi_andmed import VAIKETSOON, koosta_paevamaatriks, kuu_keskmised_hinnad
+from akupargi_mootor import koosta_paevaindeks, vali_indeks
+from akupargi_simulatsioon import PARAMEETRID, aku_parameetrid, kuude_tulud, paevade_tulud
+
+MAX_PARKE = 200
+# Piirkondade reservihindu portfell ei loe
+PORTFELLI_MUDELID = ('tsukkel', 'soc', 'ajajoon')
+
+
+def koosta_portfell(joondatud):
+    """
+    joonda_tsoonid tulemusest portfelli maatriks: koosta_paevamaatriks võtmed (esimese piirkonna
+    hindadega) ning tsoonid, tsoonide_hinnad ja tsoonide_indeks.
+    """
+    tsoonid = [veerg for veerg in joondatud.columns if veerg not in ('Kuupäev', 'Ajatempel')]
+    maatriksid = [
+        koosta_paevamaatriks(joondatud[['Kuupäev', 'Ajatempel', tsoon]].rename(columns={tsoon: 'Hind'}))
+        for tsoon in tsoonid
+    ]
+    portfell = dict(maatriksid[0])
+    portfell['tsoonid'] = tsoonid
+    portfell['tsoonide_hinnad'] = np.vstack([m['hinnad'] for m in maatriksid])
+    portfell['tsoonide_indeks'] = koosta_paevaindeks(
+        portfell['tsoonide_hinnad'],
+        np.tile(portfell['pikkused'], len(tsoonid)), np.tile(portfell['slotipikkused'], len(tsoonid))
+    )
+    return portfell
+
+
+def tsooni_maatriks(portfell, tsoon):
+    """Ühe piirkonna päevamaatriks (portfelli ühised võtmed selle piirkonna hindadega)"""
+    paevi = len(portfell['paevad'])
+    z = portfell['tsoonid'].index(tsoon)
+    maatriks = {nimi: v for nimi, v in portfell.items() if not nimi.startswith('tsoon')}
+    maatriks['hinnad'] = portfell['tsoonide_hinnad'][z * paevi:(z + 1) * paevi]
+    return maatriks
+
+
+def kontrolli_pargid(pargid, tsoonid):
+    """
+    Pargide kirjeldused normaliseeritud kujul: nimi, tsoon ja aku parameetrid (puuduvad saavad
+    vaikeväärtuse). Vigase kirjelduse korral ValueError.
+    """
+    if not isinstance(pargid, list) or not pargid:
+        raise ValueError('pargid peab olema mittetühi nimekiri')
+    if len(pargid) > MAX_PARKE:
+        raise ValueError(f'Liiga palju parke: {len(pargid)} (lubatud {MAX_PARKE})')
+
+    tulemus = []
+    for i, park in enumerate(pargid):
+        if not isinstance(park, dict):
+            raise ValueError('Iga park peab olema objekt')
+        nimi = str(park.get('nimi', f'Park {i + 1}'))
+        tsoon = park.get('tsoon', VAIKETSOON)
+        if tsoon not in tsoonid:
+            raise ValueError(f'Pargi {nimi} piirkonna {tsoon} hindu pole (olemas: {", ".join(tsoonid)})')
+        try:
+            kirje = dict({'nimi': nimi, 'tsoon': tsoon}, **aku_parameetrid(park))
+        except ValueError as e:
+            raise ValueError(f'Park {nimi}: {e}') from None
+        tulemus.append(kirje)
+    return tulemus
+
+
+def _tsoonide_tulud(portfell, tsoonid, parameetrid, mudel):
+    """Ühe aku parameetrid mitmes piirkonnas ühe optimeerimisena: {tsoon: (tulud, tsukleid)}"""
+    paevi = len(portfell['paevad'])
+    if mudel == 'ajajoon':
+        # Ajajoon on iga piirkonna jaoks üks pidev rida, piirkondi ei saa ridadena kokku panna
+        return {tsoon: paevade_tulud(tsooni_maatriks(portfell, tsoon), mudel=mudel, **parameetrid) for tsoon in tsoonid}
+
+    z = np.array([portfell['tsoonid'].index(tsoon) for tsoon in tsoonid])
+    read = (z[:, np.newaxis] * paevi + np.arange(paevi)).ravel()
+    koos = {
+        'hinnad': portfell['tsoonide_hinnad'][read],
+        'pikkused': np.tile(portfell['pikkused'], len(z)),
+        'slotipikkused': np.tile(portfell['slotipikkused'], len(z)),
+    }
+    if mudel == 'tsukkel':
+        koos['indeks'] = vali_indeks(portfell['tsoonide_indeks'], read)
+    tulud, tsukleid = paevade_tulud(koos, mudel=mudel, **parameetrid)
+    return {
+        tsoon: (tulud[k * paevi:(k + 1) * paevi], tsukleid[k * paevi:(k + 1) * paevi])
+        for k, tsoon in enumerate(tsoonid)
+    }
+
+
+def simuleeri_portfell(portfell, pargid, mudel='tsukkel'):
+    """
+    Kõigi parkide (kontrolli_pargid) kuude tulud. Sama aku parameetritega pargid arvutatakse koos,
+    korduvad (piirkond, aku) paarid üks kord. Tagastab (pargid koos kogutulu, tsüklite ja kuu
+    tuludega, portfelli kokkuvõte).
+    """
+    if mudel not in PORTFELLI_MUDELID:
+        raise ValueError(f'Portfell toetab mudeleid {", ".join(PORTFELLI_MUDELID)}, mitte {mudel}')
+
+    ruhmad = {}
+    for park in pargid:
+        ruhmad.setdefault(tuple(park[nimi] for nimi in PARAMEETRID), []).append(park['tsoon'])
+    tulud = {}
+    for voti, tsoonid in ruhmad.items():
+        tsoonid = sorted(set(tsoonid), key=portfell['tsoonid'].index)
+        for tsoon, tulemus in _tsoonide_tulud(portfell, tsoonid, dict(zip(PARAMEETRID, voti)), mudel).items():
+            tulud[voti, tsoon] = tulemus
+
+    tulemused = []
+    for park in pargid:
+        summad, arvud = kuude_tulud(portfell, *tulud[tuple(park[nimi] for nimi in PARAMEETRID), park['tsoon']])
+        tulemused.append(dict(
+            park, kogutulu=float(sum(summad)), tsukleid=int(sum(arvud)),
+            kuu_tulud=[float(s) for s in summad], kuu_tsukleid=arvud
+        ))
+
+    kuu_tulud = [sum(t['kuu_tulud'][k] for t in tulemused) for k in range(len(portfell['kuud']))]
+    kokku = {
+        'kogutulu': float(sum(kuu_tulud)),
+        'tsukleid': sum(t['tsukleid'] for t in tulemused),
+        'kuu_tulud': kuu_tulud,
+        'kuu_keskmised_hinnad': {
+            tsoon: [float(h) for h in kuu_keskmised_hinnad(tsooni_maatriks(portfell, tsoon))]
+            for tsoon in sorted({park['tsoon'] for park in pargid}, key=portfell['tsoonid'].index)
+        },
+    }
+    return tulemused, kokku
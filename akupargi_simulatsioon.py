@@ -0,0 +1,394 @@
+"""
+Simulatsiooni tuum, mida kasutavad nii Flaski API kui ka käsurea tööriistad.
+
+Leiab ja laeb hinnafailid päevamaatriksiks, normaliseerib aku parameetrid,
+arvutab ühe parameetrikomplekti päevade, kuude ja aastate tulud ning käib
+läbi terve parameetrite võrgu (sweep) või konfiguratsioonide ja aastate
+partii, jagades ülesanded protsessipoolile. Hinnamaatriks saadetakse igale
+töötajale ühe korra.
+
+Import on kerge (NumPy ja akupargi_mootor): pandas laetakse alles failide
+lugemisel, nii et käsurea käivitus ja protsessipooli töötajad seda ei oota.
+"""
+import glob
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from akupargi_mootor import (
+    koosta_paevaindeks, optimeeri_ajajoon, optimeeri_paevad, optimeeri_reserv, optimeeri_soc, vali_indeks
+)
+
+MUDELID = ('tsukkel', 'soc', 'ajajoon', 'reserv')
+PARAMEETRID = ('aku_voimsus_mw', 'aku_mahtuvus_mwh', 'efektiivsus', 'max_aeg_vahel', 'max_tsukleid_paevas')
+VAIKIMISI = {
+    'aku_voimsus_mw': 50.0,
+    'aku_mahtuvus_mwh': 100.0,
+    'efektiivsus': 0.87,
+    'max_aeg_vahel': 8,
+    'max_tsukleid_paevas': None,
+}
+MAX_PUNKTE = 5000
+# Mudeli 'reserv' vaikimisi nõutav reservi täieliku aktiveerimise kestus tundides (laetuse varu)
+RESERVI_KESTUS_H = 1.0
+
+
+def aku_parameetrid(andmed, mudel=None):
+    """
+    Aku parameetrid (PARAMEETRID) sõnastikust andmed õiget tüüpi; puuduvad saavad vaikeväärtuse.
+    Mudeli 'reserv' korral lisaks reservi_kestus_h. Vigase väärtuse korral ValueError või TypeError.
+    """
+    punkt = {nimi: andmed.get(nimi, VAIKIMISI[nimi]) for nimi in PARAMEETRID}
+    punkt['aku_voimsus_mw'] = float(punkt['aku_voimsus_mw'])
+    punkt['aku_mahtuvus_mwh'] = float(punkt['aku_mahtuvus_mwh'])
+    punkt['efektiivsus'] = float(punkt['efektiivsus'])
+    if not (punkt['aku_voimsus_mw'] > 0 and punkt['aku_mahtuvus_mwh'] > 0 and 0 < punkt['efektiivsus'] <= 1):
+        raise ValueError('Võimsus ja mahtuvus peavad olema positiivsed ja efektiivsus 0..1')
+    punkt['max_aeg_vahel'] = float(punkt['max_aeg_vahel'])
+    if punkt['max_tsukleid_paevas'] in (None, ''):
+        punkt['max_tsukleid_paevas'] = None
+    else:
+        punkt['max_tsukleid_paevas'] = float(punkt['max_tsukleid_paevas'])
+    if mudel == 'reserv':
+        punkt['reservi_kestus_h'] = float(andmed.get('reservi_kestus_h', RESERVI_KESTUS_H))
+        if punkt['reservi_kestus_h'] < 0:
+            raise ValueError('reservi_kestus_h ei saa olla negatiivne')
+        if punkt['max_tsukleid_paevas'] is not None:
+            raise ValueError('Mudel reserv ei toeta max_tsukleid_paevas')
+    return punkt
+
+
+def hinnafailid(mustrid, kaust=''):
+    """Mustritele (glob, suhtelised kausta kaust suhtes) vastavad failid sorteeritult ja korduseta"""
+    return sorted({fail for muster in mustrid for fail in glob.glob(os.path.join(kaust, muster.strip()))})
+
+
+def lae_maatriks(csv_failid, tsoon=None, indeks=True, reservifailid=()):
+    """
+    Hinnafailide päevamaatriks (akupargi_andmed.koosta_paevamaatriks), indeks=True korral koos
+    päevaindeksiga (indekseeri) ja reservifailid korral reservi_hinnad (mudel 'reserv', samas
+    CSV vormingus). Tagastab (maatriks, ridade arv); (None, 0), kui andmeid pole.
+    """
+    # pandas laetakse alles siin
+    from akupargi_ajastus import etapp
+    from akupargi_andmed import joonda_reservihinnad, koosta_paevamaatriks, loe_hinnafailid
+
+    kogu_df = loe_hinnafailid(csv_failid, tsoon=tsoon)
+    if kogu_df.empty:
+        return None, 0
+    with etapp('ruhmitamine'):
+        maatriks = koosta_paevamaatriks(kogu_df)
+    if indeks:
+        with etapp('indekseerimine'):
+            indekseeri(maatriks)
+    if reservifailid:
+        maatriks['reservi_hinnad'] = joonda_reservihinnad(maatriks, loe_hinnafailid(reservifailid))
+    return maatriks, len(kogu_df)
+
+
+def indekseeri(maatriks):
+    """
+    Lisab päevamaatriksile mudeli 'tsukkel' päevaindeksi (koosta_paevaindeks), mida paevade_tulud
+    kasutab iga parameetrikomplekti korral. Tagastab sama maatriksi.
+    """
+    maatriks['indeks'] = koosta_paevaindeks(maatriks['hinnad'], maatriks['pikkused'], maatriks['slotipikkused'])
+    return maatriks
+
+
+def paevade_tulud(maatriks, aku_voimsus_mw, aku_mahtuvus_mwh, efektiivsus, max_aeg_vahel,
+                  mudel='tsukkel', max_tsukleid_paevas=None, reservi_kestus_h=RESERVI_KESTUS_H):
+    """
+    Optimeerib kõik päevad. Tagastab (tulud, tsukleid) päevade kaupa, kus tsukleid on
+    päeval toimunud tsüklite arv (mudelis 'soc' 1 päeval, mil teeniti tulu; mudelis 'reserv' 1 päeval,
+    mil tühjendati, sest ainult reservitulu ei ole tsükkel; mudelis 'ajajoon' laadimise alguse päeva järgi).
+    """
+    if mudel == 'reserv':
+        if max_tsukleid_paevas is not None:
+            raise ValueError('Mudel reserv ei toeta max_tsukleid_paevas')
+        _, muudud, _, tulud = reservi_graafik(
+            maatriks, aku_voimsus_mw, aku_mahtuvus_mwh, efektiivsus, reservi_kestus_h
+        )
+        return tulud, (muudud.sum(axis=1) > 0).astype(int)
+
+    if mudel == 'soc':
+        _, _, tulud = optimeeri_soc(
+            maatriks['hinnad'], aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus,
+            pikkused=maatriks['pikkused'], max_tsukleid=max_tsukleid_paevas,
+            slotipikkus_h=maatriks['slotipikkused']
+        )
+        return tulud, (tulud > 0).astype(int)
+
+    if mudel == 'ajajoon':
+        # Kogu hinnarida ühe ajajoonena; tsükli tulu läheb laadimise alguse päevale
+        hinnad, katkestused, paev, slotipikkus = ajajoon(maatriks)
+        laadimise_algused, _, tsuklite_tulud = optimeeri_ajajoon(
+            hinnad, aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, max_aeg_vahel,
+            katkestused=katkestused, slotipikkus_h=slotipikkus
+        )
+        paevi = len(maatriks['paevad'])
+        paev = paev[laadimise_algused]
+        return np.bincount(paev, weights=tsuklite_tulud, minlength=paevi), np.bincount(paev, minlength=paevi)
+
+    laadimine, _, tulud = optimeeri_paevad(
+        maatriks['hinnad'], aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, max_aeg_vahel,
+        pikkused=maatriks['pikkused'], slotipikkus_h=maatriks['slotipikkused'], indeks=maatriks.get('indeks')
+    )
+    return tulud, (laadimine[:, 0] >= 0).astype(int)
+
+
+def reservi_graafik(maatriks, aku_voimsus_mw, aku_mahtuvus_mwh, efektiivsus, reservi_kestus_h=RESERVI_KESTUS_H):
+    """
+    Mudel 'reserv' (akupargi_mootor.optimeeri_reserv) maatriksi reservihindadega.
+    Tagastab (ostetud_mwh, muudud_mwh, reserv_mw, tulu); ValueError, kui reservihindu pole.
+    """
+    if 'reservi_hinnad' not in maatriks:
+        raise ValueError('Mudel reserv vajab reservihindu (reservi hinnafaile ei leitud)')
+    return optimeeri_reserv(
+        maatriks['hinnad'], maatriks['reservi_hinnad'], aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus,
+        reservi_kestus_h, pikkused=maatriks['pikkused'], slotipikkus_h=maatriks['slotipikkused']
+    )
+
+
+def ajajoon(maatriks):
+    """
+    Päevamaatriks ühtlase sammuga hinnareaks (lühim sloti pikkus; pikemad slotid korratakse).
+    Tagastab (hinnad, katkestused, päeva indeks iga sloti kohta, sloti pikkus tundides);
+    katkestused on True kohtades, mis ei järgne eelmisele slotile vahetult (puuduvad andmed).
+    """
+    slotipikkus = float(maatriks['slotipikkused'].min())
+    kordused = np.repeat(np.rint(maatriks['slotipikkused'] / slotipikkus).astype(int), maatriks['pikkused'])
+    hinnad = np.repeat(maatriks['hinnad'][maatriks['kehtiv']], kordused)
+    paev = np.repeat(np.repeat(np.arange(len(maatriks['paevad'])), maatriks['pikkused']), kordused)
+    samm = int(round(slotipikkus * 3600))
+    nihe = np.arange(len(hinnad)) - np.repeat(np.cumsum(kordused) - kordused, kordused)
+    ajatemplid = np.repeat(maatriks['ajatemplid'], kordused) + nihe * samm
+    return hinnad, np.r_[True, np.diff(ajatemplid) != samm], paev, slotipikkus
+
+
+def kuude_tulud(maatriks, tulud, tsukleid):
+    """Iga kuu kogutulu ja tsüklite arv (kõik kuud, ka need, kus tsükleid polnud)"""
+    summad = []
+    arvud = []
+    for algus, lopp in zip(maatriks['kuu_piirid'][:-1], maatriks['kuu_piirid'][1:]):
+        kuu_tsukleid = tsukleid[algus:lopp]
+        summad.append(sum(tulud[algus:lopp][kuu_tsukleid > 0].tolist()))
+        arvud.append(int(kuu_tsukleid.sum()))
+    return summad, arvud
+
+
+def kuu_kirje(kuu, kuu_tulu, tsuklite_arv, keskmine_nps_hind):
+    """Ühe kuu statistika (ilma erinevuseta keskmisest)"""
+    return {
+        'kuu': str(kuu),
+        'tsuklite_arv': tsuklite_arv,
+        'kogutulu': float(kuu_tulu),
+        'keskmine_tulu': float(kuu_tulu / tsuklite_arv) if tsuklite_arv else 0.0,
+        'keskmine_nps_hind': float(keskmine_nps_hind)
+    }
+
+
+def kuude_statistika(maatriks, kuu_summad, kuu_arvud, keskmised_hinnad):
+    """Kuude summadest kuude statistika (ainult kuud, kus oli tsükleid) ja kokkuvõte (/api/arvuta vastus)"""
+    kuu_statistika = []
+    kogu_tulu = 0
+    kogu_tsuklite_arv = 0
+
+    for k, kuu in enumerate(maatriks['kuud']):
+        tsuklite_arv = kuu_arvud[k]
+        if tsuklite_arv == 0:
+            continue
+        kogu_tulu += kuu_summad[k]
+        kogu_tsuklite_arv += tsuklite_arv
+        kuu_statistika.append(kuu_kirje(kuu, kuu_summad[k], tsuklite_arv, keskmised_hinnad[k]))
+
+    # Üldine keskmine ja iga kuu erinevus sellest
+    uldine_keskmine = kogu_tulu / kogu_tsuklite_arv if kogu_tsuklite_arv > 0 else 0
+    for stat in kuu_statistika:
+        stat['erinevus_keskmisest'] = float(stat['keskmine_tulu'] - uldine_keskmine)
+
+    return {
+        'kuu_statistika': kuu_statistika,
+        'kokku_tsukleid': kogu_tsuklite_arv,
+        'kogutulu': float(kogu_tulu),
+        'keskmine_tulu': float(uldine_keskmine)
+    }
+
+
+def paevade_osa(maatriks, read):
+    """Päevamaatriks ainult päevadega read (vali_paevad) koos päevaindeksi vastava osaga"""
+    from akupargi_andmed import vali_paevad
+
+    read = np.asarray(read, dtype=int)
+    osa = vali_paevad(maatriks, read)
+    if 'indeks' in maatriks:
+        osa['indeks'] = vali_indeks(maatriks['indeks'], read)
+    return osa
+
+
+def kuude_maatriksid(maatriks):
+    """Iga kuu päevamaatriks (vali_paevad) koos päevaindeksi vastava osaga, kuude järjekorras"""
+    for algus, lopp in zip(maatriks['kuu_piirid'][:-1], maatriks['kuu_piirid'][1:]):
+        yield paevade_osa(maatriks, np.arange(algus, lopp))
+
+
+def kuude_aastad(maatriks):
+    """Iga kuu aasta (int), pikkus K"""
+    return maatriks['kuud'].astype('datetime64[Y]').astype(int) + 1970
+
+
+def aastate_maatriksid(maatriks):
+    """(aasta, selle aasta päevamaatriks) aastate järjekorras (vt kuude_maatriksid)"""
+    aastad = kuude_aastad(maatriks)
+    algused = np.flatnonzero(np.r_[True, aastad[1:] != aastad[:-1]]) if len(aastad) else np.zeros(0, dtype=int)
+    piirid = maatriks['kuu_piirid'][np.r_[algused, len(aastad)]]
+    for k, algus, lopp in zip(algused, piirid[:-1], piirid[1:]):
+        yield int(aastad[k]), paevade_osa(maatriks, np.arange(algus, lopp))
+
+
+def vahemik(vaartus):
+    """
+    Parameetri väärtused: arv, nimekiri või {'algus': .., 'lopp': .., 'samm': ..} (lopp kaasa arvatud).
+    """
+    if isinstance(vaartus, dict):
+        algus = float(vaartus['algus'])
+        lopp = float(vaartus.get('lopp', algus))
+        samm = float(vaartus.get('samm', 1))
+        if samm <= 0:
+            raise ValueError('Vahemiku samm peab olema positiivne')
+        return [round(v, 10) for v in np.arange(algus, lopp + samm / 2, samm).tolist()]
+    if isinstance(vaartus, (list, tuple)):
+        return list(vaartus)
+    return [vaartus]
+
+
+def parameetrite_vork(vahemikud, mudel=None):
+    """
+    Kõik parameetrikombinatsioonid; puuduvad parameetrid saavad vaikeväärtuse. Mudeli 'reserv' korral
+    on võrgus ka reservi_kestus_h.
+    """
+    nimed = PARAMEETRID + (('reservi_kestus_h',) if mudel == 'reserv' else ())
+    vaikimisi = dict(VAIKIMISI, reservi_kestus_h=RESERVI_KESTUS_H)
+    vaartused = [vahemik(vahemikud.get(nimi, vaikimisi[nimi])) for nimi in nimed]
+    punkte = int(np.prod([len(v) for v in vaartused]))
+    if punkte > MAX_PUNKTE:
+        raise ValueError(f'Liiga palju parameetrikombinatsioone: {punkte} (lubatud {MAX_PUNKTE})')
+
+    return [aku_parameetrid(dict(zip(nimed, kombinatsioon)), mudel) for kombinatsioon in itertools.product(*vaartused)]
+
+
+def hinda_punkt(maatriks, punkt, mudel='tsukkel'):
+    """Ühe parameetrikomplekti kuude tulud"""
+    tulud, tsukleid = paevade_tulud(maatriks, mudel=mudel, **punkt)
+    summad, arvud = kuude_tulud(maatriks, tulud, tsukleid)
+    return dict(punkt, kogutulu=float(sum(summad)), tsukleid=int(sum(arvud)), kuu_tulud=[float(s) for s in summad])
+
+
+def hinda_aastad(maatriks, punkt, mudel='tsukkel'):
+    """Ühe parameetrikomplekti tulud aastate kaupa: [{'aasta', 'kogutulu', 'tsukleid'}]"""
+    tulud, tsukleid = paevade_tulud(maatriks, mudel=mudel, **punkt)
+    summad, arvud = kuude_tulud(maatriks, tulud, tsukleid)
+    aastad = kuude_aastad(maatriks).tolist()
+    return [
+        {
+            'aasta': aasta,
+            'kogutulu': float(sum(s for s, a in zip(summad, aastad) if a == aasta)),
+            'tsukleid': int(sum(n for n, a in zip(arvud, aastad) if a == aasta)),
+        }
+        for aasta in sorted(set(aastad))
+    ]
+
+
+# Töötajaprotsessi hinnamaatriksid (seatakse üks kord protsessi alguses)
+_tootaja_maatriksid = None
+
+
+def _tootaja_algus(maatriksid):
+    """ProcessPoolExecutor'i initializer"""
+    global _tootaja_maatriksid
+    _tootaja_maatriksid = maatriksid
+
+
+def _tootaja_ulesanne(ulesanne):
+    funktsioon, voti, argumendid = ulesanne
+    return funktsioon(_tootaja_maatriksid[voti], *argumendid)
+
+
+def hinda_jarjest(maatriksid, ulesanded, tootajaid=None):
+    """
+    Ülesanded (funktsioon, maatriksi võti, argumendid) ükshaaval: iga tulemus funktsioon(maatriksid[võti],
+    *argumendid) antakse kohe, kui see (ja kõik eelmised) on valmis. tootajaid > 1 korral jagatakse
+    ülesanded protsessipoolile, kus iga töötaja saab maatriksid ühe korra; generaatori sulgemisel
+    tühistatakse alustamata ülesanded.
+    """
+    tootajaid = min(tootajaid or os.cpu_count() or 1, len(ulesanded))
+    if tootajaid <= 1:
+        for funktsioon, voti, argumendid in ulesanded:
+            yield funktsioon(maatriksid[voti], *argumendid)
+        return
+
+    taitja = ProcessPoolExecutor(max_workers=tootajaid, initializer=_tootaja_algus, initargs=(maatriksid,))
+    try:
+        yield from taitja.map(
+            _tootaja_ulesanne, ulesanded, chunksize=max(1, len(ulesanded) // (4 * tootajaid))
+        )
+    finally:
+        taitja.shutdown(wait=True, cancel_futures=True)
+
+
+def skaneeri_jarjest(maatriks, punktid, mudel='tsukkel', tootajaid=None):
+    """Hindab punktid (hinda_punkt) hinda_jarjest abil ja annab iga tulemuse kohe, kui see on valmis"""
+    if mudel not in MUDELID:
+        raise ValueError(f'Tundmatu mudel: {mudel}')
+    yield from hinda_jarjest({None: maatriks}, [(hinda_punkt, None, (punkt, mudel)) for punkt in punktid], tootajaid)
+
+
+def skaneeri(maatriks, punktid, mudel='tsukkel', tootajaid=None):
+    """Hindab kõik punktid (skaneeri_jarjest) ja tagastab tulemuste nimekirja"""
+    return list(skaneeri_jarjest(maatriks, punktid, mudel, tootajaid))
+
+
+def partii_jarjest(maatriks, konfiguratsioonid, tootajaid=None):
+    """
+    Konfiguratsioonide (mudel, parameetrid) tulud aastate kaupa: annab (konfiguratsiooni indeks, aasta
+    tulemus hinda_aastad kujul) konfiguratsioonide ja aastate järjekorras. Protsessipoolis on ülesanne
+    üks konfiguratsioon ühe aasta kohta (päevad on sõltumatud, tulemus on sama mis tervel maatriksil);
+    mudeli 'ajajoon' tsüklid võivad üle aasta piiri ulatuda, seega on selle ülesanne kogu maatriks.
+    """
+    for mudel, _ in konfiguratsioonid:
+        if mudel not in MUDELID:
+            raise ValueError(f'Tundmatu mudel: {mudel}')
+    maatriksid = dict(aastate_maatriksid(maatriks))
+    if any(mudel == 'ajajoon' for mudel, _ in konfiguratsioonid):
+        maatriksid[None] = maatriks
+
+    ulesanded = []
+    indeksid = []
+    for i, (mudel, punkt) in enumerate(konfiguratsioonid):
+        for aasta in ([None] if mudel == 'ajajoon' else [a for a in maatriksid if a is not None]):
+            ulesanded.append((hinda_aastad, aasta, (punkt, mudel)))
+            indeksid.append(i)
+    for i, aastad in zip(indeksid, hinda_jarjest(maatriksid, ulesanded, tootajaid)):
+        for tulemus in aastad:
+            yield i, tulemus
+
+
+def soojuskaart(tulemused):
+    """
+    Kui võrgus muutub täpselt kaks parameetrit, tagastab nende kogutulu tabeli
+    (read = esimene parameeter, veerud = teine); muidu None.
+    """
+    muutuvad = [nimi for nimi in PARAMEETRID if len({t[nimi] for t in tulemused}) > 1]
+    if len(muutuvad) != 2:
+        return None
+
+    y_nimi, x_nimi = muutuvad
+    # None (piiramata tsükleid) jääb viimaseks
+    jarjestus = lambda v: (v is None, v or 0)
+    y_vaartused = sorted({t[y_nimi] for t in tulemused}, key=jarjestus)
+    x_vaartused = sorted({t[x_nimi] for t in tulemused}, key=jarjestus)
+    tabel = [[None] * len(x_vaartused) for _ in y_vaartused]
+    for t in tulemused:
+        tabel[y_vaartused.index(t[y_nimi])][x_vaartused.index(t[x_nimi])] = t['kogutulu']
+    return {'y': y_nimi, 'x': x_nimi, 'y_vaartused': y_vaartused, 'x_vaartused': x_vaartused, 'kogutulu': tabel}
@@ -0,0 +1,167 @@
+"""
+Hinnastsenaariumide (Monte Carlo) tulujaotus.
+
+Stsenaarium on ajaloo päevade plokkidena ümber valitud hinnarida (block
+bootstrap päevade kaupa): iga ploki_pikkus päeva pikkune plokk võetakse
+juhuslikust ajaloo kohast, mis on kalendris sihtpäevale lähedal (hooaja_aken
+päeva), nii et hooajalisus säilib. volatiilsus > 0 korral skaleeritakse iga
+ploki päevade hinnakõikumist päeva keskmise ümber juhusliku teguriga.
+
+Päevad on mudelites 'tsukkel' ja 'soc' sõltumatud, seega ilma skaleerimiseta
+on stsenaariumi päeva tulu sama mis ajaloo päeval ja optimeerida tuleb ainult
+ajalugu. Skaleerimisega optimeeritakse stsenaariumid ühe suure päevamaatriksina
+(stsenaariumid × päevad × slotid), mälu piiramiseks plokkide kaupa; need
+plokid võib jagada protsessipoolile. Iga plokk saab oma juhuarvude seemne, nii et
+tulemus ei sõltu töötajate arvust.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from akupargi_simulatsioon import indekseeri, paevade_tulud
+
+# Stsenaariumide mudelid (päevad sõltumatud)
+STSENAARIUMI_MUDELID = ('tsukkel', 'soc')
+PROTSENTIILID = (5, 10, 50, 90, 95)
+MAX_STSENAARIUME = 100000
+# Optimeeritava ploki suurus (hinnamaatriksi elemente, stsenaariumid × päevad × slotid)
+_PLOKI_ELEMENTE = 4 << 20
+
+
+def _allikapaevad(maatriks, stsenaariume, ploki_pikkus, hooaja_aken, rng):
+    """
+    Iga stsenaariumi iga päeva allikaks olev ajaloo päev (stsenaariumid × päevad).
+    Ploki algus valitakse päevade hulgast, mille kalendripäev on sihtpäevast kuni hooaja_aken päeva kaugusel.
+    """
+    paevi = len(maatriks['paevad'])
+    aasta_paev = (maatriks['paevad'] - maatriks['paevad'].astype('datetime64[Y]')).astype(int)
+    viimane_algus = max(0, paevi - ploki_pikkus)
+    allikad = np.empty((stsenaariume, paevi), dtype=int)
+    for algus in range(0, paevi, ploki_pikkus):
+        kaugus = np.abs(aasta_paev[:viimane_algus + 1] - aasta_paev[algus])
+        kandidaadid = np.flatnonzero(np.minimum(kaugus, 365 - kaugus) <= hooaja_aken)
+        if len(kandidaadid) == 0:
+            kandidaadid = np.arange(viimane_algus + 1)
+        pikkus = min(ploki_pikkus, paevi - algus)
+        allikad[:, algus:algus + pikkus] = np.minimum(
+            rng.choice(kandidaadid, size=stsenaariume)[:, np.newaxis] + np.arange(pikkus), paevi - 1
+        )
+    return allikad
+
+
+def _stsenaariumide_plokk(maatriks, seeme, stsenaariume, parameetrid, mudel, ploki_pikkus, hooaja_aken,
+                          volatiilsus, ajaloo_tulud=None):
+    """Ühe ploki stsenaariumide kuude tulud (stsenaariumid × kuud)"""
+    rng = np.random.default_rng(seeme)
+    allikad = _allikapaevad(maatriks, stsenaariume, ploki_pikkus, hooaja_aken, rng)
+
+    if ajaloo_tulud is not None:
+        tulud = ajaloo_tulud[allikad]
+    else:
+        # Hinnakõikumise tegur ploki kohta, keskmine 1 (lognormaaljaotus)
+        plokke = -(-allikad.shape[1] // ploki_pikkus)
+        tegur = np.exp(volatiilsus * rng.standard_normal((stsenaariume, plokke)) - volatiilsus ** 2 / 2)
+        tegur = np.repeat(tegur, ploki_pikkus, axis=1)[:, :allikad.shape[1]]
+
+        read = allikad.ravel()
+        hinnad = maatriks['hinnad'][read]
+        keskmine = np.nanmean(hinnad, axis=1, keepdims=True)
+        stsenaariumid = {
+            'hinnad': keskmine + tegur.reshape(-1, 1) * (hinnad - keskmine),
+            'pikkused': maatriks['pikkused'][read],
+            'slotipikkused': maatriks['slotipikkused'][read],
+        }
+        if mudel == 'tsukkel':
+            indekseeri(stsenaariumid)
+        tulud, _ = paevade_tulud(stsenaariumid, mudel=mudel, **parameetrid)
+        tulud = tulud.reshape(allikad.shape)
+    return np.add.reduceat(tulud, maatriks['kuu_piirid'][:-1], axis=1)
+
+
+# Töötajaprotsessi hinnamaatriks (seatakse üks kord protsessi alguses)
+_tootaja_maatriks = None
+
+
+def _tootaja_algus(maatriks):
+    """ProcessPoolExecutor'i initializer"""
+    global _tootaja_maatriks
+    _tootaja_maatriks = maatriks
+
+
+def _tootaja_plokk(argumendid):
+    return _stsenaariumide_plokk(_tootaja_maatriks, *argumendid)
+
+
+def kuude_stsenaariumid(maatriks, stsenaariume, aku_voimsus_mw, aku_mahtuvus_mwh, efektiivsus, max_aeg_vahel,
+                        mudel='tsukkel', max_tsukleid_paevas=None, ploki_pikkus=7, hooaja_aken=30,
+                        volatiilsus=0.0, seeme=0, tootajaid=1):
+    """
+    Stsenaariumide kuude tulud (stsenaariumid × maatriksi kuud). ploki_pikkus ja hooaja_aken päevades,
+    volatiilsus on hinnakõikumise teguri logaritmi standardhälve (0 = ainult ümbervalik).
+    """
+    if mudel not in STSENAARIUMI_MUDELID:
+        raise ValueError(f'Stsenaariumid toetavad mudeleid {", ".join(STSENAARIUMI_MUDELID)}, mitte {mudel}')
+    if not 1 <= stsenaariume <= MAX_STSENAARIUME:
+        raise ValueError(f'Stsenaariumide arv peab olema 1..{MAX_STSENAARIUME}')
+    if ploki_pikkus < 1 or hooaja_aken < 0 or volatiilsus < 0:
+        raise ValueError('ploki_pikkus peab olema positiivne, hooaja_aken ja volatiilsus mittenegatiivsed')
+
+    parameetrid = dict(
+        aku_voimsus_mw=aku_voimsus_mw, aku_mahtuvus_mwh=aku_mahtuvus_mwh, efektiivsus=efektiivsus,
+        max_aeg_vahel=max_aeg_vahel, max_tsukleid_paevas=max_tsukleid_paevas
+    )
+    ajaloo_tulud = None
+    if volatiilsus == 0:
+        ajaloo_tulud, _ = paevade_tulud(maatriks, mudel=mudel, **parameetrid)
+        ploki_stsenaariume = max(1, _PLOKI_ELEMENTE // max(1, len(ajaloo_tulud)))
+    else:
+        ploki_stsenaariume = max(1, _PLOKI_ELEMENTE // max(1, maatriks['hinnad'].size))
+
+    suurused = [min(ploki_stsenaariume, stsenaariume - algus) for algus in range(0, stsenaariume, ploki_stsenaariume)]
+    seemned = np.random.SeedSequence(seeme).spawn(len(suurused))
+    plokid = [
+        (ploki_seeme, suurus, parameetrid, mudel, ploki_pikkus, hooaja_aken, volatiilsus, ajaloo_tulud)
+        for ploki_seeme, suurus in zip(seemned, suurused)
+    ]
+    tootajaid = min(tootajaid or 1, len(plokid))
+    if tootajaid <= 1 or ajaloo_tulud is not None:
+        # Ilma skaleerimiseta on plokk ainult ajaloo tulude indekseerimine: protsessipool ja
+        # maatriksi kopeerimine töötajatele maksaks rohkem kui arvutus
+        return np.vstack([_stsenaariumide_plokk(maatriks, *plokk) for plokk in plokid])
+
+    with ProcessPoolExecutor(max_workers=tootajaid, initializer=_tootaja_algus, initargs=(maatriks,)) as taitja:
+        return np.vstack(list(taitja.map(_tootaja_plokk, plokid)))
+
+
+def _kokkuvote(vaartused, protsentiilid):
+    tulemus = {'keskmine': float(np.mean(vaartused))}
+    for q, v in zip(protsentiilid, np.percentile(vaartused, protsentiilid)):
+        tulemus[f'p{q:g}'] = float(v)
+    return tulemus
+
+
+def tulude_jaotus(maatriks, kuu_tulud, protsentiilid=PROTSENTIILID):
+    """
+    Stsenaariumide kuude tulude (kuude_stsenaariumid) keskmine ja protsentiilid kuude, kalendriaastate
+    ja kogu perioodi kaupa.
+    """
+    kuud = maatriks['kuud']
+    paevi_kuus = np.diff(maatriks['kuu_piirid'])
+    aastad = kuud.astype('datetime64[Y]')
+    jaotus = {
+        'stsenaariume': int(kuu_tulud.shape[0]),
+        'protsentiilid': list(protsentiilid),
+        'kuud': [
+            dict(kuu=str(kuu), paevi=int(paevi), **_kokkuvote(kuu_tulud[:, k], protsentiilid))
+            for k, (kuu, paevi) in enumerate(zip(kuud, paevi_kuus))
+        ],
+        'aastad': [],
+        'kogutulu': _kokkuvote(kuu_tulud.sum(axis=1), protsentiilid),
+    }
+    for aasta in np.unique(aastad):
+        valik = aastad == aasta
+        jaotus['aastad'].append(dict(
+            aasta=int(str(aasta)), paevi=int(paevi_kuus[valik].sum()),
+            **_kokkuvote(kuu_tulud[:, valik].sum(axis=1), protsentiilid)
+        ))
+    return jaotus
@@ -0,0 +1,166 @@
+"""
+Taustatööd: piiratud järjekord, töötajalõimed ja voogedastatavad sündmused.
+
+Töö on generaatorfunktsioon, mis annab sündmusi (sõnastikud, nt iga valmis
+kuu tulemus). Töötaja lisab need töö sündmuste nimekirja ja äratab ootajad,
+nii et voog saab iga sündmuse kohe edasi saata. Tühistamist kontrollitakse
+sündmuste vahel; järjekorras ootav töö tühistatakse kohe. Viimane sündmus on
+alati töö lõppolek ('valmis', 'tuhistatud' või 'viga').
+
+Haldur on sõnastik, mille loo_haldur teeb; töötajalõimed käivitatakse
+esimese töö lisamisel.
+"""
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+LOPPOLEKUD = ('valmis', 'tuhistatud', 'viga')
+
+
+class JarjekordTais(Exception):
+    """Tööde järjekord on täis"""
+
+
+def loo_haldur(tootajaid=2, jarjekorra_pikkus=16, sailitus=100):
+    """
+    Tööde haldur: kuni jarjekorra_pikkus ootel tööd, tootajaid paralleelset tööd;
+    lõpetatud töödest hoitakse alles sailitus viimast.
+    """
+    return {
+        'jarjekord': queue.Queue(maxsize=jarjekorra_pikkus),
+        'tootajaid': tootajaid,
+        'lõimed': [],
+        'tood': OrderedDict(),
+        'sailitus': sailitus,
+        'lukk': threading.Lock(),
+    }
+
+
+def _tootaja(haldur):
+    while True:
+        too = haldur['jarjekord'].get()
+        try:
+            _jooksuta(too)
+        finally:
+            haldur['jarjekord'].task_done()
+
+
+def _lisa_sundmus(too, sundmus):
+    with too['tingimus']:
+        too['sundmused'].append(dict(sundmus, jrk=len(too['sundmused'])))
+        too['tingimus'].notify_all()
+
+
+def _lopeta(too, olek, viga=None):
+    with too['tingimus']:
+        if too['olek'] in LOPPOLEKUD:
+            return
+        too['olek'] = olek
+        too['lopetatud'] = time.time()
+    sundmus = {'tyyp': olek}
+    if viga is not None:
+        sundmus['viga'] = viga
+    _lisa_sundmus(too, sundmus)
+
+
+def _jooksuta(too):
+    with too['tingimus']:
+        if too['olek'] != 'ootel':
+            return
+        too['olek'] = 'tootab'
+        too['alustatud'] = time.time()
+    sundmused = too['funktsioon'](*too['argumendid'])
+    try:
+        for sundmus in sundmused:
+            _lisa_sundmus(too, sundmus)
+            if too['tuhista'].is_set():
+                sundmused.close()
+                _lopeta(too, 'tuhistatud')
+                return
+        _lopeta(too, 'valmis')
+    except Exception as e:
+        _lopeta(too, 'viga', str(e))
+
+
+def lisa_too(haldur, funktsioon, *argumendid, tyyp=''):
+    """Lisab töö järjekorda ja tagastab selle id; täis järjekorra korral JarjekordTais"""
+    too = {
+        'id': uuid.uuid4().hex,
+        'tyyp': tyyp,
+        'olek': 'ootel',
+        'loodud': time.time(),
+        'alustatud': None,
+        'lopetatud': None,
+        'sundmused': [],
+        'tingimus': threading.Condition(),
+        'tuhista': threading.Event(),
+        'funktsioon': funktsioon,
+        'argumendid': argumendid,
+    }
+    with haldur['lukk']:
+        while len(haldur['lõimed']) < haldur['tootajaid']:
+            loim = threading.Thread(target=_tootaja, args=(haldur,), name='akupark-too', daemon=True)
+            loim.start()
+            haldur['lõimed'].append(loim)
+        try:
+            haldur['jarjekord'].put_nowait(too)
+        except queue.Full:
+            raise JarjekordTais(f"Tööde järjekord on täis ({haldur['jarjekord'].maxsize})") from None
+        haldur['tood'][too['id']] = too
+        # Vanimad lõpetatud tööd eemaldatakse
+        lopetatud = [too_id for too_id, t in haldur['tood'].items() if t['olek'] in LOPPOLEKUD]
+        for too_id in lopetatud[:max(0, len(lopetatud) - haldur['sailitus'])]:
+            del haldur['tood'][too_id]
+    return too['id']
+
+
+def leia_too(haldur, too_id):
+    with haldur['lukk']:
+        return haldur['tood'].get(too_id)
+
+
+def too_olek(too):
+    """Töö olek JSON-i jaoks"""
+    with too['tingimus']:
+        return {
+            'id': too['id'],
+            'tyyp': too['tyyp'],
+            'olek': too['olek'],
+            'loodud': too['loodud'],
+            'alustatud': too['alustatud'],
+            'lopetatud': too['lopetatud'],
+            'sundmusi': len(too['sundmused']),
+        }
+
+
+def tuhista(too):
+    """Tühistab töö: ootel töö kohe, töötav töö järgmise sündmuse järel"""
+    too['tuhista'].set()
+    with too['tingimus']:
+        ootel = too['olek'] == 'ootel'
+    if ootel:
+        _lopeta(too, 'tuhistatud')
+
+
+def sundmused(too, alates=0, ootamine=None):
+    """
+    Töö sündmused alates järjekorranumbrist alates, uued kohe, kui need tekivad, kuni lõppolekuni.
+    Kui ootamine (sekundites) möödub uue sündmuseta, annab None (nt ühenduse elushoidmiseks).
+    """
+    jrk = alates
+    while True:
+        with too['tingimus']:
+            if jrk >= len(too['sundmused']) and too['olek'] not in LOPPOLEKUD:
+                too['tingimus'].wait(ootamine)
+            uued = too['sundmused'][jrk:]
+            lopp = too['olek'] in LOPPOLEKUD
+        if not uued and not lopp:
+            yield None
+            continue
+        for sundmus in uued:
+            yield sundmus
+        jrk += len(uued)
+        if lopp and jrk >= len(too['sundmused']):
+            return
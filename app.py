@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g, Response, stream_with_context
 try:
     from flask_cors import CORS
     cors_available = True
@@ -7,262 +7,715 @@ except ImportError:
 import pandas as pd
 import numpy as np
 from datetime import datetime
-import glob
+import json
 import os
+import threading
+import time
+from collections import OrderedDict
+
+import akupargi_ajastus as ajastus
+import akupargi_graafik as graafik
+import akupargi_tood as tood
+from akupargi_andmed import (
+    VAIKETSOON, joonda_reservihinnad, joonda_tsoonid, koosta_paevamaatriks, kuu_keskmised_hinnad, loe_hinnafailid
+)
+from akupargi_hoidla import INKREMENTAALSED_MUDELID, ava_hoidla, kuude_tulud_hoidlaga, lisa_rasid
+from akupargi_jagatud import ava_maatriks, jagatud_faili_nimi, kirjuta_maatriks, korista_vanad
+from akupargi_portfell import PORTFELLI_MUDELID, koosta_portfell, kontrolli_pargid, simuleeri_portfell
+from akupargi_simulatsioon import (
+    MUDELID, aku_parameetrid, hinnafailid as leia_hinnafailid, indekseeri, kuu_kirje, kuude_maatriksid,
+    kuude_statistika, kuude_tulud, paevade_tulud, parameetrite_vork, skaneeri, skaneeri_jarjest, soojuskaart
+)
+from akupargi_stsenaariumid import PROTSENTIILID, STSENAARIUMI_MUDELID, kuude_stsenaariumid, tulude_jaotus
 
 app = Flask(__name__)
 if cors_available:
     CORS(app)
 
-def loe_hinnad(failitee):
-    """Loeb CSV faili ja parsib hinnad"""
+# Parsitud hinnad salvestatakse soovi korral ka binaarselt CSV failide kõrvale
+HETKTOMMISE_FAIL = '.hinnad_vahemalu.npz'
+app.config['HINNA_HETKTOMMIS'] = os.environ.get('AKUPARK_HINNA_HETKTOMMIS', '0') == '1'
+# Hinnafailide kaust (vaikimisi rakenduse kaust)
+app.config['ANDMETE_KAUST'] = os.environ.get('AKUPARK_ANDMETE_KAUST', os.path.dirname(os.path.abspath(__file__)))
+# Hinnafailide mustrid andmete kaustas (komaga eraldatud)
+app.config['HINNAFAILID'] = os.environ.get('AKUPARK_HINNAFAILID', 'Tuulikutasu*.csv').split(',')
+# Reservihindade failide mustrid (mudel 'reserv'); sama CSV vorming, hind EUR/MW tunnis
+app.config['RESERVIFAILID'] = os.environ.get('AKUPARK_RESERVIFAILID', 'Reserv*.csv').split(',')
+# Portfelli hinnapiirkonnad (/api/portfell); piirkonna veerg leitakse failide päisest
+app.config['HINNATSOONID'] = os.environ.get('AKUPARK_HINNATSOONID', 'EE,FI,LV').split(',')
+# Tulemuste LRU vahemälu /api/arvuta jaoks: kirjete arv (0 = väljas) ja eluiga sekundites (0 = piiramata)
+app.config['TULEMUSTE_VAHEMALU_SUURUS'] = int(os.environ.get('AKUPARK_TULEMUSTE_VAHEMALU_SUURUS', 256))
+app.config['TULEMUSTE_VAHEMALU_TTL'] = float(os.environ.get('AKUPARK_TULEMUSTE_VAHEMALU_TTL', 0))
+# CSV failide muutumist kontrollitakse kõige rohkem nii mitme sekundi tagant (0 = iga päringuga)
+app.config['FAILIDE_KONTROLLI_VAHE'] = float(os.environ.get('AKUPARK_FAILIDE_KONTROLLI_VAHE', 1.0))
+# Päevade tulemuste püsihoidla (SQLite fail) inkrementaalseks arvutuseks; tühi = väljas
+app.config['TULEMUSTE_HOIDLA'] = os.environ.get('AKUPARK_TULEMUSTE_HOIDLA', '')
+# Etappide ajastus (Server-Timing päis ja /api/metrics); vaikimisi väljas
+app.config['AJASTUS'] = os.environ.get('AKUPARK_AJASTUS', '0') == '1'
+# /api/sweep ja /api/stsenaariumid protsessipooli suurus (1 = arvutame päringu lõimes)
+app.config['SWEEP_TOOTAJAID'] = int(os.environ.get('AKUPARK_SWEEP_TOOTAJAID', os.cpu_count() or 1))
+# Mitme töötajaprotsessiga serveris: kaust, kuhu parsitud hinnad kirjutatakse üks kord ja mille iga
+# töötaja kaardistab mällu ainult lugemiseks (akupargi_jagatud); tühi = iga protsess hoiab oma koopiat
+app.config['JAGATUD_HINNAD'] = os.environ.get('AKUPARK_JAGATUD_HINNAD', '')
+# Taustatööd (/api/jobs): korraga töötavaid töid, ootel tööde järjekorra pikkus ja alles hoitavad lõpetatud tööd
+app.config['TOODE_TOOTAJAID'] = int(os.environ.get('AKUPARK_TOODE_TOOTAJAID', 2))
+app.config['TOODE_JARJEKORD'] = int(os.environ.get('AKUPARK_TOODE_JARJEKORD', 16))
+app.config['TOODE_SAILITUS'] = int(os.environ.get('AKUPARK_TOODE_SAILITUS', 100))
+
+# Protsessiülene hinnaandmete vahemälu: CSV failid loetakse uuesti ainult siis,
+# kui mõne faili muutmisaeg või suurus on muutunud (või failide hulk muutub)
+_hinnad_vahemalus = {'signatuur': None, 'kogu_df': None, 'maatriks': None, 'kaust': None, 'kontrollitud': 0.0}
+_hinnad_lukk = threading.Lock()
+# Failide kaupa parsitud hinnad: andmete muutumisel loetakse uuesti ainult muutunud failid
+_failide_vahemalu = {}
+# Sama reservihindade failide jaoks
+_reservi_failide_vahemalu = {}
+# Sama portfelli piirkondade kaupa: {piirkond: {failitee: ...}}
+_tsoonide_failide_vahemalu = {}
+
+# Portfelli piirkondade joondatud hinnad; voti = (kaust, piirkonnad, failide signatuur)
+_portfell_vahemalus = {'voti': None, 'portfell': None, 'kontrollitud': 0.0}
+_portfell_lukk = threading.Lock()
+
+# Avatud tulemuste hoidla (akupargi_hoidla), avatakse esimesel kasutamisel
+_hoidla = {'failitee': None, 'hoidla': None}
+_hoidla_lukk = threading.Lock()
+
+def tulemuste_hoidla():
+    """TULEMUSTE_HOIDLA seadistuse järgi avatud hoidla või None"""
+    failitee = app.config['TULEMUSTE_HOIDLA']
+    if not failitee:
+        return None
+    with _hoidla_lukk:
+        if _hoidla['failitee'] != failitee:
+            _hoidla.update(failitee=failitee, hoidla=ava_hoidla(failitee))
+        return _hoidla['hoidla']
+
+# Taustatööde haldur (akupargi_tood), luuakse esimese töö lisamisel
+_tood = {'haldur': None}
+_tood_lukk = threading.Lock()
+
+def toode_haldur():
+    """TOODE_* seadistuse järgi loodud taustatööde haldur"""
+    with _tood_lukk:
+        if _tood['haldur'] is None:
+            _tood['haldur'] = tood.loo_haldur(
+                app.config['TOODE_TOOTAJAID'], app.config['TOODE_JARJEKORD'], app.config['TOODE_SAILITUS']
+            )
+        return _tood['haldur']
+
+# Valmis /api/arvuta vastused: võti = (hinnaandmete signatuur, normaliseeritud parameetrid),
+# väärtus = (salvestamise aeg, JSON baidid); järjestus = viimase kasutuse järjekord
+_tulemuste_vahemalu = OrderedDict()
+_tulemuste_loendurid = {'tabamusi': 0, 'moodalaske': 0, 'valja_tostetud': 0, 'aegunud': 0}
+_tulemuste_lukk = threading.Lock()
+
+def loe_tulemus(voti):
+    """Vahemälus olev vastus (JSON baidid) või None; aegunud kirje eemaldatakse"""
+    with _tulemuste_lukk:
+        kirje = _tulemuste_vahemalu.get(voti)
+        ttl = app.config['TULEMUSTE_VAHEMALU_TTL']
+        if kirje is not None and ttl > 0 and time.monotonic() - kirje[0] > ttl:
+            del _tulemuste_vahemalu[voti]
+            _tulemuste_loendurid['aegunud'] += 1
+            kirje = None
+        if kirje is None:
+            _tulemuste_loendurid['moodalaske'] += 1
+            return None
+        _tulemuste_vahemalu.move_to_end(voti)
+        _tulemuste_loendurid['tabamusi'] += 1
+        return kirje[1]
+
+def salvesta_tulemus(voti, andmed):
+    """Lisab vastuse vahemällu; üle piiri minnes eemaldatakse kõige kauem kasutamata kirjed"""
+    suurus = app.config['TULEMUSTE_VAHEMALU_SUURUS']
+    if suurus <= 0:
+        return
+    with _tulemuste_lukk:
+        _tulemuste_vahemalu[voti] = (time.monotonic(), andmed)
+        _tulemuste_vahemalu.move_to_end(voti)
+        while len(_tulemuste_vahemalu) > suurus:
+            _tulemuste_vahemalu.popitem(last=False)
+            _tulemuste_loendurid['valja_tostetud'] += 1
+
+def tulemuste_vahemalu_olek():
+    """Vahemälu suurus, piirid ja loendurid (/api/metrics)"""
+    with _tulemuste_lukk:
+        return dict(
+            _tulemuste_loendurid,
+            kirjeid=len(_tulemuste_vahemalu),
+            max_kirjeid=app.config['TULEMUSTE_VAHEMALU_SUURUS'],
+            ttl_s=app.config['TULEMUSTE_VAHEMALU_TTL']
+        )
+
+def failide_signatuur(csv_failid):
+    """Failide (nimi, mtime, suurus) kogum, mille muutumisel vahemälu aegub"""
+    signatuur = []
+    for fail in sorted(csv_failid):
+        st = os.stat(fail)
+        signatuur.append((os.path.basename(fail), st.st_mtime_ns, st.st_size))
+    return tuple(signatuur)
+
+def _loe_hetktommis(failitee, signatuur):
+    """Loeb .npz hetktõmmise, kui see vastab CSV failide praegusele signatuurile"""
     try:
-        encodings = ['cp1252', 'windows-1252', 'latin1', 'iso-8859-1', 'utf-8']
-        df = None
-        
-        for enc in encodings:
-            try:
-                df = pd.read_csv(failitee, sep=';', encoding=enc)
-                if len(df.columns) >= 3:
-                    break
-            except:
-                continue
-        
-        if df is None or len(df.columns) < 3:
-            return pd.DataFrame()
-        
-        date_col = None
-        price_col = None
-        
-        for col in df.columns:
-            if 'Kuup' in col or 'aeg' in col.lower() or 'date' in col.lower():
-                date_col = col
-            if 'NPS' in col or 'hind' in col.lower() or 'price' in col.lower():
-                price_col = col
-        
-        if date_col is None or price_col is None:
-            if len(df.columns) >= 3:
-                date_col = df.columns[1]
-                price_col = df.columns[2]
-            else:
-                return pd.DataFrame()
-        
-        df['Kuupäev'] = pd.to_datetime(df[date_col], format='%d.%m.%Y %H:%M', errors='coerce')
-        df['Hind'] = pd.to_numeric(df[price_col].astype(str).str.replace(',', '.'), errors='coerce')
-        df = df.dropna(subset=['Kuupäev', 'Hind'])
-        df = df.sort_values('Kuupäev').reset_index(drop=True)
-        
-        return df[['Kuupäev', 'Hind']]
-    except Exception as e:
-        return pd.DataFrame()
+        with np.load(failitee, allow_pickle=False) as npz:
+            if str(npz['signatuur']) != repr(signatuur):
+                return None
+            return pd.DataFrame({'Kuupäev': npz['ajad'], 'Ajatempel': npz['ajatemplid'], 'Hind': npz['hinnad']})
+    except (OSError, KeyError, ValueError):
+        return None
+
+def _salvesta_hetktommis(failitee, signatuur, kogu_df):
+    """Salvestab parsitud hinnarea binaarselt CSV failide kõrvale (kirjutuskaitstud kaustas vaikselt vahele)"""
+    ajutine = failitee + '.tmp'
+    try:
+        with open(ajutine, 'wb') as f:
+            np.savez(
+                f,
+                signatuur=np.array(repr(signatuur)),
+                ajad=kogu_df['Kuupäev'].to_numpy(dtype='datetime64[ns]'),
+                ajatemplid=kogu_df['Ajatempel'].to_numpy(dtype='int64'),
+                hinnad=kogu_df['Hind'].to_numpy(dtype=float)
+            )
+        os.replace(ajutine, failitee)
+    except OSError:
+        pass
+
+def hinnafailid(kaust):
+    """Kausta HINNAFAILID mustritele vastavad failid"""
+    return leia_hinnafailid(app.config['HINNAFAILID'], kaust)
+
+def reservifailid(kaust):
+    """Kausta RESERVIFAILID mustritele vastavad failid"""
+    return leia_hinnafailid(app.config['RESERVIFAILID'], kaust)
 
-def optimeeri_tsukkel(hinnad_paev, aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, max_aeg_vahel):
+def lae_hinnaandmed(kaust):
     """
-    Optimeerib ühe päeva kohta laadimise ja tühjendamise hetke.
-    Arvestab liitumise võimsust - laadimine ja müük võivad olla mitte-järjestikused tunnid.
+    Tagastab (kogu_df, maatriks, signatuur) kausta hinnafailidest (HINNAFAILID).
+    Failide muutumatuse korral tuleb tulemus mälust (faile kontrollitakse kõige rohkem
+    FAILIDE_KONTROLLI_VAHE sekundi tagant); (None, None, signatuur), kui andmeid pole.
+    JAGATUD_HINNAD korral on maatriks mälukaardistatud failist ja kogu_df on None.
     """
-    if len(hinnad_paev) < 2:
-        return None, None, 0
+    with _hinnad_lukk:
+        if (_hinnad_vahemalus['signatuur'] is not None and _hinnad_vahemalus['kaust'] == kaust
+                and time.monotonic() - _hinnad_vahemalus['kontrollitud'] < app.config['FAILIDE_KONTROLLI_VAHE']):
+            return _hinnad_vahemalus['kogu_df'], _hinnad_vahemalus['maatriks'], _hinnad_vahemalus['signatuur']
     
-    tagastatav_energia = aku_mahtuvus_mwh * efektiivsus
+    with ajastus.etapp('failid'):
+        csv_failid = hinnafailid(kaust)
+        reservi_failid = reservifailid(kaust)
+        signatuur = failide_signatuur(csv_failid + reservi_failid)
+    ajastus.loenda('failid', len(csv_failid) + len(reservi_failid))
     
-    # Arvutame vajalikud tunnid
-    laadimise_tunnid = int(np.ceil(aku_mahtuvus_mwh / aku_voimsus_mw))  # 100 MWh / 50 MW = 2 tundi
-    tuhjendamise_tunnid = int(np.ceil(tagastatav_energia / aku_voimsus_mw))  # 87 MWh / 50 MW = 2 tundi
-    
-    max_tulu = float('-inf')
-    parim_laadimine_indeksid = None
-    parim_tuhjendamine_indeksid = None
-    
-    # Optimeerime laadimise - valime odavaimad tunnid
-    # Võime valida järjestikused või mitte-järjestikused tunnid
-    for laadimise_algus in range(len(hinnad_paev) - laadimise_tunnid + 1):
-        # Variant 1: Järjestikused tunnid laadimiseks
-        laadimise_järjestikused = list(range(laadimise_algus, laadimise_algus + laadimise_tunnid))
-        if laadimise_algus + laadimise_tunnid > len(hinnad_paev):
-            continue
-        
-        laadimise_kulu_järjestikused = sum(hinnad_paev.iloc[i]['Hind'] for i in laadimise_järjestikused) * aku_voimsus_mw
-        
-        # Variant 2: Optimeerime mitte-järjestikuste tundide valiku
-        # Valime odavaimad tunnid päevast
-        kogu_paev_hinnad = [(i, hinnad_paev.iloc[i]['Hind']) for i in range(len(hinnad_paev))]
-        kogu_paev_hinnad.sort(key=lambda x: x[1])  # Sorteerime hinnad järgi
-        odavaimad_tunnid = [idx for idx, _ in kogu_paev_hinnad[:laadimise_tunnid]]
-        laadimise_kulu_mitte_järjestikused = sum(hinnad_paev.iloc[i]['Hind'] for i in odavaimad_tunnid) * aku_voimsus_mw
-        
-        # Valime parema variandi
-        if laadimise_kulu_mitte_järjestikused < laadimise_kulu_järjestikused:
-            laadimise_indeksid = odavaimad_tunnid
-            laadimise_kulu = laadimise_kulu_mitte_järjestikused
-        else:
-            laadimise_indeksid = laadimise_järjestikused
-            laadimise_kulu = laadimise_kulu_järjestikused
-        
-        # Laadimise lõpphetk
-        laadimise_lopp = max(laadimise_indeksid)
+    with _hinnad_lukk:
+        if _hinnad_vahemalus['signatuur'] == signatuur and _hinnad_vahemalus['kaust'] == kaust:
+            _hinnad_vahemalus['kontrollitud'] = time.monotonic()
+            return _hinnad_vahemalus['kogu_df'], _hinnad_vahemalus['maatriks'], signatuur
         
-        # Otsime tühjendamise hetki (peab olema pärast laadimist)
-        tuhjendamise_algus_võimalik = laadimise_lopp + 1
-        tuhjendamise_lopp_võimalik = min(laadimise_lopp + max_aeg_vahel + 1, len(hinnad_paev))
+        algus = time.perf_counter()
+        jagatud_kaust = app.config['JAGATUD_HINNAD']
+        if jagatud_kaust:
+            jagatud_fail = os.path.join(jagatud_kaust, jagatud_faili_nimi(kaust, signatuur, VAIKETSOON))
+            maatriks = _ava_jagatud(jagatud_fail)
+            if maatriks is not None:
+                # Teine töötaja on samad andmed juba parsinud
+                _hinnad_vahemalus.update(
+                    signatuur=signatuur, kogu_df=None, maatriks=maatriks, kaust=kaust, kontrollitud=time.monotonic()
+                )
+                with _tulemuste_lukk:
+                    _tulemuste_vahemalu.clear()
+                app.logger.info('Hinnaandmed kaardistatud failist %s', jagatud_fail)
+                return None, maatriks, signatuur
         
-        if tuhjendamise_algus_võimalik >= len(hinnad_paev):
-            continue
+        hetktommis = os.path.join(kaust, HETKTOMMISE_FAIL)
+        kogu_df = None
+        allikas = 'npz'
+        if app.config['HINNA_HETKTOMMIS']:
+            with ajastus.etapp('hetktommis'):
+                kogu_df = _loe_hetktommis(hetktommis, signatuur)
         
-        # Optimeerime tühjendamise - valime kallimad tunnid müügiks
-        for tuhjendamise_algus in range(tuhjendamise_algus_võimalik, tuhjendamise_lopp_võimalik - tuhjendamise_tunnid + 1):
-            # Variant 1: Järjestikused tunnid tühjendamiseks
-            tuhjendamise_järjestikused = list(range(tuhjendamise_algus, tuhjendamise_algus + tuhjendamise_tunnid))
-            if tuhjendamise_algus + tuhjendamise_tunnid > len(hinnad_paev):
-                continue
-            
-            # Arvutame müügitulu (arvestades efektiivsust)
-            # Laaditud energia: laadimise_tunnid * aku_voimsus_mw
-            # Tagastatav energia: laaditud energia * efektiivsus
-            laaditud_energia = laadimise_tunnid * aku_voimsus_mw
-            tagastatav_energia = laaditud_energia * efektiivsus
-            
-            # Variant 1: Järjestikused tunnid tühjendamiseks
-            # Müüme tagastatava energia, jagame tühjendamise tundide vahel
-            keskmine_hind_järjestikused = sum(hinnad_paev.iloc[i]['Hind'] for i in tuhjendamise_järjestikused) / tuhjendamise_tunnid
-            tuhjendamise_tulu_järjestikused = tagastatav_energia * keskmine_hind_järjestikused
-            
-            # Variant 2: Optimeerime mitte-järjestikuste tundide valiku
-            # Valime kallimad tunnid müügiks (vahemikus pärast laadimist)
-            võimalikud_tunnid = [(i, hinnad_paev.iloc[i]['Hind']) 
-                                 for i in range(tuhjendamise_algus_võimalik, tuhjendamise_lopp_võimalik)]
-            võimalikud_tunnid.sort(key=lambda x: x[1], reverse=True)  # Sorteerime kallimad esimeseks
-            kallimad_tunnid = [idx for idx, _ in võimalikud_tunnid[:tuhjendamise_tunnid]]
-            keskmine_hind_mitte_järjestikused = sum(hinnad_paev.iloc[i]['Hind'] for i in kallimad_tunnid) / tuhjendamise_tunnid
-            tuhjendamise_tulu_mitte_järjestikused = tagastatav_energia * keskmine_hind_mitte_järjestikused
+        if kogu_df is None:
+            allikas = 'csv'
+            kogu_df = loe_hinnafailid(csv_failid, vahemalu=_failide_vahemalu, tsoon=VAIKETSOON)
             
-            # Valime parema variandi
-            if tuhjendamise_tulu_mitte_järjestikused > tuhjendamise_tulu_järjestikused:
-                tuhjendamise_indeksid = kallimad_tunnid
-                tuhjendamise_tulu = tuhjendamise_tulu_mitte_järjestikused
-            else:
-                tuhjendamise_indeksid = tuhjendamise_järjestikused
-                tuhjendamise_tulu = tuhjendamise_tulu_järjestikused
-            
-            # Tulu = müügitulu - ostukulu
-            tulu = tuhjendamise_tulu - laadimise_kulu
+            if kogu_df.empty:
+                return None, None, signatuur
             
-            if tulu > max_tulu:
-                max_tulu = tulu
-                parim_laadimine_indeksid = laadimise_indeksid
-                parim_tuhjendamine_indeksid = tuhjendamise_indeksid
+            if app.config['HINNA_HETKTOMMIS']:
+                _salvesta_hetktommis(hetktommis, signatuur, kogu_df)
+        
+        # Päevamaatriks: üks rida päeva kohta, kuude piirid arvutatud ette
+        with ajastus.etapp('ruhmitamine'):
+            maatriks = koosta_paevamaatriks(kogu_df)
+        ajastus.loenda('ruhmitamine', len(maatriks['paevad']))
+        # Parameetritest sõltumatu päevaindeks: päringud ei pea päevi uuesti sorteerima
+        with ajastus.etapp('indekseerimine'):
+            indekseeri(maatriks)
+            if app.config['TULEMUSTE_HOIDLA']:
+                # Päevade räsid hoidla jaoks, et neid ei arvutataks igal päringul
+                lisa_rasid(maatriks)
+        if reservi_failid:
+            # Reservihinnad maatriksi slottidele (mudel 'reserv')
+            reserv_df = loe_hinnafailid(reservi_failid, vahemalu=_reservi_failide_vahemalu)
+            maatriks['reservi_hinnad'] = joonda_reservihinnad(maatriks, reserv_df)
+        ridu = len(kogu_df)
+        if jagatud_kaust:
+            # Kirjutame jagatud faili ja kasutame ka ise kaardistatud koopiat (protsessi oma vabaneb)
+            os.makedirs(jagatud_kaust, exist_ok=True)
+            kirjuta_maatriks(maatriks, jagatud_fail)
+            korista_vanad(jagatud_kaust, os.path.basename(jagatud_fail))
+            maatriks = ava_maatriks(jagatud_fail)
+            kogu_df = None
+        _hinnad_vahemalus.update(
+            signatuur=signatuur, kogu_df=kogu_df, maatriks=maatriks, kaust=kaust, kontrollitud=time.monotonic()
+        )
+        # Vanade andmete põhjal arvutatud vastused ei kehti enam
+        with _tulemuste_lukk:
+            _tulemuste_vahemalu.clear()
+        app.logger.info(
+            'Hinnaandmed laetud (%s): %d rida, %d päeva, %.1f ms',
+            allikas, ridu, len(maatriks['paevad']), (time.perf_counter() - algus) * 1000
+        )
+        return kogu_df, maatriks, signatuur
+
+def _ava_jagatud(failitee):
+    """Jagatud maatriksi fail mällu kaardistatuna või None, kui faili pole (või see on vigane)"""
+    try:
+        return ava_maatriks(failitee)
+    except (OSError, ValueError):
+        return None
+
+def lae_portfell(kaust):
+    """
+    Tagastab (portfell, signatuur): HINNATSOONID piirkondade joondatud hinnad portfelli maatriksina
+    (akupargi_portfell.koosta_portfell); piirkonnad, mille hindu failides pole, jäetakse välja.
+    (None, signatuur), kui ühegi piirkonna hindu pole.
+    """
+    tsoonid = tuple(tsoon.strip() for tsoon in app.config['HINNATSOONID'])
+    with _portfell_lukk:
+        if (_portfell_vahemalus['voti'] is not None and _portfell_vahemalus['voti'][:2] == (kaust, tsoonid)
+                and time.monotonic() - _portfell_vahemalus['kontrollitud'] < app.config['FAILIDE_KONTROLLI_VAHE']):
+            return _portfell_vahemalus['portfell'], _portfell_vahemalus['voti'][2]
     
-    if max_tulu == float('-inf'):
-        return None, None, 0
+    with ajastus.etapp('failid'):
+        csv_failid = hinnafailid(kaust)
+        voti = (kaust, tsoonid, failide_signatuur(csv_failid))
+    ajastus.loenda('failid', len(csv_failid))
     
-    return parim_laadimine_indeksid, parim_tuhjendamine_indeksid, max_tulu
+    with _portfell_lukk:
+        if _portfell_vahemalus['voti'] != voti:
+            tsoonide_df = {}
+            for tsoon in tsoonid:
+                df = loe_hinnafailid(csv_failid, vahemalu=_tsoonide_failide_vahemalu.setdefault(tsoon, {}), tsoon=tsoon)
+                if not df.empty:
+                    tsoonide_df[tsoon] = df
+            portfell = None
+            if tsoonide_df:
+                with ajastus.etapp('ruhmitamine'):
+                    portfell = koosta_portfell(joonda_tsoonid(tsoonide_df))
+                ajastus.loenda('ruhmitamine', len(portfell['paevad']) * len(portfell['tsoonid']))
+            _portfell_vahemalus.update(voti=voti, portfell=portfell)
+        _portfell_vahemalus['kontrollitud'] = time.monotonic()
+        return _portfell_vahemalus['portfell'], voti[2]
+
+@app.before_request
+def alusta_ajastust():
+    """AJASTUS sisse lülitatud: päringu etapid mõõdetakse (akupargi_ajastus)"""
+    if app.config['AJASTUS']:
+        g.ajastus = ajastus.mootmine()
+        g.ajastuse_kogum = g.ajastus.__enter__()
+        g.ajastuse_algus = time.perf_counter()
+
+@app.after_request
+def lisa_ajastus(vastus):
+    """Lisab mõõdetud etapid Server-Timing päisesse ja /api/metrics ajalukku"""
+    if 'ajastus' in g:
+        kogum = g.ajastuse_kogum
+        g.pop('ajastus').__exit__(None, None, None)
+        kogum['kokku'] = {'ms': (time.perf_counter() - g.ajastuse_algus) * 1000, 'ridu': None}
+        if request.path.startswith('/api/') and request.path != '/api/metrics':
+            ajastus.salvesta(kogum, request.path)
+        vastus.headers['Server-Timing'] = ajastus.server_timing(kogum)
+    return vastus
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def arvutuse_parameetrid(data):
+    """
+    /api/arvuta päringu parameetrid: (mudel, aku parameetrid paevade_tulud jaoks).
+    Vigase väärtuse või tundmatu mudeli korral ValueError.
+    """
+    # 'tsukkel' - üks laadimine ja tühjendamine päevas; 'soc' - optimaalne mitme tsükliga graafik;
+    # 'ajajoon' - tsüklid kogu hinnareal, ka üle kesköö; 'reserv' - nagu 'soc', kuid osa võimsusest
+    # võib müüa reservina (reservi_kestus_h: laetuse varu reservi aktiveerimiseks)
+    mudel = data.get('mudel', 'tsukkel')
+    if mudel not in MUDELID:
+        raise ValueError(f'Tundmatu mudel: {mudel}')
+    return mudel, aku_parameetrid(data, mudel)
+
 @app.route('/api/arvuta', methods=['POST'])
 def arvuta():
     try:
-        data = request.json
-        aku_voimsus_mw = float(data.get('aku_voimsus_mw', 50))
-        aku_mahtuvus_mwh = float(data.get('aku_mahtuvus_mwh', 100))
-        efektiivsus = float(data.get('efektiivsus', 0.87))
-        max_aeg_vahel = int(data.get('max_aeg_vahel', 8))
-        
-        # Loeme kõik CSV failid
-        # Kasutame rakenduse kausta
-        app_dir = os.path.dirname(os.path.abspath(__file__))
-        csv_failid = glob.glob(os.path.join(app_dir, 'Tuulikutasu*.csv'))
-        
-        kogu_andmed = []
-        for fail in csv_failid:
-            df = loe_hinnad(fail)
-            if not df.empty:
-                kogu_andmed.append(df)
-        
-        if not kogu_andmed:
+        try:
+            mudel, parameetrid = arvutuse_parameetrid(request.json)
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+        # Hinnaandmed tulevad protsessiülesest vahemälust
+        _, maatriks, signatuur = lae_hinnaandmed(app.config['ANDMETE_KAUST'])
+        
+        if maatriks is None:
             return jsonify({'error': 'Andmeid ei leitud'}), 400
+        if mudel == 'reserv' and 'reservi_hinnad' not in maatriks:
+            return jsonify({'error': 'Reservihindu ei leitud'}), 400
+        
+        # Sama parameetrikomplekt samade andmetega -> valmis vastus vahemälust.
+        # Mudelist sõltumatud parameetrid normaliseeritakse, et need võtit ei killustaks.
+        voti = (
+            signatuur, mudel, parameetrid['aku_voimsus_mw'], parameetrid['aku_mahtuvus_mwh'], parameetrid['efektiivsus'],
+            parameetrid['max_aeg_vahel'] if mudel not in ('soc', 'reserv') else None,
+            parameetrid['max_tsukleid_paevas'] if mudel == 'soc' else None,
+            parameetrid.get('reservi_kestus_h')
+        )
+        vahemalust = loe_tulemus(voti)
+        if vahemalust is not None:
+            return app.response_class(vahemalust, mimetype=app.json.mimetype)
+        
+        hoidla = tulemuste_hoidla()
+        if hoidla is not None and mudel in INKREMENTAALSED_MUDELID:
+            # Optimeeritakse ainult päevad, mida hoidlas pole või mille hinnad muutusid
+            with ajastus.etapp('optimeerimine'):
+                _, _, kuu_summad, kuu_arvud, arvutatud = kuude_tulud_hoidlaga(
+                    hoidla, maatriks, mudel=mudel, **parameetrid
+                )
+            ajastus.loenda('optimeerimine', arvutatud)
+        else:
+            with ajastus.etapp('optimeerimine'):
+                tulud, tsukleid = paevade_tulud(maatriks, mudel=mudel, **parameetrid)
+            ajastus.loenda('optimeerimine', len(tulud))
+            kuu_summad, kuu_arvud = kuude_tulud(maatriks, tulud, tsukleid)
+        
+        with ajastus.etapp('koondamine'):
+            vastus = jsonify(kuude_statistika(maatriks, kuu_summad, kuu_arvud, kuu_keskmised_hinnad(maatriks)))
+        ajastus.loenda('koondamine', len(maatriks['kuud']))
+        salvesta_tulemus(voti, vastus.get_data())
+        return vastus
         
-        kogu_df = pd.concat(kogu_andmed, ignore_index=True)
-        kogu_df = kogu_df.sort_values('Kuupäev').reset_index(drop=True)
+    except Exception as e:
+        app.logger.exception('Päringu %s viga', request.path)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/sweep', methods=['POST'])
+def sweep():
+    """
+    Parameetrite võrgu läbimine ühe tööna. Iga parameeter võib olla arv, nimekiri
+    või {"algus", "lopp", "samm"}; tagastab iga punkti kogutulu ja kuude tulud.
+    """
+    try:
+        data = request.json or {}
+        mudel = data.get('mudel', 'tsukkel')
+        if mudel not in MUDELID:
+            return jsonify({'error': f'Tundmatu mudel: {mudel}'}), 400
         
-        kogu_df['Päev'] = kogu_df['Kuupäev'].dt.date
-        kogu_df['Kuu'] = kogu_df['Kuupäev'].dt.to_period('M')
+        try:
+            punktid = parameetrite_vork(data, mudel)
+        except (ValueError, TypeError, KeyError) as e:
+            return jsonify({'error': str(e)}), 400
         
-        tulemused = []
-        kuu_tulud = {}
-        kuu_hinnad = {}  # Keskmine NPS hind kuus
+        _, maatriks, _ = lae_hinnaandmed(app.config['ANDMETE_KAUST'])
         
-        unikaalsed_paevad = kogu_df['Päev'].unique()
+        if maatriks is None:
+            return jsonify({'error': 'Andmeid ei leitud'}), 400
+        if mudel == 'reserv' and 'reservi_hinnad' not in maatriks:
+            return jsonify({'error': 'Reservihindu ei leitud'}), 400
         
-        for paev in unikaalsed_paevad:
-            paeva_andmed = kogu_df[kogu_df['Päev'] == paev].copy()
-            
-            if len(paeva_andmed) < 2:
-                continue
-            
-            laadimine_idx, tuhjendamine_idx, tulu = optimeeri_tsukkel(
-                paeva_andmed, aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, max_aeg_vahel
+        with ajastus.etapp('optimeerimine'):
+            tulemused = skaneeri(maatriks, punktid, mudel=mudel, tootajaid=app.config['SWEEP_TOOTAJAID'])
+        ajastus.loenda('optimeerimine', len(punktid))
+        
+        return jsonify({
+            'mudel': mudel,
+            'kuud': [str(kuu) for kuu in maatriks['kuud']],
+            'punktid': tulemused,
+            'soojuskaart': soojuskaart(tulemused)
+        })
+        
+    except Exception as e:
+        app.logger.exception('Päringu %s viga', request.path)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/stsenaariumid', methods=['POST'])
+def stsenaariumid():
+    """
+    Hinnastsenaariumide tulujaotus: ajaloo päevade plokkide ümbervalik (valikulise hinnakõikumise
+    skaleerimisega), iga stsenaariumi optimeerimine ja kuude/aastate tulude protsentiilid.
+    """
+    try:
+        data = request.json or {}
+        mudel = data.get('mudel', 'tsukkel')
+        if mudel not in STSENAARIUMI_MUDELID:
+            return jsonify({'error': f'Stsenaariumid toetavad mudeleid: {", ".join(STSENAARIUMI_MUDELID)}'}), 400
+        
+        try:
+            # Aku parameetrid nagu /api/arvuta, lisaks stsenaariumide omad
+            parameetrid = dict(
+                aku_parameetrid(data, mudel),
+                stsenaariume=int(data.get('stsenaariume', 1000)),
+                ploki_pikkus=int(data.get('ploki_pikkus', 7)),
+                hooaja_aken=int(data.get('hooaja_aken', 30)),
+                volatiilsus=float(data.get('volatiilsus', 0.0)),
+                seeme=int(data.get('seeme', 0)),
             )
-            
-            if laadimine_idx is not None and tuhjendamine_idx is not None:
-                kuu = paeva_andmed.iloc[0]['Kuu']
-                
-                tulemused.append({
-                    'kuupaev': str(paev),
-                    'kuu': str(kuu),
-                    'tulu': float(tulu)
-                })
-                
-                if kuu not in kuu_tulud:
-                    kuu_tulud[kuu] = []
-                kuu_tulud[kuu].append(tulu)
-                
-                # Arvutame kuu keskmise NPS hinna
-                kuu_andmed = kogu_df[kogu_df['Kuu'] == kuu]
-                if kuu not in kuu_hinnad:
-                    kuu_hinnad[kuu] = float(kuu_andmed['Hind'].mean())
-        
-        # Arvutame kuude statistika
-        kuu_statistika = []
-        kogu_tulu = 0
-        kogu_tsuklite_arv = 0
-        
-        for kuu in sorted(kuu_tulud.keys()):
-            kuu_tulu = sum(kuu_tulud[kuu])
-            tsuklite_arv = len(kuu_tulud[kuu])
-            keskmine_tulu = kuu_tulu / tsuklite_arv if tsuklite_arv > 0 else 0
-            keskmine_nps_hind = kuu_hinnad.get(kuu, 0)
-            
-            kogu_tulu += kuu_tulu
-            kogu_tsuklite_arv += tsuklite_arv
-            
-            kuu_statistika.append({
-                'kuu': str(kuu),
-                'tsuklite_arv': tsuklite_arv,
-                'kogutulu': float(kuu_tulu),
-                'keskmine_tulu': float(keskmine_tulu),
-                'keskmine_nps_hind': float(keskmine_nps_hind)
-            })
+            protsentiilid = [float(q) for q in data.get('protsentiilid', PROTSENTIILID)]
+            if not protsentiilid or not all(0 <= q <= 100 for q in protsentiilid):
+                raise ValueError('Protsentiilid peavad olema vahemikus 0..100')
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        _, maatriks, _ = lae_hinnaandmed(app.config['ANDMETE_KAUST'])
+        
+        if maatriks is None:
+            return jsonify({'error': 'Andmeid ei leitud'}), 400
+        
+        try:
+            with ajastus.etapp('optimeerimine'):
+                kuu_tulud = kuude_stsenaariumid(
+                    maatriks, mudel=mudel, tootajaid=app.config['SWEEP_TOOTAJAID'], **parameetrid
+                )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        ajastus.loenda('optimeerimine', kuu_tulud.shape[0] * len(maatriks['paevad']))
+        
+        with ajastus.etapp('koondamine'):
+            jaotus = tulude_jaotus(maatriks, kuu_tulud, protsentiilid)
+        return jsonify(dict(jaotus, mudel=mudel))
+        
+    except Exception as e:
+        app.logger.exception('Päringu %s viga', request.path)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/portfell', methods=['POST'])
+def portfell():
+    """
+    Mitme pargi portfell: pargid = [{"nimi", "tsoon", "aku_voimsus_mw", "aku_mahtuvus_mwh", "efektiivsus", ...}].
+    Tagastab iga pargi ja kogu portfelli kuude tulud.
+    """
+    try:
+        data = request.json or {}
+        mudel = data.get('mudel', 'tsukkel')
+        if mudel not in PORTFELLI_MUDELID:
+            return jsonify({'error': f'Portfell toetab mudeleid: {", ".join(PORTFELLI_MUDELID)}'}), 400
+        
+        portfelli_maatriks, _ = lae_portfell(app.config['ANDMETE_KAUST'])
+        if portfelli_maatriks is None:
+            return jsonify({'error': 'Andmeid ei leitud'}), 400
         
-        # Arvutame üldise keskmise
-        uldine_keskmine = kogu_tulu / kogu_tsuklite_arv if kogu_tsuklite_arv > 0 else 0
+        try:
+            pargid = kontrolli_pargid(data.get('pargid'), portfelli_maatriks['tsoonid'])
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Lisame erinevuse keskmisest
-        for stat in kuu_statistika:
-            stat['erinevus_keskmisest'] = float(stat['keskmine_tulu'] - uldine_keskmine)
+        with ajastus.etapp('optimeerimine'):
+            tulemused, kokku = simuleeri_portfell(portfelli_maatriks, pargid, mudel)
+        ajastus.loenda('optimeerimine', len(pargid) * len(portfelli_maatriks['paevad']))
         
         return jsonify({
-            'kuu_statistika': kuu_statistika,
-            'kokku_tsukleid': kogu_tsuklite_arv,
-            'kogutulu': float(kogu_tulu),
-            'keskmine_tulu': float(uldine_keskmine)
+            'mudel': mudel,
+            'tsoonid': portfelli_maatriks['tsoonid'],
+            'kuud': [str(kuu) for kuu in portfelli_maatriks['kuud']],
+            'pargid': tulemused,
+            'portfell': kokku,
         })
         
     except Exception as e:
+        app.logger.exception('Päringu %s viga', request.path)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/graafik', methods=['GET', 'POST'])
+def ekspordi_graafik():
+    """
+    Kogu laadimis- ja tühjendusgraafik allalaaditava failina, arvutatud ja saadetud kuu kaupa.
+    Parameetrid nagu /api/arvuta (POST JSON või GET päringu parameetrid), lisaks detail
+    ('paev' või 'slot') ja vorming ('csv', 'parquet' või 'arrow').
+    """
+    try:
+        data = request.get_json(silent=True) or request.args.to_dict()
+        detail = data.get('detail', 'paev')
+        vorming = data.get('vorming', 'csv')
+        try:
+            mudel, parameetrid = arvutuse_parameetrid(data)
+            graafik.kontrolli_valikud(mudel, detail, vorming)
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        _, maatriks, _ = lae_hinnaandmed(app.config['ANDMETE_KAUST'])
+        if maatriks is None:
+            return jsonify({'error': 'Andmeid ei leitud'}), 400
+        
+        voog = graafik.ekspordi(graafik.graafiku_tukid(maatriks, mudel=mudel, detail=detail, **parameetrid), vorming)
+        return Response(
+            stream_with_context(voog),
+            mimetype=graafik.MIMETYYBID[vorming],
+            headers={'Content-Disposition': f'attachment; filename=akupargi_graafik_{mudel}_{detail}.{vorming}'}
+        )
+        
+    except Exception as e:
+        app.logger.exception('Päringu %s viga', request.path)
+        return jsonify({'error': str(e)}), 500
+
+def _arvutuse_too(kaust, mudel, parameetrid):
+    """
+    /api/arvuta taustatööna: annab iga kuu tulemuse ('kuu') kohe pärast selle arvutamist ja
+    lõpuks /api/arvuta vastuse ('tulemus'). Sõltumatute päevadega mudelid arvutatakse kuu kaupa.
+    """
+    _, maatriks, _ = lae_hinnaandmed(kaust)
+    if maatriks is None:
+        raise ValueError('Andmeid ei leitud')
+    keskmised_hinnad = kuu_keskmised_hinnad(maatriks)
+    kuid = len(maatriks['kuud'])
+    
+    if mudel in INKREMENTAALSED_MUDELID:
+        hoidla = tulemuste_hoidla()
+        
+        def kuude_kaupa():
+            for kuu in kuude_maatriksid(maatriks):
+                if hoidla is not None:
+                    _, _, summad, arvud, _ = kuude_tulud_hoidlaga(hoidla, kuu, mudel=mudel, **parameetrid)
+                else:
+                    summad, arvud = kuude_tulud(kuu, *paevade_tulud(kuu, mudel=mudel, **parameetrid))
+                yield summad[0], arvud[0]
+        tulemused = kuude_kaupa()
+    else:
+        # Ajajoone tsüklid võivad ületada kuu piiri: arvutame tervikuna ja anname kuud järjest
+        tulemused = zip(*kuude_tulud(maatriks, *paevade_tulud(maatriks, mudel=mudel, **parameetrid)))
+    
+    kuu_summad = []
+    kuu_arvud = []
+    for k, (summa, arv) in enumerate(tulemused):
+        kuu_summad.append(summa)
+        kuu_arvud.append(arv)
+        yield dict(
+            kuu_kirje(maatriks['kuud'][k], summa, arv, keskmised_hinnad[k]), tyyp='kuu', indeks=k, kuid=kuid
+        )
+    yield dict(kuude_statistika(maatriks, kuu_summad, kuu_arvud, keskmised_hinnad), tyyp='tulemus')
+
+def _sweep_too(kaust, mudel, punktid, tootajaid):
+    """/api/sweep taustatööna: iga punkti tulemus ('punkt') kohe, lõpuks kuud ja soojuskaart ('tulemus')"""
+    _, maatriks, _ = lae_hinnaandmed(kaust)
+    if maatriks is None:
+        raise ValueError('Andmeid ei leitud')
+    tulemused = []
+    for i, tulemus in enumerate(skaneeri_jarjest(maatriks, punktid, mudel=mudel, tootajaid=tootajaid)):
+        tulemused.append(tulemus)
+        yield dict(tulemus, tyyp='punkt', indeks=i, punkte=len(punktid))
+    yield {
+        'tyyp': 'tulemus',
+        'mudel': mudel,
+        'kuud': [str(kuu) for kuu in maatriks['kuud']],
+        'soojuskaart': soojuskaart(tulemused)
+    }
+
+@app.route('/api/jobs', methods=['POST'])
+def lisa_too():
+    """
+    Käivitab arvutuse taustatööna ja tagastab kohe töö id (202). tyyp = 'arvuta' (vaikimisi,
+    /api/arvuta parameetrid) või 'sweep' (/api/sweep parameetrid). Täis järjekorra korral 429.
+    """
+    try:
+        data = request.json or {}
+        tyyp = data.get('tyyp', 'arvuta')
+        kaust = app.config['ANDMETE_KAUST']
+        try:
+            if tyyp == 'arvuta':
+                argumendid = (_arvutuse_too, kaust, *arvutuse_parameetrid(data))
+            elif tyyp == 'sweep':
+                mudel = data.get('mudel', 'tsukkel')
+                if mudel not in MUDELID:
+                    raise ValueError(f'Tundmatu mudel: {mudel}')
+                argumendid = (_sweep_too, kaust, mudel, parameetrite_vork(data, mudel), app.config['SWEEP_TOOTAJAID'])
+            else:
+                raise ValueError(f'Tundmatu töö tüüp: {tyyp}')
+        except (ValueError, TypeError, KeyError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            too_id = tood.lisa_too(toode_haldur(), *argumendid, tyyp=tyyp)
+        except tood.JarjekordTais as e:
+            return jsonify({'error': str(e)}), 429
+        return jsonify({'id': too_id, 'olek': 'ootel', 'voog': f'/api/jobs/{too_id}/stream'}), 202
+        
+    except Exception as e:
+        app.logger.exception('Päringu %s viga', request.path)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs/<too_id>', methods=['GET'])
+def too_olek(too_id):
+    """Töö olek; lõpetatud töö korral ka viimane sündmus (tulemus, viga või tühistamine)"""
+    too = tood.leia_too(toode_haldur(), too_id)
+    if too is None:
+        return jsonify({'error': 'Tööd ei leitud'}), 404
+    olek = tood.too_olek(too)
+    if olek['olek'] in tood.LOPPOLEKUD:
+        viimased = too['sundmused'][-2:]
+        olek['tulemus'] = next((s for s in viimased if s['tyyp'] == 'tulemus'), None)
+        olek['viga'] = viimased[-1].get('viga')
+    return jsonify(olek)
+
+@app.route('/api/jobs/<too_id>', methods=['DELETE'])
+@app.route('/api/jobs/<too_id>/cancel', methods=['POST'])
+def tuhista_too(too_id):
+    """Tühistab töö (ootel töö kohe, töötav järgmise kuu või punkti järel)"""
+    too = tood.leia_too(toode_haldur(), too_id)
+    if too is None:
+        return jsonify({'error': 'Tööd ei leitud'}), 404
+    tood.tuhista(too)
+    return jsonify(tood.too_olek(too))
+
+@app.route('/api/jobs/<too_id>/stream', methods=['GET'])
+def too_voog(too_id):
+    """
+    Töö sündmused voona niipea, kui need valmivad: NDJSON (üks JSON rida sündmuse kohta) või
+    Server-Sent Events, kui Accept on text/event-stream või format=sse. Varasemad sündmused
+    saadetakse uuesti alates parameetrist alates (SSE korral Last-Event-ID järgi).
+    """
+    too = tood.leia_too(toode_haldur(), too_id)
+    if too is None:
+        return jsonify({'error': 'Tööd ei leitud'}), 404
+    sse = request.args.get('format') == 'sse' or request.accept_mimetypes.best == 'text/event-stream'
+    try:
+        alates = int(request.headers.get('Last-Event-ID', -1)) + 1 if sse and 'Last-Event-ID' in request.headers \
+            else int(request.args.get('alates', 0))
+    except ValueError:
+        return jsonify({'error': 'alates peab olema täisarv'}), 400
+    
+    def voog():
+        # Vaikuse ajal saadab SSE kommentaari, et puhverdajad ja proksid ühendust ei sulgeks
+        for sundmus in tood.sundmused(too, alates, ootamine=15):
+            if sundmus is None:
+                if sse:
+                    yield ': ping\n\n'
+                continue
+            rida = json.dumps(sundmus, ensure_ascii=False)
+            yield f"id: {sundmus['jrk']}\nevent: {sundmus['tyyp']}\ndata: {rida}\n\n" if sse else rida + '\n'
+    
+    return Response(
+        stream_with_context(voog()),
+        mimetype='text/event-stream' if sse else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Etappide kestuste protsentiilid viimaste päringute põhjal (kui ajastus on sisse lülitatud) ja tulemuste vahemälu loendurid"""
+    return jsonify({
+        'ajastus': app.config['AJASTUS'],
+        'akna_pikkus': ajastus.AKNA_PIKKUS,
+        'etapid': ajastus.kokkuvote(),
+        'tulemuste_vahemalu': tulemuste_vahemalu_olek()
+    })
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
 
@@ -0,0 +1,36 @@
+"""
+Gunicorni seadistus mitme töötajaprotsessiga serveerimiseks (Linux/macOS).
+
+Hinnad parsitakse üks kord peaprotsessis enne töötajate käivitamist ja
+kirjutatakse jagatud faili (AKUPARK_JAGATUD_HINNAD), mille iga töötaja
+kaardistab mällu ainult lugemiseks. Iga töötaja arvutab ühes protsessis
+(AKUPARK_SWEEP_TOOTAJAID=1, NumPy/BLAS ühe lõimega), nii et paralleelsus
+tuleb töötajate arvust.
+
+Kasutamine:
+    gunicorn -c gunicorn.conf.py app:app
+"""
+import os
+import tempfile
+
+bind = os.environ.get('AKUPARK_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('AKUPARK_TOOTAJAID', os.cpu_count() or 1))
+# Lõimed töötaja kohta: voogedastus (/api/jobs/<id>/stream, /api/graafik) ei blokeeri teisi päringuid
+worker_class = 'gthread'
+threads = int(os.environ.get('AKUPARK_LOIMI', 4))
+# Esimene arvutus mitme aasta 15-minutiliste hindadega võib võtta kaua
+timeout = 120
+
+os.environ.setdefault('AKUPARK_JAGATUD_HINNAD', os.path.join(tempfile.gettempdir(), 'akupark'))
+os.environ.setdefault('AKUPARK_SWEEP_TOOTAJAID', '1')
+for muutuja in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(muutuja, '1')
+
+
+def on_starting(server):
+    """Parsib hinnad ja kirjutab jagatud faili enne töötajate käivitamist"""
+    from app import app, lae_hinnaandmed
+
+    _, maatriks, _ = lae_hinnaandmed(app.config['ANDMETE_KAUST'])
+    if maatriks is None:
+        server.log.warning('Hinnaandmeid ei leitud: %s', app.config['ANDMETE_KAUST'])
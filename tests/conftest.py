@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Moodulid on repo juurkaustas (mitte paketina)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,100 @@
+"""akupargi_andmed CSV lugemine (kodeeringud, paigutused, kordused, kellakeeramine) ja päevamaatriks"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from akupargi_andmed import _tuvasta_skeem, koosta_paevamaatriks, loe_hinnad, loe_hinnafailid
+
+ANDMED = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'andmed')
+# cp1252, Ajatempel;Kuupäev;NPS Eesti, 31.03.2024 (23 tundi), 06:00 rida kahekordselt
+KEVAD = os.path.join(ANDMED, 'ajatempel_cp1252_kevad.csv')
+# UTF-8 BOM, 2025 kaheveeruline Periood;Börsihind, 27.10.2024 (25 tundi) ja keskmise rida lõpus
+SUGIS = os.path.join(ANDMED, 'periood_bom_sugis.csv')
+# UTF-8, 30.09.2025 neli tunnihinda, 01.10.2025 kaks tunnihinda ja neli 15 minuti hinda
+SEGATUD = os.path.join(ANDMED, 'ajatempel_segatud.csv')
+
+
+def _utc_sekundid(algus, perioode, samm='h'):
+    return ((pd.date_range(algus, periods=perioode, freq=samm, tz='UTC') - pd.Timestamp(0, tz='UTC'))
+            // pd.Timedelta(seconds=1)).to_numpy()
+
+
+@pytest.mark.parametrize('fail,kodeering,skeem', [
+    (KEVAD, 'cp1252', 'ajatempel'),
+    (SUGIS, 'utf-8-sig', 'periood'),
+    (SEGATUD, 'utf-8', 'ajatempel'),
+])
+def test_skeemi_tuvastus(fail, kodeering, skeem):
+    tuvastatud_kodeering, tuvastatud_skeem, veerud = _tuvasta_skeem(fail)
+    assert (tuvastatud_kodeering, tuvastatud_skeem) == (kodeering, skeem)
+    # Päis dekodeeritakse õigesti (täpitähed, BOM ei jää esimese veeru nimesse)
+    assert veerud[0] in ('Ajatempel (UTC)', 'Periood')
+    assert veerud[1] in ('Kuupäev (Eesti aeg)', 'Börsihind eur/MWh (ei sisalda käibemaksu)')
+
+
+def test_ajatempel_cp1252_kevadine_paev():
+    df = loe_hinnad(KEVAD)
+    assert list(df.columns) == ['Kuupäev', 'Ajatempel', 'Hind']
+    # Korduvast ajatemplist jääb alles esimene rida
+    assert len(df) == 23
+    np.testing.assert_array_equal(df['Ajatempel'].to_numpy(), _utc_sekundid('2024-03-30 22:00', 23))
+    np.testing.assert_array_equal(df['Hind'].to_numpy(), np.arange(10.0, 33.0))
+    # Kell 03:00 puudub (kellakeeramine), kuupäev tuletatakse UTC ajast
+    tunnid = df['Kuupäev'].dt.hour.tolist()
+    assert tunnid == [0, 1, 2] + list(range(4, 24))
+    assert (df['Kuupäev'].dt.date == pd.Timestamp('2024-03-31').date()).all()
+
+
+def test_periood_bom_sugisene_paev():
+    df = loe_hinnad(SUGIS)
+    # 25 tundi, kordustund 03:00 kahe eraldi tunnina; keskmise rida jäetakse välja
+    assert len(df) == 25
+    np.testing.assert_array_equal(df['Ajatempel'].to_numpy(), _utc_sekundid('2024-10-26 21:00', 25))
+    np.testing.assert_array_equal(df['Hind'].to_numpy(), np.arange(-5.0, 20.0))
+    assert df['Kuupäev'].dt.hour.tolist() == [0, 1, 2, 3, 3] + list(range(4, 24))
+
+
+def test_segatud_slotipikkused_ridadena():
+    df = loe_hinnad(SEGATUD)
+    np.testing.assert_array_equal(df['Ajatempel'].to_numpy(), np.r_[
+        _utc_sekundid('2025-09-29 21:00', 4),
+        _utc_sekundid('2025-09-30 21:00', 2),
+        _utc_sekundid('2025-09-30 23:00', 4, '15min'),
+    ])
+    np.testing.assert_array_equal(df['Hind'].to_numpy(), 20.5 + 10 * np.arange(10))
+
+
+def test_tundmatu_fail_annab_tuhja(tmp_path):
+    fail = tmp_path / 'muu.csv'
+    fail.write_text('a;b\n1;2\n', encoding='utf-8')
+    assert loe_hinnad(str(fail)).empty
+
+
+def test_kellakeeramise_paevade_maatriks():
+    maatriks = koosta_paevamaatriks(loe_hinnafailid([KEVAD, SUGIS]))
+    np.testing.assert_array_equal(maatriks['paevad'], np.array(['2024-03-31', '2024-10-27'], dtype='datetime64[D]'))
+    np.testing.assert_array_equal(maatriks['pikkused'], [23, 25])
+    np.testing.assert_array_equal(maatriks['slotipikkused'], [1.0, 1.0])
+    assert maatriks['hinnad'].shape == (2, 25)
+    np.testing.assert_array_equal(maatriks['kehtiv'].sum(axis=1), [23, 25])
+    assert np.isnan(maatriks['hinnad'][0, 23:]).all()
+    np.testing.assert_array_equal(maatriks['hinnad'][0, :23], np.arange(10.0, 33.0))
+    np.testing.assert_array_equal(maatriks['hinnad'][1], np.arange(-5.0, 20.0))
+    np.testing.assert_array_equal(maatriks['algused'], [0, 23])
+    np.testing.assert_array_equal(maatriks['kuud'], np.array(['2024-03', '2024-10'], dtype='datetime64[M]'))
+    np.testing.assert_array_equal(maatriks['kuu_piirid'], [0, 1, 2])
+
+
+def test_segatud_tunni_ja_15_minuti_paev():
+    maatriks = koosta_paevamaatriks(loe_hinnad(SEGATUD))
+    # Tunnipäev jääb tunnislottideks; segatud päeval jagatakse tunnid neljaks 15 minuti slotiks
+    np.testing.assert_array_equal(maatriks['pikkused'], [4, 12])
+    np.testing.assert_array_equal(maatriks['slotipikkused'], [1.0, 0.25])
+    np.testing.assert_array_equal(maatriks['hinnad'][0, :4], [20.5, 30.5, 40.5, 50.5])
+    assert np.isnan(maatriks['hinnad'][0, 4:]).all()
+    np.testing.assert_array_equal(maatriks['hinnad'][1], np.r_[np.repeat([60.5, 70.5], 4), 80.5, 90.5, 100.5, 110.5])
+    np.testing.assert_array_equal(np.diff(maatriks['ajatemplid'][4:]), np.full(11, 900))
+    assert maatriks['ajad'][4] == np.datetime64('2025-10-01T00:00')
+    assert maatriks['ajad'][-1] == np.datetime64('2025-10-01T02:45')
@@ -0,0 +1,327 @@
+"""Flaski API: taustatööd, tulemuste vahemälu, ajastus, jagatud hinnamaatriks ja parameetrite kontroll"""
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+import app as rakendus
+from akupargi_jagatud import ava_maatriks
+
+
+@pytest.fixture
+def klient(monkeypatch):
+    # Igal testil oma tööde haldur (seadistus loetakse esimesel kasutamisel)
+    monkeypatch.setitem(rakendus._tood, 'haldur', None)
+    return rakendus.app.test_client()
+
+
+def _sundmused(klient, too_id):
+    vastus = klient.get(f'/api/jobs/{too_id}/stream')
+    return [json.loads(rida) for rida in vastus.get_data(as_text=True).splitlines()]
+
+
+@pytest.mark.parametrize('parameetrid', [
+    {},
+    {'mudel': 'soc', 'max_tsukleid_paevas': 1},
+    {'mudel': 'ajajoon', 'aku_voimsus_mw': 30, 'max_aeg_vahel': 5},
+])
+def test_too_tulemus_sama_mis_arvuta(klient, parameetrid):
+    oodatud = klient.post('/api/arvuta', json=parameetrid)
+    if oodatud.status_code == 400:
+        pytest.skip(oodatud.get_json()['error'])
+    vastus = klient.post('/api/jobs', json=parameetrid)
+    assert vastus.status_code == 202
+    sundmused = _sundmused(klient, vastus.get_json()['id'])
+
+    assert sundmused[-1]['tyyp'] == 'valmis'
+    kuud = [s for s in sundmused if s['tyyp'] == 'kuu']
+    tulemus = next(s for s in sundmused if s['tyyp'] == 'tulemus')
+    tulemus = {nimi: v for nimi, v in tulemus.items() if nimi not in ('tyyp', 'jrk')}
+    assert tulemus == oodatud.get_json()
+    assert len(kuud) == len(tulemus['kuu_statistika'])
+
+
+def test_sweep_too_sama_mis_sweep(klient):
+    parameetrid = {'tyyp': 'sweep', 'aku_voimsus_mw': [20, 40]}
+    oodatud = klient.post('/api/sweep', json=parameetrid)
+    if oodatud.status_code == 400:
+        pytest.skip(oodatud.get_json()['error'])
+    sundmused = _sundmused(klient, klient.post('/api/jobs', json=parameetrid).get_json()['id'])
+    punktid = [
+        {nimi: v for nimi, v in s.items() if nimi not in ('tyyp', 'jrk', 'indeks', 'punkte')}
+        for s in sundmused if s['tyyp'] == 'punkt'
+    ]
+    assert punktid == oodatud.get_json()['punktid']
+
+
+def test_taus_jarjekord_annab_429(klient, monkeypatch):
+    monkeypatch.setitem(rakendus.app.config, 'TOODE_TOOTAJAID', 1)
+    monkeypatch.setitem(rakendus.app.config, 'TOODE_JARJEKORD', 2)
+    vabasta = threading.Event()
+
+    def ootav_too(kaust, mudel, parameetrid):
+        vabasta.wait(10)
+        yield {'tyyp': 'tulemus'}
+
+    monkeypatch.setattr(rakendus, '_arvutuse_too', ootav_too)
+    try:
+        esimene = klient.post('/api/jobs', json={}).get_json()['id']
+        # Ootame, kuni ainus töötaja on esimese töö järjekorrast võtnud
+        lopp = time.monotonic() + 10
+        while klient.get(f'/api/jobs/{esimene}').get_json()['olek'] != 'tootab':
+            assert time.monotonic() < lopp
+            time.sleep(0.01)
+        koodid = [klient.post('/api/jobs', json={}).status_code for _ in range(3)]
+        assert koodid == [202, 202, 429]
+    finally:
+        vabasta.set()
+    assert _sundmused(klient, esimene)[-1]['tyyp'] == 'valmis'
+
+
+@pytest.mark.parametrize('tee,lisa', [
+    ('/api/arvuta', {}),
+    ('/api/stsenaariumid', {'stsenaariume': 5}),
+    ('/api/portfell', None),
+])
+def test_vigane_voimsus_annab_400(klient, tee, lisa):
+    andmed = {'mudel': 'soc', 'aku_voimsus_mw': -5}
+    if lisa is None:
+        andmed = {'mudel': 'soc', 'pargid': [dict(andmed, nimi='A')]}
+    else:
+        andmed.update(lisa)
+    vastus = klient.post(tee, json=andmed)
+    assert vastus.status_code == 400
+    assert 'positiivsed' in vastus.get_json()['error']
+
+
+def test_stsenaariumid_kasutavad_aku_parameetreid(klient):
+    # Ilma skaleerimiseta on stsenaariumide keskmine kogutulu ajaloo päevade tulude ümbervalik:
+    # vaikeväärtused ja murdosa max_aeg_vahel peavad andma sama tulemuse kui selgesõnalised väärtused
+    vaikimisi = klient.post('/api/stsenaariumid', json={'stsenaariume': 20, 'max_aeg_vahel': '2.5'})
+    if vaikimisi.status_code == 400:
+        pytest.skip(vaikimisi.get_json()['error'])
+    selgelt = klient.post('/api/stsenaariumid', json={
+        'stsenaariume': 20, 'aku_voimsus_mw': 50, 'aku_mahtuvus_mwh': 100, 'efektiivsus': 0.87, 'max_aeg_vahel': 2.5,
+    })
+    assert vaikimisi.get_json() == selgelt.get_json()
+
+
+@pytest.fixture
+def vahemalu(klient, monkeypatch):
+    """Tühi tulemuste vahemälu nullitud loenduritega"""
+    monkeypatch.setattr(rakendus, '_tulemuste_vahemalu', OrderedDict())
+    monkeypatch.setattr(rakendus, '_tulemuste_loendurid', dict.fromkeys(rakendus._tulemuste_loendurid, 0))
+    return klient
+
+
+def _vahemalu_olek(klient):
+    return klient.get('/api/metrics').get_json()['tulemuste_vahemalu']
+
+
+def test_vahemalu_tabamus_sama_vastus(vahemalu):
+    esimene = vahemalu.post('/api/arvuta', json={'aku_voimsus_mw': 40})
+    teine = vahemalu.post('/api/arvuta', json={'aku_voimsus_mw': 40})
+    assert esimene.status_code == teine.status_code == 200
+    assert teine.get_data() == esimene.get_data()
+    olek = _vahemalu_olek(vahemalu)
+    assert (olek['moodalaske'], olek['tabamusi'], olek['kirjeid']) == (1, 1, 1)
+
+
+@pytest.mark.parametrize('mudel,variandid', [
+    # 8, 8.0 ja vaikeväärtus on sama võti
+    ('tsukkel', [{'max_aeg_vahel': 8}, {'max_aeg_vahel': 8.0}, {}, {'max_aeg_vahel': '8'}]),
+    # Mudel soc ei kasuta max_aeg_vahel ega tsukkel max_tsukleid_paevas
+    ('soc', [{}, {'max_aeg_vahel': 3}, {'max_aeg_vahel': 5.5}]),
+    ('tsukkel', [{}, {'max_tsukleid_paevas': 2}]),
+])
+def test_vahemalu_normaliseeritud_voti(vahemalu, mudel, variandid):
+    vastused = [vahemalu.post('/api/arvuta', json=dict(v, mudel=mudel)).get_data() for v in variandid]
+    assert all(vastus == vastused[0] for vastus in vastused)
+    olek = _vahemalu_olek(vahemalu)
+    assert (olek['moodalaske'], olek['tabamusi'], olek['kirjeid']) == (1, len(variandid) - 1, 1)
+
+
+def test_vahemalu_valjatostmine(vahemalu, monkeypatch):
+    monkeypatch.setitem(rakendus.app.config, 'TULEMUSTE_VAHEMALU_SUURUS', 2)
+    for voimsus in (20, 30, 20, 40):
+        vahemalu.post('/api/arvuta', json={'aku_voimsus_mw': voimsus})
+    # 20 kasutati uuesti enne 40 lisamist, seega välja tõsteti 30
+    olek = _vahemalu_olek(vahemalu)
+    assert (olek['moodalaske'], olek['tabamusi'], olek['valja_tostetud'], olek['kirjeid']) == (3, 1, 1, 2)
+    vahemalu.post('/api/arvuta', json={'aku_voimsus_mw': 20})
+    vahemalu.post('/api/arvuta', json={'aku_voimsus_mw': 30})
+    olek = _vahemalu_olek(vahemalu)
+    assert (olek['moodalaske'], olek['tabamusi']) == (4, 2)
+
+
+def test_vahemalu_valjas(vahemalu, monkeypatch):
+    monkeypatch.setitem(rakendus.app.config, 'TULEMUSTE_VAHEMALU_SUURUS', 0)
+    vahemalu.post('/api/arvuta', json={})
+    vahemalu.post('/api/arvuta', json={})
+    olek = _vahemalu_olek(vahemalu)
+    assert (olek['moodalaske'], olek['tabamusi'], olek['kirjeid']) == (2, 0, 0)
+
+
+@pytest.mark.parametrize('ttl,tabamusi', [(1e-9, 0), (3600, 1)])
+def test_vahemalu_eluiga(vahemalu, monkeypatch, ttl, tabamusi):
+    monkeypatch.setitem(rakendus.app.config, 'TULEMUSTE_VAHEMALU_TTL', ttl)
+    vahemalu.post('/api/arvuta', json={})
+    time.sleep(0.001)
+    vahemalu.post('/api/arvuta', json={})
+    olek = _vahemalu_olek(vahemalu)
+    assert (olek['tabamusi'], olek['aegunud']) == (tabamusi, 1 - tabamusi)
+
+
+@pytest.mark.parametrize('muutus', ['mtime', 'suurus'])
+def test_vahemalu_aegub_faili_muutumisel(vahemalu, monkeypatch, tmp_path, muutus):
+    fail = tmp_path / 'Tuulikutasu 2025 I.csv'
+    shutil.copy(os.path.join(rakendus.app.config['ANDMETE_KAUST'], fail.name), fail)
+    monkeypatch.setitem(rakendus.app.config, 'ANDMETE_KAUST', str(tmp_path))
+    monkeypatch.setitem(rakendus.app.config, 'FAILIDE_KONTROLLI_VAHE', 0)
+    esimene = vahemalu.post('/api/arvuta', json={}).get_data()
+    assert vahemalu.post('/api/arvuta', json={}).get_data() == esimene
+    if muutus == 'mtime':
+        st = fail.stat()
+        os.utime(fail, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    else:
+        with open(fail, 'ab') as f:
+            f.write(b'\n')
+    assert vahemalu.post('/api/arvuta', json={}).get_data() == esimene
+    olek = _vahemalu_olek(vahemalu)
+    assert (olek['moodalaske'], olek['tabamusi'], olek['kirjeid']) == (2, 1, 1)
+
+
+def _server_timing(vastus):
+    """Server-Timing päis -> {etapp: (kestus ms, kirjeldus)}"""
+    etapid = {}
+    for osa in vastus.headers['Server-Timing'].split(', '):
+        nimi, *valjad = osa.split(';')
+        valjad = dict(v.split('=', 1) for v in valjad)
+        etapid[nimi] = (float(valjad['dur']), valjad.get('desc'))
+    return etapid
+
+
+@pytest.fixture
+def ajastatud(vahemalu, monkeypatch, tmp_path):
+    """AJASTUS sisse, tühi mõõtmiste ajalugu ja värske andmekaust (hinnad loetakse CSV-st uuesti)"""
+    fail = tmp_path / 'Tuulikutasu 2025 I.csv'
+    shutil.copy(os.path.join(rakendus.app.config['ANDMETE_KAUST'], fail.name), fail)
+    monkeypatch.setitem(rakendus.app.config, 'ANDMETE_KAUST', str(tmp_path))
+    monkeypatch.setitem(rakendus.app.config, 'FAILIDE_KONTROLLI_VAHE', 0)
+    monkeypatch.setitem(rakendus.app.config, 'HINNA_HETKTOMMIS', False)
+    monkeypatch.setitem(rakendus.app.config, 'AJASTUS', True)
+    monkeypatch.setattr(rakendus.ajastus, '_ajalugu', {})
+    return vahemalu
+
+
+def test_ajastus_server_timing(ajastatud):
+    esimene = _server_timing(ajastatud.post('/api/arvuta', json={}))
+    # Failide lugemise etapid mõõdetakse ka lugemislõimedes
+    assert {'failid', 'dekodeerimine', 'parsimine', 'ruhmitamine', 'indekseerimine',
+            'optimeerimine', 'koondamine', 'kokku'} <= set(esimene)
+    assert esimene['parsimine'][1].startswith('"ridu=')
+    assert esimene['kokku'][1] is None
+    assert esimene['kokku'][0] >= esimene['optimeerimine'][0] > 0
+    # Vahemälust tulnud vastus: andmeid ega tulemust ei arvutata uuesti
+    teine = _server_timing(ajastatud.post('/api/arvuta', json={}))
+    assert set(teine) == {'failid', 'kokku'}
+
+
+def test_ajastus_metrics_protsentiilid(ajastatud):
+    for voimsus in (20, 30, 40):
+        ajastatud.post('/api/arvuta', json={'aku_voimsus_mw': voimsus})
+    ajastatud.post('/api/stsenaariumid', json={'stsenaariume': 2})
+    ajastatud.get('/')
+    mootmised = ajastatud.get('/api/metrics').get_json()
+    assert mootmised['ajastus'] is True
+    # Rühmad on API otspunktid; leht ja /api/metrics ise ajalukku ei lähe
+    etapid = mootmised['etapid']
+    assert set(etapid) == {'/api/arvuta', '/api/stsenaariumid'}
+    kokku = etapid['/api/arvuta']['kokku']
+    assert kokku['mootmisi'] == 3
+    assert 0 < kokku['p50_ms'] <= kokku['p90_ms'] <= kokku['p99_ms'] <= kokku['max_ms']
+    assert kokku['keskmine_ridu'] is None
+    assert etapid['/api/arvuta']['optimeerimine']['mootmisi'] == 3
+    assert etapid['/api/arvuta']['koondamine']['keskmine_ridu'] > 0
+    assert etapid['/api/stsenaariumid']['kokku']['mootmisi'] == 1
+
+
+def test_ajastus_valjas(vahemalu, monkeypatch):
+    monkeypatch.setitem(rakendus.app.config, 'AJASTUS', False)
+    monkeypatch.setattr(rakendus.ajastus, '_ajalugu', {})
+    vastus = vahemalu.post('/api/arvuta', json={})
+    assert vastus.status_code == 200
+    assert 'Server-Timing' not in vastus.headers
+    mootmised = vahemalu.get('/api/metrics').get_json()
+    assert mootmised['ajastus'] is False
+    assert mootmised['etapid'] == {}
+
+
+@pytest.fixture
+def jagatud(vahemalu, monkeypatch, tmp_path):
+    """JAGATUD_HINNAD sisse, värske andmekaust ja tühi protsessi hinnavahemälu"""
+    kaust = tmp_path / 'andmed'
+    kaust.mkdir()
+    shutil.copy(os.path.join(rakendus.app.config['ANDMETE_KAUST'], 'Tuulikutasu 2025 I.csv'), kaust)
+    monkeypatch.setitem(rakendus.app.config, 'ANDMETE_KAUST', str(kaust))
+    monkeypatch.setitem(rakendus.app.config, 'FAILIDE_KONTROLLI_VAHE', 0)
+    monkeypatch.setitem(rakendus.app.config, 'HINNA_HETKTOMMIS', False)
+    monkeypatch.setitem(rakendus.app.config, 'JAGATUD_HINNAD', str(tmp_path / 'jagatud'))
+    monkeypatch.setattr(rakendus, '_hinnad_vahemalus', dict(rakendus._hinnad_vahemalus, signatuur=None, kaust=None))
+    return str(kaust), str(tmp_path / 'jagatud')
+
+
+def _jagatud_fail(kaust, jagatud_kaust):
+    csv_failid = rakendus.hinnafailid(kaust) + rakendus.reservifailid(kaust)
+    nimi = rakendus.jagatud_faili_nimi(kaust, rakendus.failide_signatuur(csv_failid), rakendus.VAIKETSOON)
+    return os.path.join(jagatud_kaust, nimi)
+
+
+def test_jagatud_maatriks_kaardistatakse(jagatud):
+    kaust, jagatud_kaust = jagatud
+    _, maatriks, _ = rakendus.lae_hinnaandmed(kaust)
+    fail = _jagatud_fail(kaust, jagatud_kaust)
+    assert os.listdir(jagatud_kaust) == [os.path.basename(fail)]
+    # Protsess kasutab ise ka kaardistatud koopiat
+    assert not maatriks['hinnad'].flags.writeable
+    # Teine töötaja (tühi protsessi vahemälu) kaardistab sama faili
+    rakendus._hinnad_vahemalus.update(signatuur=None, kaust=None)
+    kogu_df, teine, _ = rakendus.lae_hinnaandmed(kaust)
+    assert kogu_df is None
+    for nimi in ('paevad', 'hinnad', 'pikkused', 'slotipikkused'):
+        np.testing.assert_array_equal(teine[nimi], maatriks[nimi])
+
+
+@pytest.mark.parametrize('sisu', [b'', b'AKUMAATR\x05', b'AKUMAATR' + (10 ** 6).to_bytes(8, 'little') + b'{"struk'])
+def test_vigane_jagatud_fail_koostatakse_uuesti(jagatud, sisu):
+    kaust, jagatud_kaust = jagatud
+    fail = _jagatud_fail(kaust, jagatud_kaust)
+    os.makedirs(jagatud_kaust)
+    with open(fail, 'wb') as f:
+        f.write(sisu)
+    _, maatriks, _ = rakendus.lae_hinnaandmed(kaust)
+    assert maatriks is not None and len(maatriks['paevad']) > 0
+    # Vigane fail asendati õigega
+    uuesti = ava_maatriks(fail)
+    np.testing.assert_array_equal(uuesti['hinnad'], maatriks['hinnad'])
+
+
+def test_aegunud_jagatud_fail_asendatakse(jagatud):
+    kaust, jagatud_kaust = jagatud
+    _, vana, _ = rakendus.lae_hinnaandmed(kaust)
+    vana_fail = _jagatud_fail(kaust, jagatud_kaust)
+    csv = os.path.join(kaust, 'Tuulikutasu 2025 I.csv')
+    with open(csv, 'ab') as f:
+        f.write(b'1743454800;01.04.2025 00:00;123,45\n')
+    _, uus, _ = rakendus.lae_hinnaandmed(kaust)
+    uus_fail = _jagatud_fail(kaust, jagatud_kaust)
+    # Hinnafaili muutumisel tekib uus fail ja vana kustutatakse
+    assert uus_fail != vana_fail
+    assert os.listdir(jagatud_kaust) == [os.path.basename(uus_fail)]
+    assert len(uus['paevad']) == len(vana['paevad']) + 1
+    assert uus['hinnad'][-1, 0] == 123.45
@@ -0,0 +1,105 @@
+"""akupargi_graafik: slottide ja päevade graafik vs paevade_tulud, laetuse piirid"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from akupargi_andmed import koosta_paevamaatriks, loe_hinnafailid
+from akupargi_graafik import ekspordi, graafiku_tukid
+from akupargi_simulatsioon import indekseeri, paevade_tulud
+
+JUUR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANDMED = os.path.join(JUUR, 'tests', 'andmed')
+
+# (võimsus MW, mahtuvus MWh, efektiivsus); mahtuvus on tunni- ja 15 minuti slottide täisarv
+TAISSLOTID = [(10, 20, 0.9), (2, 4, 0.85), (1, 1, 1.0)]
+# Mahtuvus pole sloti energia täisarv (tsukkel laeb täis slotte, vt test_tsukkel_laeb_taisslotte)
+OSASLOTID = [(2, 3, 0.85), (4, 1, 1.0)]
+
+
+@pytest.fixture(scope='module')
+def maatriks():
+    """Kvartal tunnihindu (kevadine kellakeeramine) ja väikesed failid (sügisene, segatud 15 min päev)"""
+    failid = [os.path.join(JUUR, 'Tuulikutasu 2024 I KV.csv')]
+    failid += [os.path.join(ANDMED, nimi) for nimi in sorted(os.listdir(ANDMED)) if nimi.endswith('.csv')]
+    return indekseeri(koosta_paevamaatriks(loe_hinnafailid(failid)))
+
+
+def _parameetrid(voimsus, mahtuvus, efektiivsus):
+    return dict(aku_voimsus_mw=voimsus, aku_mahtuvus_mwh=mahtuvus, efektiivsus=efektiivsus, max_aeg_vahel=8)
+
+
+def _graafik(maatriks, mudel, detail, parameetrid):
+    return pd.concat(graafiku_tukid(maatriks, mudel=mudel, detail=detail, **parameetrid), ignore_index=True)
+
+
+def test_andmed_sisaldavad_eri_paevi(maatriks):
+    assert {23, 24, 25, 12} <= set(maatriks['pikkused'].tolist())
+    assert set(maatriks['slotipikkused'].tolist()) == {1.0, 0.25}
+
+
+@pytest.mark.parametrize('aku', TAISSLOTID + OSASLOTID)
+@pytest.mark.parametrize('mudel', ['tsukkel', 'soc'])
+def test_slottide_tulu_sama_mis_paevade_tulud(maatriks, mudel, aku):
+    parameetrid = _parameetrid(*aku)
+    tulud, tsukleid = paevade_tulud(maatriks, mudel=mudel, **parameetrid)
+    slotid = _graafik(maatriks, mudel, 'slot', parameetrid)
+    paevad = _graafik(maatriks, mudel, 'paev', parameetrid)
+
+    assert len(slotid) == maatriks['pikkused'].sum()
+    np.testing.assert_array_equal(slotid['Ajatempel'].to_numpy(), maatriks['ajatemplid'])
+    paev = np.repeat(np.arange(len(maatriks['paevad'])), maatriks['pikkused'])
+    np.testing.assert_allclose(np.bincount(paev, slotid['Tulu'].to_numpy()), tulud, atol=1e-6)
+    np.testing.assert_array_equal(paevad['Tulu'].to_numpy(), tulud)
+    np.testing.assert_array_equal(paevad['Tsukleid'].to_numpy(), tsukleid)
+    np.testing.assert_allclose(
+        np.bincount(paev, slotid['Ostetud_MWh'].to_numpy()), paevad['Ostetud_MWh'].to_numpy(), atol=1e-9
+    )
+
+
+@pytest.mark.parametrize('aku', TAISSLOTID + OSASLOTID)
+def test_soc_laetus_piirides(maatriks, aku):
+    voimsus, mahtuvus, efektiivsus = aku
+    slotid = _graafik(maatriks, 'soc', 'slot', _parameetrid(*aku))
+    laetus = slotid['Laetus_MWh'].to_numpy()
+    assert laetus.min() >= -1e-9
+    assert laetus.max() <= mahtuvus + 1e-9
+    # Sloti kohta ostetakse ja müüakse kõige rohkem võimsus × sloti pikkus
+    piir = voimsus * slotid['Slotipikkus_h'].to_numpy() + 1e-9
+    assert (slotid['Ostetud_MWh'].to_numpy() <= piir).all()
+    assert (slotid['Müüdud_MWh'].to_numpy() <= piir).all()
+
+
+@pytest.mark.parametrize('aku', TAISSLOTID)
+def test_tsukkel_laetus_piirides(maatriks, aku):
+    voimsus, mahtuvus, efektiivsus = aku
+    slotid = _graafik(maatriks, 'tsukkel', 'slot', _parameetrid(*aku))
+    laetus = slotid['Laetus_MWh'].to_numpy()
+    assert laetus.min() >= -1e-9
+    assert laetus.max() == pytest.approx(mahtuvus)
+    # Iga päev lõpeb tühja akuga
+    paeva_lopp = np.cumsum(maatriks['pikkused']) - 1
+    np.testing.assert_allclose(laetus[paeva_lopp], 0.0, atol=1e-9)
+
+
+@pytest.mark.parametrize('aku', OSASLOTID)
+def test_tsukkel_laeb_taisslotte(maatriks, aku):
+    # Mudel tsukkel ostab ceil(mahtuvus / sloti energia) täis slotti (nagu paevade_tulud arvestab),
+    # seega laetus ületab mahtuvust kuni ühe sloti energia võrra
+    voimsus, mahtuvus, efektiivsus = aku
+    slotid = _graafik(maatriks, 'tsukkel', 'slot', _parameetrid(*aku))
+    slotienergia = voimsus * slotid['Slotipikkus_h'].to_numpy()
+    laetus = slotid['Laetus_MWh'].to_numpy()
+    assert laetus.min() >= -1e-9
+    assert (laetus <= np.ceil(mahtuvus / slotienergia) * slotienergia + 1e-9).all()
+
+
+def test_csv_eksport(maatriks):
+    tukid = list(graafiku_tukid(maatriks, **_parameetrid(10, 20, 0.9)))
+    tekst = ''.join(ekspordi(iter(tukid), 'csv'))
+    read = tekst.splitlines()
+    # Päis ainult üks kord, üks rida päeva kohta
+    assert read[0].startswith('Kuupäev,Kuu,Tsukleid,')
+    assert len(read) == 1 + len(maatriks['paevad'])
+    assert sum(rida.startswith('Kuupäev') for rida in read) == 1
@@ -0,0 +1,78 @@
+"""akupargi_hoidla: hoidlaga arvutus annab sama tulemuse kui ilma"""
+import os
+
+import numpy as np
+import pytest
+
+from akupargi_hoidla import ava_hoidla, kuude_tulud_hoidlaga, lisa_rasid
+from akupargi_simulatsioon import (
+    aku_parameetrid, hinnafailid, indekseeri, kuude_maatriksid, kuude_tulud, lae_maatriks, paevade_osa, paevade_tulud
+)
+
+KAUST = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def maatriks():
+    maatriks, _ = lae_maatriks(hinnafailid(['Tuulikutasu*.csv'], KAUST))
+    if maatriks is None:
+        pytest.skip('Hinnafaile pole')
+    return lisa_rasid(maatriks)
+
+
+def _ilma_hoidlata(maatriks, mudel, parameetrid):
+    tulud, tsukleid = paevade_tulud(maatriks, mudel=mudel, **parameetrid)
+    return (tulud, tsukleid) + kuude_tulud(maatriks, tulud, tsukleid)
+
+
+def _muudetud_paev(maatriks, d):
+    """Koopia, kus päeva d üks hind on muutunud (indeks ja räsid uuesti)"""
+    muudetud = {nimi: v for nimi, v in maatriks.items() if nimi not in ('indeks', 'rasid')}
+    muudetud['hinnad'] = maatriks['hinnad'].copy()
+    muudetud['hinnad'][d, 3] += 250.0
+    return lisa_rasid(indekseeri(muudetud))
+
+
+@pytest.mark.parametrize('mudel', ['tsukkel', 'soc'])
+def test_hoidlaga_sama_mis_ilma(tmp_path, maatriks, mudel):
+    parameetrid = aku_parameetrid({'aku_voimsus_mw': 40, 'aku_mahtuvus_mwh': 100, 'max_aeg_vahel': 6})
+    hoidla = ava_hoidla(str(tmp_path / 'hoidla.db'))
+
+    oodatud = _ilma_hoidlata(maatriks, mudel, parameetrid)
+    esimene = kuude_tulud_hoidlaga(hoidla, maatriks, mudel=mudel, **parameetrid)
+    teine = kuude_tulud_hoidlaga(hoidla, maatriks, mudel=mudel, **parameetrid)
+    assert esimene[4] == len(maatriks['paevad']) and teine[4] == 0
+    for tulemus in (esimene, teine):
+        for saadud, oodatud_osa in zip(tulemus[:4], oodatud):
+            np.testing.assert_array_equal(saadud, oodatud_osa)
+
+    # Ühe päeva hinna muutumisel arvutatakse uuesti ainult see päev
+    muudetud = _muudetud_paev(maatriks, 40)
+    oodatud = _ilma_hoidlata(muudetud, mudel, parameetrid)
+    kolmas = kuude_tulud_hoidlaga(hoidla, muudetud, mudel=mudel, **parameetrid)
+    assert kolmas[4] == 1
+    for saadud, oodatud_osa in zip(kolmas[:4], oodatud):
+        np.testing.assert_array_equal(saadud, oodatud_osa)
+
+
+def test_hoidlaga_kuude_kaupa(tmp_path, maatriks):
+    # Taustatöö arvutab kuu kaupa; kuu osa kasutab sama hoidlat ja maatriksi räsisid
+    parameetrid = aku_parameetrid({})
+    hoidla = ava_hoidla(str(tmp_path / 'hoidla.db'))
+    summad = []
+    for kuu in kuude_maatriksid(maatriks):
+        assert 'rasid' in kuu and 'indeks' in kuu
+        summad.extend(kuude_tulud_hoidlaga(hoidla, kuu, **parameetrid)[2])
+    assert summad == _ilma_hoidlata(maatriks, 'tsukkel', parameetrid)[2]
+    assert kuude_tulud_hoidlaga(hoidla, maatriks, **parameetrid)[4] == 0
+
+
+def test_paevade_osa_indeksiga(maatriks):
+    read = [3, 17, 40, 41, 300]
+    osa = paevade_osa(maatriks, read)
+    assert osa['indeks']['paevi'] == len(read)
+    np.testing.assert_array_equal(osa['rasid'], maatriks['rasid'][read])
+    parameetrid = aku_parameetrid({})
+    ilma_indeksita = {nimi: v for nimi, v in osa.items() if nimi != 'indeks'}
+    np.testing.assert_array_equal(paevade_tulud(osa, **parameetrid)[0], paevade_tulud(ilma_indeksita, **parameetrid)[0])
+    np.testing.assert_array_equal(paevade_tulud(osa, **parameetrid)[0], paevade_tulud(maatriks, **parameetrid)[0][read])
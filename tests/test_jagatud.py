@@ -0,0 +1,93 @@
+"""akupargi_jagatud: päevamaatriksi kirjutamine ja mällu kaardistamine"""
+import os
+
+import numpy as np
+import pytest
+
+from akupargi_andmed import koosta_paevamaatriks, loe_hinnafailid
+from akupargi_jagatud import ava_maatriks, jagatud_faili_nimi, kirjuta_maatriks, korista_vanad
+from akupargi_simulatsioon import indekseeri
+
+ANDMED = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'andmed')
+
+
+@pytest.fixture(scope='module')
+def maatriks():
+    """Päevamaatriks koos päevaindeksiga (DST päevad, tunni- ja 15-minutilised päevad)"""
+    failid = [os.path.join(ANDMED, nimi) for nimi in sorted(os.listdir(ANDMED)) if nimi.endswith('.csv')]
+    return indekseeri(koosta_paevamaatriks(loe_hinnafailid(failid)))
+
+
+def _vorra(kaardistatud, algne, tee='maatriks'):
+    """Sama struktuur (võtmed, järjekord), massiivide dtype, kuju ja väärtused ning sama tüüpi arvud"""
+    if isinstance(algne, np.ndarray):
+        assert isinstance(kaardistatud, np.ndarray), tee
+        assert kaardistatud.dtype == algne.dtype, tee
+        assert kaardistatud.shape == algne.shape, tee
+        np.testing.assert_array_equal(kaardistatud, algne, err_msg=tee)
+        assert not kaardistatud.flags.writeable, tee
+    elif isinstance(algne, dict):
+        assert list(kaardistatud) == list(algne), tee
+        for nimi in algne:
+            _vorra(kaardistatud[nimi], algne[nimi], f'{tee}[{nimi!r}]')
+    elif isinstance(algne, (list, tuple)):
+        assert len(kaardistatud) == len(algne), tee
+        for i, (k, a) in enumerate(zip(kaardistatud, algne)):
+            _vorra(k, a, f'{tee}[{i}]')
+    else:
+        assert type(kaardistatud) is type(algne) and kaardistatud == algne, tee
+
+
+def test_edasi_tagasi(maatriks, tmp_path):
+    fail = str(tmp_path / jagatud_faili_nimi('kaust', 'signatuur'))
+    kirjuta_maatriks(maatriks, fail)
+    kaardistatud = ava_maatriks(fail)
+    _vorra(kaardistatud, maatriks)
+    assert {'paevad', 'hinnad', 'kehtiv', 'pikkused', 'slotipikkused', 'ajad', 'indeks'} <= set(kaardistatud)
+    # Ajutist faili ei jää maha
+    assert os.listdir(tmp_path) == [os.path.basename(fail)]
+    with pytest.raises(ValueError):
+        kaardistatud['hinnad'][0, 0] = 0.0
+
+
+def test_massiivid_on_joondatud(maatriks, tmp_path):
+    fail = str(tmp_path / 'm.akm')
+    kirjuta_maatriks(maatriks, fail)
+    kaardistatud = ava_maatriks(fail)
+    aadressid = [kaardistatud[nimi].ctypes.data for nimi in ('hinnad', 'kehtiv', 'ajad')]
+    assert all(aadress % 64 == 0 for aadress in aadressid)
+
+
+def test_faili_nimi_muutub_votmega():
+    assert jagatud_faili_nimi('kaust', 'a') == jagatud_faili_nimi('kaust', 'a')
+    assert jagatud_faili_nimi('kaust', 'a') != jagatud_faili_nimi('kaust', 'b')
+
+
+@pytest.mark.parametrize('pikkus', [0, 4, 8, 12, 30, -100, -1])
+def test_poolik_fail_annab_valueerror(maatriks, tmp_path, pikkus):
+    fail = tmp_path / 'm.akm'
+    kirjuta_maatriks(maatriks, str(fail))
+    sisu = fail.read_bytes()
+    fail.write_bytes(sisu[:pikkus])
+    with pytest.raises(ValueError):
+        ava_maatriks(str(fail))
+
+
+@pytest.mark.parametrize('sisu', [b'mitte maatriks', b'AKUMAATR' + (2).to_bytes(8, 'little') + b'[]'])
+def test_vale_sisuga_fail_annab_valueerror(tmp_path, sisu):
+    fail = tmp_path / 'm.akm'
+    fail.write_bytes(sisu)
+    with pytest.raises(ValueError):
+        ava_maatriks(str(fail))
+
+
+def test_objektimassiivi_ei_jagata(tmp_path):
+    with pytest.raises(ValueError):
+        kirjuta_maatriks({'nimed': np.array(['a', None], dtype=object)}, str(tmp_path / 'm.akm'))
+
+
+def test_korista_vanad(tmp_path):
+    for nimi in ('hinnad-vana.akm', 'hinnad-uus.akm', 'muu.akm', 'hinnad-vana.txt'):
+        (tmp_path / nimi).write_bytes(b'')
+    korista_vanad(str(tmp_path), 'hinnad-uus.akm')
+    assert sorted(os.listdir(tmp_path)) == ['hinnad-uus.akm', 'hinnad-vana.txt', 'muu.akm']
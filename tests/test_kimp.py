@@ -0,0 +1,23 @@
+"""Hoidlas olev hinnakimp vastab hinnafailidele"""
+import os
+
+import pytest
+
+from akupargi_andmed import loe_hinnafailid
+from akupargi_kimp import KIMBU_FAIL, koosta_kimp, loe_kimp
+from akupargi_simulatsioon import hinnafailid
+
+KAUST = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_kimp_on_ajakohane():
+    fail = os.path.join(KAUST, KIMBU_FAIL)
+    if not os.path.exists(fail):
+        pytest.skip(f'{KIMBU_FAIL} puudub')
+    with open(fail, 'rb') as f:
+        olemas = f.read()
+    csv_failid = hinnafailid(['Tuulikutasu*.csv'], KAUST)
+    # Sama jarjestus-valikuga, millega kimp ehitati
+    jarjestus = loe_kimp(olemas)['jarjestus'] is not False
+    uus = koosta_kimp(loe_hinnafailid(csv_failid), csv_failid, jarjestus)
+    assert olemas == uus, f'{KIMBU_FAIL} on vananenud: python akupargi_kimp.py --jarjestus'
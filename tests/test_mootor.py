@@ -0,0 +1,318 @@
+"""akupargi_mootor võrdlus algse optimeeri_tsukkel tsükliga ja täpsete lahenditega"""
+import itertools
+
+import numpy as np
+import pytest
+
+from akupargi_mootor import (
+    koosta_paevaindeks, optimeeri_ajajoon, optimeeri_paevad, optimeeri_reserv, optimeeri_soc
+)
+
+
+def optimeeri_tsukkel(hinnad_paev, aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, max_aeg_vahel):
+    """Algne app.optimeeri_tsukkel (hinnad nimekirjana, DataFrame.iloc asemel); max_aeg_vahel slottides"""
+    if len(hinnad_paev) < 2:
+        return None, None, 0
+
+    tagastatav_energia = aku_mahtuvus_mwh * efektiivsus
+    laadimise_tunnid = int(np.ceil(aku_mahtuvus_mwh / aku_voimsus_mw))
+    tuhjendamise_tunnid = int(np.ceil(tagastatav_energia / aku_voimsus_mw))
+
+    max_tulu = float('-inf')
+    parim_laadimine_indeksid = None
+    parim_tuhjendamine_indeksid = None
+
+    for laadimise_algus in range(len(hinnad_paev) - laadimise_tunnid + 1):
+        laadimise_järjestikused = list(range(laadimise_algus, laadimise_algus + laadimise_tunnid))
+        if laadimise_algus + laadimise_tunnid > len(hinnad_paev):
+            continue
+        laadimise_kulu_järjestikused = sum(hinnad_paev[i] for i in laadimise_järjestikused) * aku_voimsus_mw
+
+        kogu_paev_hinnad = [(i, hinnad_paev[i]) for i in range(len(hinnad_paev))]
+        kogu_paev_hinnad.sort(key=lambda x: x[1])
+        odavaimad_tunnid = [idx for idx, _ in kogu_paev_hinnad[:laadimise_tunnid]]
+        laadimise_kulu_mitte_järjestikused = sum(hinnad_paev[i] for i in odavaimad_tunnid) * aku_voimsus_mw
+
+        if laadimise_kulu_mitte_järjestikused < laadimise_kulu_järjestikused:
+            laadimise_indeksid = odavaimad_tunnid
+            laadimise_kulu = laadimise_kulu_mitte_järjestikused
+        else:
+            laadimise_indeksid = laadimise_järjestikused
+            laadimise_kulu = laadimise_kulu_järjestikused
+
+        laadimise_lopp = max(laadimise_indeksid)
+        tuhjendamise_algus_võimalik = laadimise_lopp + 1
+        tuhjendamise_lopp_võimalik = min(laadimise_lopp + max_aeg_vahel + 1, len(hinnad_paev))
+        if tuhjendamise_algus_võimalik >= len(hinnad_paev):
+            continue
+
+        for tuhjendamise_algus in range(tuhjendamise_algus_võimalik, tuhjendamise_lopp_võimalik - tuhjendamise_tunnid + 1):
+            tuhjendamise_järjestikused = list(range(tuhjendamise_algus, tuhjendamise_algus + tuhjendamise_tunnid))
+            if tuhjendamise_algus + tuhjendamise_tunnid > len(hinnad_paev):
+                continue
+            laaditud_energia = laadimise_tunnid * aku_voimsus_mw
+            tagastatav_energia = laaditud_energia * efektiivsus
+
+            keskmine_hind_järjestikused = sum(hinnad_paev[i] for i in tuhjendamise_järjestikused) / tuhjendamise_tunnid
+            tuhjendamise_tulu_järjestikused = tagastatav_energia * keskmine_hind_järjestikused
+
+            võimalikud_tunnid = [(i, hinnad_paev[i]) for i in range(tuhjendamise_algus_võimalik, tuhjendamise_lopp_võimalik)]
+            võimalikud_tunnid.sort(key=lambda x: x[1], reverse=True)
+            kallimad_tunnid = [idx for idx, _ in võimalikud_tunnid[:tuhjendamise_tunnid]]
+            keskmine_hind_mitte_järjestikused = sum(hinnad_paev[i] for i in kallimad_tunnid) / tuhjendamise_tunnid
+            tuhjendamise_tulu_mitte_järjestikused = tagastatav_energia * keskmine_hind_mitte_järjestikused
+
+            if tuhjendamise_tulu_mitte_järjestikused > tuhjendamise_tulu_järjestikused:
+                tuhjendamise_indeksid = kallimad_tunnid
+                tuhjendamise_tulu = tuhjendamise_tulu_mitte_järjestikused
+            else:
+                tuhjendamise_indeksid = tuhjendamise_järjestikused
+                tuhjendamise_tulu = tuhjendamise_tulu_järjestikused
+
+            tulu = tuhjendamise_tulu - laadimise_kulu
+            if tulu > max_tulu:
+                max_tulu = tulu
+                parim_laadimine_indeksid = laadimise_indeksid
+                parim_tuhjendamine_indeksid = tuhjendamise_indeksid
+
+    if max_tulu == float('-inf'):
+        return None, None, 0
+    return parim_laadimine_indeksid, parim_tuhjendamine_indeksid, max_tulu
+
+
+def _paevad(rng, pikkused, korduvad=False):
+    """Juhuslikud päevad (NaN-iga täidetud maatriks); korduvad=True korral palju võrdseid hindu"""
+    hinnad = np.full((len(pikkused), max(pikkused)), np.nan)
+    for d, n in enumerate(pikkused):
+        if korduvad:
+            hinnad[d, :n] = rng.choice([10.0, 20.0, 35.5, 50.0], size=n)
+        else:
+            hinnad[d, :n] = np.round(rng.normal(60, 40, size=n), 2)
+    return hinnad
+
+
+AKUD = [
+    # (mahtuvus, võimsus, efektiivsus, max_aeg_vahel tundides)
+    (100.0, 50.0, 0.87, 8),
+    (150.0, 100.0, 0.9, 5),
+    (40.0, 50.0, 0.8, 3),
+    (200.0, 30.0, 0.87, 12),
+]
+
+PAEVAD = {
+    'juhuslikud': ([24] * 40, False),
+    'vordsed': ([24] * 40, True),
+    'kellakeeramine': ([23, 24, 25] * 10, False),
+    'kellakeeramine_vordsed': ([23, 25] * 10, True),
+}
+
+
+def _kontrolli(hinnad, pikkused, slotipikkus, aku, tulemus):
+    mahtuvus, voimsus, efektiivsus, max_aeg = aku
+    laadimine, tuhjendamine, tulu = tulemus
+    for d, n in enumerate(pikkused):
+        l, t, v = optimeeri_tsukkel(
+            hinnad[d, :n].tolist(), mahtuvus, voimsus * slotipikkus, efektiivsus, int(round(max_aeg / slotipikkus))
+        )
+        if l is None:
+            assert (laadimine[d] == -1).all() and (tuhjendamine[d] == -1).all() and tulu[d] == 0
+            continue
+        assert laadimine[d, :len(l)].tolist() == l and (laadimine[d, len(l):] == -1).all()
+        assert tuhjendamine[d, :len(t)].tolist() == t and (tuhjendamine[d, len(t):] == -1).all()
+        assert tulu[d] == v
+
+
+@pytest.mark.parametrize('indeksiga', [False, True])
+@pytest.mark.parametrize('aku', AKUD)
+@pytest.mark.parametrize('paevad', sorted(PAEVAD))
+def test_tsukkel_sama_mis_algne(paevad, aku, indeksiga):
+    pikkused, korduvad = PAEVAD[paevad]
+    hinnad = _paevad(np.random.default_rng(len(paevad)), pikkused, korduvad)
+    pikkused = np.array(pikkused)
+    indeks = koosta_paevaindeks(hinnad, pikkused) if indeksiga else None
+    tulemus = optimeeri_paevad(hinnad, aku[0], aku[1], aku[2], aku[3], pikkused=pikkused, indeks=indeks)
+    _kontrolli(hinnad, pikkused, 1.0, aku, tulemus)
+
+
+@pytest.mark.parametrize('indeksiga', [False, True])
+@pytest.mark.parametrize('korduvad', [False, True])
+def test_tsukkel_15_minutit_sama_mis_algne(korduvad, indeksiga):
+    # 96 slotti päevas; algne tsükkel saab sloti energia võimsusena ja max_aeg_vahel slottides
+    pikkused = np.array([96] * 8 + [92, 100])
+    hinnad = _paevad(np.random.default_rng(7), pikkused, korduvad)
+    slotipikkused = np.full(len(pikkused), 0.25)
+    aku = (100.0, 50.0, 0.87, 4)
+    indeks = koosta_paevaindeks(hinnad, pikkused, slotipikkused) if indeksiga else None
+    tulemus = optimeeri_paevad(
+        hinnad, aku[0], aku[1], aku[2], aku[3], pikkused=pikkused, slotipikkus_h=slotipikkused, indeks=indeks
+    )
+    _kontrolli(hinnad, pikkused, 0.25, aku, tulemus)
+
+
+def _soc_milp(hinnad, aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, max_tsukleid=None, slotipikkus_h=1.0):
+    """Päeva optimum segatäisarvulise LP-na: laadimine c, tühjendamine d, slotis üks suund (u)"""
+    optimize = pytest.importorskip('scipy.optimize')
+    n = len(hinnad)
+    e = aku_voimsus_mw * slotipikkus_h
+    hinnad = np.asarray(hinnad)
+    # Muutujad [c_0..c_n-1, d_0..d_n-1, u_0..u_n-1]; minimeerime kulu - müügitulu
+    kulu = np.concatenate([hinnad, -efektiivsus * hinnad, np.zeros(n)])
+    alumine = np.tril(np.ones((n, n)))
+    piirangud = [
+        optimize.LinearConstraint(np.hstack([alumine, -alumine, np.zeros((n, n))]), 0, aku_mahtuvus_mwh),
+        optimize.LinearConstraint(np.hstack([np.eye(n), np.zeros((n, n)), -e * np.eye(n)]), -np.inf, 0),
+        optimize.LinearConstraint(np.hstack([np.zeros((n, n)), np.eye(n), e * np.eye(n)]), -np.inf, e),
+    ]
+    if max_tsukleid is not None:
+        piirangud.append(optimize.LinearConstraint(
+            np.concatenate([np.ones(n), np.zeros(2 * n)])[np.newaxis, :], 0, max_tsukleid * aku_mahtuvus_mwh
+        ))
+    tulemus = optimize.milp(
+        kulu, constraints=piirangud, integrality=np.concatenate([np.zeros(2 * n), np.ones(n)]),
+        bounds=optimize.Bounds(np.zeros(3 * n), np.concatenate([np.full(2 * n, e), np.ones(n)]))
+    )
+    assert tulemus.success
+    return -tulemus.fun
+
+
+@pytest.mark.parametrize('max_tsukleid', [None, 1, 1.5])
+@pytest.mark.parametrize('aku', [(100.0, 50.0, 0.87), (100.0, 40.0, 0.9), (60.0, 100.0, 0.8)])
+def test_soc_sama_mis_milp(aku, max_tsukleid):
+    rng = np.random.default_rng(5)
+    pikkused = rng.integers(4, 11, size=12)
+    hinnad = _paevad(rng, pikkused)
+    _, _, tulu = optimeeri_soc(hinnad, aku[0], aku[1], aku[2], pikkused=pikkused, max_tsukleid=max_tsukleid)
+    oodatud = [_soc_milp(hinnad[d, :n], *aku, max_tsukleid=max_tsukleid) for d, n in enumerate(pikkused)]
+    np.testing.assert_allclose(tulu, oodatud, rtol=1e-9, atol=1e-6)
+
+
+def test_soc_15_minutit_sama_mis_milp():
+    rng = np.random.default_rng(6)
+    hinnad = _paevad(rng, [10] * 6)
+    _, _, tulu = optimeeri_soc(hinnad, 30.0, 50.0, 0.87, max_tsukleid=1, slotipikkus_h=0.25)
+    oodatud = [_soc_milp(paev, 30.0, 50.0, 0.87, max_tsukleid=1, slotipikkus_h=0.25) for paev in hinnad]
+    np.testing.assert_allclose(tulu, oodatud, rtol=1e-9, atol=1e-6)
+
+
+def _ajajoon_labi(hinnad, aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, max_aeg_vahel, katkestused):
+    """
+    Ajajoone optimum kõigi (laadimise algus, tühjendamise algus) paaride läbivaatusel: parim(i) on
+    suurim tulu, kui esimene tsükkel algab kõige varem real s (max_aeg_vahel slottides).
+    """
+    n = len(hinnad)
+    e = aku_voimsus_mw
+    laadimise_tunnid = int(np.ceil(aku_mahtuvus_mwh / e))
+    tuhjendamise_tunnid = int(np.ceil(aku_mahtuvus_mwh * efektiivsus / e))
+    loik = np.cumsum(katkestused)
+    parim = [0.0] * (n + 1)
+    for s in range(n - 1, -1, -1):
+        parim[s] = parim[s + 1]
+        for t in range(s + laadimise_tunnid, n - tuhjendamise_tunnid + 1):
+            lopp = t + tuhjendamise_tunnid
+            if lopp - (s + laadimise_tunnid) > max_aeg_vahel or loik[lopp - 1] != loik[s]:
+                continue
+            kulu = sum(hinnad[s:s + laadimise_tunnid]) * e
+            muuk = laadimise_tunnid * e * efektiivsus * (sum(hinnad[t:lopp]) / tuhjendamise_tunnid)
+            parim[s] = max(parim[s], muuk - kulu + parim[lopp])
+    return parim[0]
+
+
+@pytest.mark.parametrize('aku', [(100.0, 50.0, 0.87, 4), (50.0, 50.0, 0.9, 3), (150.0, 50.0, 0.8, 6)])
+def test_ajajoon_sama_mis_labivaatus(aku):
+    rng = np.random.default_rng(11)
+    for _ in range(25):
+        n = int(rng.integers(6, 30))
+        hinnad = np.round(rng.normal(60, 40, size=n), 2)
+        katkestused = rng.random(n) < 0.1
+        katkestused[0] = True
+        laadimised, tuhjendamised, tulud = optimeeri_ajajoon(hinnad, *aku, katkestused=katkestused)
+        assert sum(tulud.tolist()) == pytest.approx(_ajajoon_labi(hinnad, *aku, katkestused), abs=1e-6)
+        # Tsüklid on ajalises järjekorras ega kattu
+        tuhjendamise_tunnid = int(np.ceil(aku[0] * aku[2] / aku[1]))
+        assert (tuhjendamised >= laadimised + int(np.ceil(aku[0] / aku[1]))).all()
+        assert (laadimised[1:] >= tuhjendamised[:-1] + tuhjendamise_tunnid).all()
+
+
+def _reservi_hinnad(rng, hinnad):
+    """Juhuslikud reservihinnad: osa puudu (NaN), osa mittepositiivsed"""
+    reservi_hinnad = np.round(rng.uniform(-5, 40, size=hinnad.shape), 1)
+    reservi_hinnad[rng.random(hinnad.shape) < 0.3] = np.nan
+    return reservi_hinnad
+
+
+@pytest.mark.parametrize('aku', [(100.0, 50.0, 0.87), (100.0, 37.0, 0.87), (137.0, 41.0, 0.9), (60.0, 100.0, 0.8)])
+@pytest.mark.parametrize('slotipikkus', [1.0, 0.25])
+def test_reserv_ilma_reservihindadeta_sama_mis_soc(aku, slotipikkus):
+    rng = np.random.default_rng(12)
+    pikkused = np.array([23, 24, 25] * 4) * (4 if slotipikkus < 1 else 1)
+    hinnad = _paevad(rng, pikkused)
+    ostetud, muudud, tulu = optimeeri_soc(hinnad, *aku, pikkused=pikkused, slotipikkus_h=slotipikkus)
+    r_ostetud, r_muudud, reserv, r_tulu = optimeeri_reserv(
+        hinnad, np.full_like(hinnad, np.nan), *aku, pikkused=pikkused, slotipikkus_h=slotipikkus
+    )
+    assert np.array_equal(r_tulu, tulu)
+    assert np.array_equal(r_ostetud, ostetud) and np.array_equal(r_muudud, muudud)
+    assert not reserv.any()
+
+
+@pytest.mark.parametrize('reservi_kestus', [0.0, 0.5, 1.0, 2.0])
+@pytest.mark.parametrize('slotipikkus', [1.0, 0.25])
+def test_reserv_piirangud(reservi_kestus, slotipikkus):
+    rng = np.random.default_rng(13)
+    mahtuvus, voimsus, efektiivsus = 100.0, 37.0, 0.87
+    pikkused = np.array([23, 24, 25] * 10) * (4 if slotipikkus < 1 else 1)
+    hinnad = _paevad(rng, pikkused)
+    reservi_hinnad = _reservi_hinnad(rng, hinnad)
+    ostetud, muudud, reserv, tulu = optimeeri_reserv(
+        hinnad, reservi_hinnad, mahtuvus, voimsus, efektiivsus, reservi_kestus, pikkused=pikkused,
+        slotipikkus_h=slotipikkus
+    )
+    muutus = ostetud - muudud / efektiivsus
+    parast = np.cumsum(muutus, axis=1)
+    enne = parast - muutus
+    varu = reserv * reservi_kestus
+    assert (reserv >= 0).all() and reserv.any()
+    assert (varu <= np.minimum(enne, parast) + 1e-9).all()
+    assert (np.maximum(enne, parast) <= mahtuvus - varu + 1e-9).all()
+    assert (reserv + (ostetud + muudud / efektiivsus) / slotipikkus <= voimsus + 1e-9).all()
+    # Reservi ei müüda puuduva või mittepositiivse hinnaga
+    assert not reserv[~(reservi_hinnad > 0)].any()
+    kauplemine = np.nansum(hinnad * (muudud - ostetud), axis=1)
+    np.testing.assert_allclose(tulu, kauplemine + np.nansum(reserv * reservi_hinnad * slotipikkus, axis=1))
+
+
+def _reserv_labi(hinnad, reservi_hinnad, aku_mahtuvus_mwh, aku_voimsus_mw, efektiivsus, reservi_kestus_h):
+    """
+    Päeva optimum kõigi laetuse teede läbivaatusel võrel sammuga 1 MWh (täisarvuline mahtuvus ja võimsus,
+    tunnised slotid): reserv on suurim võimsus, mis jätab kauplemise kõrval võimsust ja laetuse varu.
+    """
+    n = len(hinnad)
+    parim = 0.0
+    for muutused in itertools.product(range(-int(aku_voimsus_mw), int(aku_voimsus_mw) + 1), repeat=n):
+        laetus = 0
+        tulu = 0.0
+        for hind, reservi_hind, j in zip(hinnad, reservi_hinnad, muutused):
+            uus = laetus + j
+            if not 0 <= uus <= aku_mahtuvus_mwh:
+                break
+            tulu += -hind * j if j > 0 else -efektiivsus * hind * j
+            reserv = aku_voimsus_mw - abs(j)
+            if reservi_kestus_h > 0:
+                reserv = min(reserv, min(laetus, uus) / reservi_kestus_h,
+                             (aku_mahtuvus_mwh - max(laetus, uus)) / reservi_kestus_h)
+            if reservi_hind > 0:
+                tulu += reservi_hind * max(reserv, 0.0)
+            laetus = uus
+        else:
+            parim = max(parim, tulu)
+    return parim
+
+
+@pytest.mark.parametrize('aku', [(3.0, 2.0, 0.9, 1.0), (5.0, 2.0, 0.8, 0.5), (3.0, 1.0, 1.0, 0.0)])
+def test_reserv_sama_mis_labivaatus(aku):
+    rng = np.random.default_rng(14)
+    hinnad = np.round(rng.normal(60, 40, size=(8, 6)), 1)
+    reservi_hinnad = _reservi_hinnad(rng, hinnad)
+    _, _, _, tulu = optimeeri_reserv(hinnad, reservi_hinnad, aku[0], aku[1], aku[2], aku[3])
+    oodatud = [_reserv_labi(h, r, *aku) for h, r in zip(hinnad, reservi_hinnad)]
+    np.testing.assert_allclose(tulu, oodatud, rtol=1e-9, atol=1e-6)
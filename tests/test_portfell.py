@@ -0,0 +1,104 @@
+"""Portfell: piirkondade joondamine ja parkide tulud võrreldes ühe piirkonna arvutusega"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import akupargi_portfell
+from akupargi_andmed import AJAVOOND, joonda_tsoonid
+from akupargi_portfell import (
+    PORTFELLI_MUDELID, koosta_portfell, kontrolli_pargid, simuleeri_portfell, tsooni_maatriks
+)
+from akupargi_simulatsioon import kuude_tulud, paevade_tulud
+
+
+def _hinnarida(rng, algus, lopp, samm_min):
+    """loe_hinnafailid kujul hinnarida UTC vahemikus [algus, lopp) sammuga samm_min minutit"""
+    ajad = pd.date_range(algus, lopp, freq=f'{samm_min}min', inclusive='left', tz='UTC')
+    return pd.DataFrame({
+        'Kuupäev': ajad.tz_convert(AJAVOOND).tz_localize(None),
+        'Ajatempel': (ajad - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1),
+        'Hind': np.round(rng.normal(60, 40, size=len(ajad)), 2),
+    })
+
+
+@pytest.fixture(scope='module')
+def tsoonid():
+    # Kevadine kellakeeramine (31.03.2024), eri perioodid ja sloti pikkused
+    rng = np.random.default_rng(21)
+    return {
+        'EE': _hinnarida(rng, '2024-03-26 22:00', '2024-04-05 21:00', 60),
+        'FI': _hinnarida(rng, '2024-03-27 22:00', '2024-04-06 21:00', 15),
+        'LV': _hinnarida(rng, '2024-03-25 22:00', '2024-04-04 21:00', 60),
+    }
+
+
+@pytest.fixture(scope='module')
+def portfell(tsoonid):
+    return koosta_portfell(joonda_tsoonid(tsoonid))
+
+
+def test_joondamine(tsoonid):
+    joondatud = joonda_tsoonid(tsoonid)
+    ajatemplid = joondatud['Ajatempel'].to_numpy()
+    # Ainult ühine periood, FI 15-minutilisel võrel
+    assert ajatemplid[0] == tsoonid['FI']['Ajatempel'].iloc[0]
+    assert ajatemplid[-1] == tsoonid['LV']['Ajatempel'].iloc[-1] + 45 * 60
+    assert (np.diff(ajatemplid) == 15 * 60).all()
+    # Tunnihind kehtib tunni kõigile neljale slotile, FI hinnad on muutmata
+    ee = tsoonid['EE'].set_index('Ajatempel')['Hind']
+    np.testing.assert_array_equal(joondatud['EE'], ee.loc[ajatemplid // 3600 * 3600].to_numpy())
+    fi = tsoonid['FI'].set_index('Ajatempel')['Hind']
+    np.testing.assert_array_equal(joondatud['FI'], fi.loc[ajatemplid].to_numpy())
+
+
+def test_joondamine_kellakeeramine(portfell):
+    paevad = portfell['paevad'].astype(str).tolist()
+    assert paevad[0] == '2024-03-28' and paevad[-1] == '2024-04-04'
+    pikkused = dict(zip(paevad, portfell['pikkused'].tolist()))
+    assert pikkused['2024-03-31'] == 92
+    assert all(n == 96 for paev, n in pikkused.items() if paev != '2024-03-31')
+    assert (portfell['slotipikkused'] == 0.25).all()
+
+
+@pytest.mark.parametrize('mudel', PORTFELLI_MUDELID)
+def test_park_sama_mis_uks_piirkond(portfell, mudel):
+    pargid = kontrolli_pargid([
+        {'nimi': 'A', 'tsoon': 'EE'},
+        {'nimi': 'B', 'tsoon': 'FI'},
+        {'nimi': 'C', 'tsoon': 'LV', 'aku_voimsus_mw': 25},
+        {'nimi': 'D', 'tsoon': 'FI', 'aku_voimsus_mw': 25, 'max_aeg_vahel': 4},
+    ], portfell['tsoonid'])
+    tulemused, kokku = simuleeri_portfell(portfell, pargid, mudel)
+    for park, tulemus in zip(pargid, tulemused):
+        parameetrid = {nimi: v for nimi, v in park.items() if nimi not in ('nimi', 'tsoon')}
+        maatriks = tsooni_maatriks(portfell, park['tsoon'])
+        summad, arvud = kuude_tulud(portfell, *paevade_tulud(maatriks, mudel=mudel, **parameetrid))
+        assert tulemus['kuu_tulud'] == [float(s) for s in summad]
+        assert tulemus['kuu_tsukleid'] == arvud
+    assert kokku['kogutulu'] == pytest.approx(sum(t['kogutulu'] for t in tulemused))
+
+
+@pytest.mark.parametrize('mudel,arvutusi', [('tsukkel', 2), ('soc', 2), ('ajajoon', 3)])
+def test_korduvad_pargid_arvutatakse_uks_kord(portfell, monkeypatch, mudel, arvutusi):
+    kutsed = []
+
+    def loendav(maatriks, **parameetrid):
+        kutsed.append(len(maatriks['hinnad']))
+        return paevade_tulud(maatriks, **parameetrid)
+
+    monkeypatch.setattr(akupargi_portfell, 'paevade_tulud', loendav)
+    pargid = kontrolli_pargid([
+        {'nimi': 'A', 'tsoon': 'EE'},
+        {'nimi': 'B', 'tsoon': 'EE'},
+        {'nimi': 'C', 'tsoon': 'FI'},
+        {'nimi': 'D', 'tsoon': 'EE', 'aku_voimsus_mw': 25},
+        {'nimi': 'E', 'tsoon': 'EE', 'aku_voimsus_mw': 25},
+    ], portfell['tsoonid'])
+    tulemused, _ = simuleeri_portfell(portfell, pargid, mudel)
+    # Sama akuga pargid koos (ajajoonel piirkonna kaupa), korduv (piirkond, aku) paar üks kord
+    paevi = len(portfell['paevad'])
+    assert len(kutsed) == arvutusi
+    if mudel != 'ajajoon':
+        assert sorted(kutsed) == [paevi, 2 * paevi]
+    assert tulemused[0]['kuu_tulud'] == tulemused[1]['kuu_tulud']
+    assert tulemused[3]['kuu_tulud'] == tulemused[4]['kuu_tulud']
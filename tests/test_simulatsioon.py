@@ -0,0 +1,78 @@
+"""akupargi_simulatsioon parameetrid ja päevade tulud"""
+import numpy as np
+import pytest
+
+from akupargi_hoidla import parameetrite_voti
+from akupargi_mootor import optimeeri_ajajoon
+from akupargi_simulatsioon import aku_parameetrid, paevade_tulud
+
+
+def _paev_15_minutit(tuhjendamise_slot):
+    """96 sloti päev: odav slot 10, kallis slot tuhjendamise_slot, ülejäänud keskmise hinnaga"""
+    hinnad = np.full((1, 96), 50.0)
+    hinnad[0, 10] = 0.0
+    hinnad[0, tuhjendamise_slot] = 200.0
+    return {'hinnad': hinnad, 'pikkused': np.array([96]), 'slotipikkused': np.array([0.25])}
+
+
+def _parameetrid():
+    return aku_parameetrid({'aku_voimsus_mw': 4, 'aku_mahtuvus_mwh': 1, 'efektiivsus': 1, 'max_aeg_vahel': '2.5'})
+
+
+@pytest.mark.parametrize('vahe,lubatud', [(10, True), (11, False)])
+def test_max_aeg_vahel_murdosa_tunde(vahe, lubatud):
+    # 2,5 h = 10 slotti: müük 10 slotti pärast laadimise lõppu on lubatud, 11 slotti pärast mitte
+    parameetrid = _parameetrid()
+    assert parameetrid['max_aeg_vahel'] == 2.5
+    tulud, _ = paevade_tulud(_paev_15_minutit(10 + vahe), mudel='tsukkel', **parameetrid)
+    # Sloti energia 1 MWh: 200 - 0 ainult lubatud vahe korral, muidu parim on 50 - 0
+    assert tulud[0] == (200.0 if lubatud else 50.0)
+
+
+@pytest.mark.parametrize('vahe,lubatud', [(10, True), (11, False)])
+def test_max_aeg_vahel_murdosa_tunde_ajajoon(vahe, lubatud):
+    # Efektiivsus 0,5: kahe järjestikuse tsükliga (odav -> keskmine -> kallis) ei saa sama tulu
+    parameetrid = _parameetrid()
+    hinnad = _paev_15_minutit(10 + vahe)['hinnad'][0]
+    laadimised, tuhjendamised, _ = optimeeri_ajajoon(
+        hinnad, parameetrid['aku_mahtuvus_mwh'], parameetrid['aku_voimsus_mw'], 0.5,
+        parameetrid['max_aeg_vahel'], slotipikkus_h=0.25
+    )
+    assert ((10, 10 + vahe) in zip(laadimised.tolist(), tuhjendamised.tolist())) == lubatud
+
+
+def test_max_aeg_vahel_murdosa_hoidla_votmes():
+    voti = parameetrite_voti('tsukkel', 50, 100, 0.87, 2.5)
+    assert voti != parameetrite_voti('tsukkel', 50, 100, 0.87, 2)
+
+
+def test_reserv_tsukleid_kauplemisest():
+    # Laetuse varuta reserv ja tasased hinnad: esimene päev teenib ainult reservi pealt, teisel tasub ka kaubelda
+    hinnad = np.full((2, 24), 50.0)
+    hinnad[1, 3] = 0.0
+    hinnad[1, 20] = 200.0
+    maatriks = {
+        'hinnad': hinnad, 'reservi_hinnad': np.full((2, 24), 10.0),
+        'pikkused': np.array([24, 24]), 'slotipikkused': np.array([1.0, 1.0]),
+    }
+    parameetrid = aku_parameetrid({'aku_voimsus_mw': 50, 'aku_mahtuvus_mwh': 100, 'reservi_kestus_h': 0}, 'reserv')
+    tulud, tsukleid = paevade_tulud(maatriks, mudel='reserv', **parameetrid)
+    assert (tulud > 0).all()
+    assert tsukleid.tolist() == [0, 1]
+
+
+def test_reserv_ei_toeta_tsuklipiiri():
+    with pytest.raises(ValueError):
+        aku_parameetrid({'max_tsukleid_paevas': 1}, 'reserv')
+    parameetrid = dict(aku_parameetrid({}, 'reserv'), max_tsukleid_paevas=1.0)
+    with pytest.raises(ValueError):
+        paevade_tulud(_paev_15_minutit(20), mudel='reserv', **parameetrid)
+
+
+@pytest.mark.parametrize('vigane', [
+    {'aku_voimsus_mw': -5}, {'aku_voimsus_mw': 0}, {'aku_mahtuvus_mwh': 0}, {'aku_voimsus_mw': float('nan')},
+    {'efektiivsus': 0}, {'efektiivsus': 1.2}, {'efektiivsus': 'x'},
+])
+def test_vigased_aku_parameetrid(vigane):
+    with pytest.raises(ValueError):
+        aku_parameetrid(vigane)